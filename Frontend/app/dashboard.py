@@ -13,220 +13,435 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
 # --- 2. IMPORTACIONES DE LÓGICA ---
-from backend.core_logic import load_and_prepare_data, generate_alerts, get_floor_status, predict_60_min_ma
-from configuracion.config import PISOS_MONITOREADOS, UMBRALES 
+from backend.core_logic import (load_and_prepare_data, evaluate_alert_cycle, apply_alert_actions,
+                                get_floor_status_index, get_predictions, load_rollup_window, update_alert_state,
+                                get_alert_history, get_rules, load_published_alerts)
+from backend.schema import ALERT_LEVELS, as_levels
+from backend.downsampling import chart_series
+from configuracion.config import (PISOS_MONITOREADOS, CHART_POINTS, DASHBOARD_SOURCE, API_URL,
+                                  DASHBOARD_REFRESH_SECONDS, DASHBOARD_INCREMENTAL)
+from backend.api_client import ApiClient
+from backend import metrics
 
 # --- 3. CONFIGURACIÓN INICIAL DE STREAMLIT ---
 st.set_page_config(layout="wide", page_title="SmartFloors MVP")
 
 # --- 4. CARGA Y PROCESAMIENTO DE DATOS ---
-# ttl=5 fuerza a Streamlit a volver a ejecutar esta función y recargar el archivo CSV
-# cada 5 segundos, simulando un flujo de datos en tiempo real.
-@st.cache_data(ttl=5) 
+@st.cache_resource
+def get_api_client():
+    """Cliente de la API de lectura (DASHBOARD_SOURCE = 'api'), uno por proceso."""
+    return ApiClient(API_URL)
+
+
+# ttl fuerza a Streamlit a volver a ejecutar esta función y recargar los datos cada
+# DASHBOARD_REFRESH_SECONDS, simulando un flujo de datos en tiempo real. cache_resource retorna
+# los mismos objetos a todas las sesiones y secciones (sin copiarlos): se tratan como de solo lectura.
+@st.cache_resource(ttl=DASHBOARD_REFRESH_SECONDS)
 def get_data_and_alerts():
-    """Carga los datos y genera las alertas (función principal de Streamlit)."""
+    """
+    Carga los datos y las alertas (función principal de Streamlit). Con DASHBOARD_SOURCE = 'api'
+    todo se lee de la API de lectura. Si no, y el daemon de alertas está publicando
+    (python -m backend.alert_daemon), solo se leen sus resultados; si tampoco, se calculan aquí.
+    """
+    # Un ciclo de refresco completo: se mide y, si se pidió en el panel de diagnóstico, se perfila
+    with metrics.profile_cycle('dashboard'), metrics.timed('dashboard_datos'):
+        data = load_data_and_alerts()
+    metrics.export('dashboard') # <METRICS_DIR>/dashboard.prom
+    return data
+
+def load_data_and_alerts():
+    """
+    Una recarga desde la fuente configurada: (lecturas, alertas, alertas abiertas del
+    motor con estado, transiciones, predicciones, origen).
+    """
+    if DASHBOARD_SOURCE == 'api':
+        # Todas las sesiones comparten un cliente: solo revalida (ETag) y pide las lecturas nuevas
+        try:
+            df, df_alerts, df_active, df_history, df_pred, meta = get_api_client().snapshot()
+        except Exception as e:
+            st.error(f"No se pudo consultar la API de lectura ({e}). **[Importante]** Ejecute `python -m backend.api_server`.")
+            return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), 'api'
+        return df, df_alerts, df_active, df_history, df_pred, 'api'
+
     df = load_and_prepare_data()
     if df.empty:
         st.error("No se pudieron cargar los datos. **[Importante]** Ejecute el simulador de datos en la Terminal 1.")
-        return pd.DataFrame(), pd.DataFrame()
-        
-    df_alerts = generate_alerts(df)
-    return df, df_alerts
+        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), 'local'
+
+    published = load_published_alerts()
+    if published is not None:
+        return df, published['alerts'], published['active'], published['events'], published['forecast'], 'daemon'
+
+    df_alerts, critical_keys, shifts = evaluate_alert_cycle(df)
+    apply_alert_actions(critical_keys, shifts) # Sin daemon, el dashboard cierra el bucle con el simulador
+    # Motor con estado: solo procesa las lecturas nuevas y registra transiciones
+    df_active, _ = update_alert_state(df)
+    # Predictor incremental: no reescanea el historial
+    return df, df_alerts, df_active, get_alert_history(), get_predictions(df), 'local'
 
-df_data, df_alerts = get_data_and_alerts()
+df_data, df_alerts, df_active, df_history, df_pred, data_origin = get_data_and_alerts()
 
 if df_data.empty:
     st.stop()
 
-# Pre-procesamiento para gráficos (derretir el DataFrame)
-df_melted = df_data.reset_index().melt(
-    id_vars=['timestamp', 'edificio', 'piso'],
-    value_vars=['temp_C', 'humedad_pct', 'energia_kW'],
-    var_name='variable',
-    value_name='valor'
+# Selección de edificio (el simulador vectorizado puede generar varios)
+edificios = sorted(df_data['edificio'].unique())
+edificio = st.sidebar.selectbox("Edificio", edificios) if len(edificios) > 1 else edificios[0]
+ORIGENES = {
+    'api': "Datos y alertas desde la API de lectura.",
+    'daemon': "Alertas publicadas por el daemon de alertas.",
+    'local': "Alertas calculadas en el dashboard (daemon de alertas inactivo).",
+}
+st.sidebar.caption(ORIGENES[data_origin])
+
+# Rango de las tendencias: 4 horas desde las lecturas; día y semana desde los rollups
+RANGOS = {'Últimas 4 Horas': None, 'Último Día': pd.Timedelta(days=1), 'Última Semana': pd.Timedelta(days=7)}
+rango = st.sidebar.radio("Rango de tendencias", list(RANGOS))
+
+# --- 5. REFRESCO INCREMENTAL POR SECCIÓN ---
+# Con DASHBOARD_INCREMENTAL cada sección es un fragmento que se vuelve a ejecutar sola cada
+# DASHBOARD_REFRESH_SECONDS (sin re-ejecutar el script completo) y que solo reconstruye su
+# contenido si cambió su marca de agua en esta sesión; si no, reemite lo ya construido.
+REFRESH_EVERY = DASHBOARD_REFRESH_SECONDS if DASHBOARD_INCREMENTAL else None
+
+def data_watermark(data):
+    """Marca de agua de los datos compartidos: última lectura vista, cantidad y versión de las reglas."""
+    df, _, _, history, _, _ = data
+    return (len(df), df.index[-1], len(history), get_rules().version)
+
+def session_section(name, watermark, build):
+    """Resultado de `build()` para la sección `name`, reconstruido solo si la marca de agua cambió."""
+    key = f'_seccion_{name}'
+    entry = st.session_state.get(key)
+    metrics.cache_access('secciones', entry is not None and entry[0] == watermark)
+    if entry is None or entry[0] != watermark:
+        with metrics.timed(f'dashboard_{name}'):
+            entry = st.session_state[key] = (watermark, build())
+    return entry[1]
+
+
+# --- 6. TÍTULO ---
+st.title("💡 SmartFloors: Monitoreo Predictivo MVP")
+st.markdown(f"Dashboard de estado en tiempo real del Edificio {edificio} (Pisos 1-3). **¡Sistema de Auto-Corrección Simulado Activo!**")
+
+# --- 7. TARJETAS POR PISO (STATUS CARDS) ---
+COLOR_MAP = {
+    'OK': 'green',
+    'Informativa': 'blue',
+    'Media': 'orange',
+    'Crítica': 'red'
+}
+# Un solo bloque de estilos para todas las tarjetas (no uno por tarjeta en cada refresco)
+st.markdown(
+    "<style>" + "".join(
+        f'[data-testid="stMetricValue"]:has(div:contains("{level}")) {{ color: {color} !important; }}'
+        for level, color in COLOR_MAP.items()
+    ) + "</style>",
+    unsafe_allow_html=True
 )
-# Solo las últimas 4 horas (la poda del simulador asegura que esto siempre sea 4h)
-latest_timestamp = df_data.index.max()
-df_4_hours = df_melted[df_melted['timestamp'] > latest_timestamp - pd.Timedelta(hours=4)]
 
+@st.fragment(run_every=REFRESH_EVERY)
+def status_cards(edificio):
+    data = get_data_and_alerts()
+    if data[0].empty:
+        return
+
+    def build():
+        # Índice materializado sobre todas las alertas (compartido por las sesiones): una búsqueda por tarjeta
+        status = get_floor_status_index(data[1])
+        return [(piso, *status.get(edificio, piso)) for piso in PISOS_MONITOREADOS]
+
+    cards = session_section('tarjetas', (edificio, data_watermark(data)), build)
+    st.subheader("Estado General por Piso")
+    col_cards = st.columns(len(PISOS_MONITOREADOS))
+    for col, (piso, level, summary) in zip(col_cards, cards):
+        col.metric(
+            label=f"Piso {piso}",
+            value=level,
+            delta=summary,
+            delta_color="off" 
+        )
 
-# --- 5. TÍTULO Y FILTROS ---
-st.title("💡 SmartFloors: Monitoreo Predictivo MVP")
-st.markdown("Dashboard de estado en tiempo real del Edificio A (Pisos 1-3). **¡Sistema de Auto-Corrección Simulado Activo!**")
-
-# --- 6. TARJETAS POR PISO (STATUS CARDS) ---
-st.subheader("Estado General por Piso")
-col_cards = st.columns(len(PISOS_MONITOREADOS))
-
-for i, piso in enumerate(PISOS_MONITOREADOS):
-    level, summary = get_floor_status(df_alerts, piso)
-
-    color_map = {
-        'OK': 'green',
-        'Informativa': 'blue',
-        'Media': 'orange',
-        'Critica': 'red'
-    }
-
-    col_cards[i].metric(
-        label=f"Piso {piso}",
-        value=level,
-        delta=summary,
-        delta_color="off" 
+status_cards(edificio)
+st.divider()
+
+# --- 8. GRÁFICOS DE TENDENCIA ---
+def build_trend_figures(data, edificio, rango):
+    """Series (lecturas reducidas o rollups) y las tres figuras de tendencia del edificio."""
+    df_data, _, _, _, df_pred, _ = data
+    with metrics.timed('dashboard_filtro_edificio'):
+        df_data = df_data[df_data['edificio'] == edificio]
+        df_pred = df_pred[df_pred['edificio'] == edificio]
+    UMBRALES = get_rules().umbrales # Umbrales vigentes (recargables en caliente desde RULES_FILE)
+    latest_timestamp = df_data.index.max()
+    notice = None
+
+    # Series de los gráficos (el resto de 'dashboard_tendencias' es la construcción de las figuras)
+    with metrics.timed('dashboard_series'):
+        df_trend = pd.DataFrame()
+        if RANGOS[rango] is not None:
+            window_start = latest_timestamp - RANGOS[rango]
+            # Media por cubeta para confort; máximo para energía (conserva los picos)
+            df_trend = load_rollup_window(edificio, window_start, latest_timestamp,
+                                          {'temp_C': 'mean', 'humedad_pct': 'mean', 'energia_kW': 'max'})
+            if df_trend.empty:
+                notice = "Aún no hay histórico agregado; se muestran las últimas 4 horas."
+                rango = 'Últimas 4 Horas'
+            else:
+                df_energia = df_trend[df_trend['variable'] == 'energia_kW']
+
+        if df_trend.empty:
+            # Pre-procesamiento para gráficos: solo las últimas 4 horas, cada serie reducida en el backend
+            # a un presupuesto de puntos acorde al ancho del gráfico (en formato largo, como el melt original)
+            window_start = latest_timestamp - pd.Timedelta(hours=4)
+            df_trend = chart_series(df_data, edificio, window_start, latest_timestamp, ['temp_C', 'humedad_pct'])
+            # El gráfico de energía ocupa la columna completa: el doble de puntos
+            df_energia = chart_series(df_data, edificio, window_start, latest_timestamp, ['energia_kW'], budget=2 * CHART_POINTS)
+
+    # Gráfico de Temperatura (CON LÍNEAS DE UMBRAL)
+    fig_temp = px.line(
+        df_trend[df_trend['variable'] == 'temp_C'],
+        x='timestamp',
+        y='valor',
+        color='piso',
+        title='Temperatura (°C) - Predicción y Umbrales',
+        line_dash='piso'
+    )
+
+    # --- AÑADIR LÍNEAS DE UMBRAL DE TEMPERATURA ---
+    fig_temp.add_hline(
+        y=UMBRALES['temp_C']['Critica']['min'], 
+        line_dash="dash", 
+        line_color="red",
+        annotation_text=f"Crítica ({UMBRALES['temp_C']['Critica']['min']}°C)",
+        annotation_position="top left"
     )
-    
-    st.markdown(
-        f"""
-        <style>
-            [data-testid="stMetricValue"]:has(div:contains("{level}")) {{
-                color: {color_map.get(level, 'gray')} !important;
-            }}
-        </style>
-        """,
-        unsafe_allow_html=True
+    fig_temp.add_hline(
+        y=UMBRALES['temp_C']['Media']['min'], 
+        line_dash="dot", 
+        line_color="orange",
+        annotation_text=f"Media ({UMBRALES['temp_C']['Media']['min']}°C)",
+        annotation_position="bottom right"
     )
 
-st.divider()
+    # Agregar línea de predicción como anotación
+    for piso, pred in zip(df_pred['piso'], df_pred['temp_C']):
+        if piso in PISOS_MONITOREADOS and pd.notna(pred):
+            fig_temp.add_annotation(
+                x=latest_timestamp + pd.Timedelta(minutes=60),
+                y=pred,
+                text=f"P{piso}: {pred}°C (Pred)",
+                showarrow=True,
+                arrowhead=2,
+                arrowsize=1,
+                arrowwidth=2,
+                font=dict(color="red" if pred >= UMBRALES['temp_C']['Media']['min'] else "blue")
+            )
+
+    fig_temp.update_xaxes(range=[window_start, latest_timestamp + pd.Timedelta(minutes=65)])
+
+    # Gráfico de Humedad (CON LÍNEAS DE UMBRAL)
+    fig_hum = px.line(
+        df_trend[df_trend['variable'] == 'humedad_pct'],
+        x='timestamp',
+        y='valor',
+        color='piso',
+        title='Humedad Relativa (%) - Predicción y Umbrales',
+        line_dash='piso'
+    )
 
-# --- 7. GRÁFICOS DE TENDENCIA (ÚLTIMAS 4 HORAS) ---
-st.subheader("Tendencias Recientes (Últimas 4 Horas)")
+    # --- AÑADIR LÍNEAS DE UMBRAL DE HUMEDAD ---
+    fig_hum.add_hline(
+        y=UMBRALES['humedad_pct']['Critica']['high'], 
+        line_dash="dash", 
+        line_color="red",
+        annotation_text=f"Crítica Alta ({UMBRALES['humedad_pct']['Critica']['high']}%)",
+        annotation_position="top left"
+    )
+    fig_hum.add_hline(
+        y=UMBRALES['humedad_pct']['Critica']['low'], 
+        line_dash="dash", 
+        line_color="red",
+        annotation_text=f"Crítica Baja ({UMBRALES['humedad_pct']['Critica']['low']}%)",
+        annotation_position="bottom right"
+    )
 
-col1, col2 = st.columns(2)
+    # Agregar predicción de humedad como anotación
+    for piso, pred in zip(df_pred['piso'], df_pred['humedad_pct']):
+        if piso in PISOS_MONITOREADOS and pd.notna(pred):
+            fuera_de_rango = pred < UMBRALES['humedad_pct']['Media']['low'] or pred > UMBRALES['humedad_pct']['Media']['high']
+            fig_hum.add_annotation(
+                x=latest_timestamp + pd.Timedelta(minutes=60),
+                y=pred,
+                text=f"P{piso}: {pred}% (Pred)",
+                showarrow=True,
+                arrowhead=2,
+                arrowsize=1,
+                arrowwidth=2,
+                font=dict(color="red" if fuera_de_rango else "blue")
+            )
+
+    fig_hum.update_xaxes(range=[window_start, latest_timestamp + pd.Timedelta(minutes=65)])
+
+    # Gráfico de Energía (columna completa)
+    fig_energia = px.line(
+        df_energia,
+        x='timestamp',
+        y='valor',
+        color='piso',
+        title='Consumo de Energía (kW)',
+        line_dash='piso'
+    )
 
-# Gráfico de Temperatura (CON LÍNEAS DE UMBRAL)
-fig_temp = px.line(
-    df_4_hours[df_4_hours['variable'] == 'temp_C'],
-    x='timestamp',
-    y='valor',
-    color='piso',
-    title='Temperatura (°C) - Predicción y Umbrales',
-    line_dash='piso'
-)
+    # --- AÑADIR LÍNEA DE UMBRAL DE ENERGÍA ---
+    fig_energia.add_hline(
+        y=UMBRALES['energia_kW']['Critica'],
+        line_dash="dash",
+        line_color="red",
+        annotation_text=f"Sobrecarga Crítica ({UMBRALES['energia_kW']['Critica']}kW)"
+    )
+    return rango, notice, fig_temp, fig_hum, fig_energia
 
-# --- AÑADIR LÍNEAS DE UMBRAL DE TEMPERATURA ---
-fig_temp.add_hline(
-    y=UMBRALES['temp_C']['Critica']['min'], 
-    line_dash="dash", 
-    line_color="red",
-    annotation_text=f"Crítica ({UMBRALES['temp_C']['Critica']['min']}°C)",
-    annotation_position="top left"
-)
-fig_temp.add_hline(
-    y=UMBRALES['temp_C']['Media']['min'], 
-    line_dash="dot", 
-    line_color="orange",
-    annotation_text=f"Media ({UMBRALES['temp_C']['Media']['min']}°C)",
-    annotation_position="bottom right"
-)
+@st.fragment(run_every=REFRESH_EVERY)
+def trend_charts(edificio, rango):
+    data = get_data_and_alerts()
+    if data[0].empty:
+        return
 
-# Agregar línea de predicción como anotación
-for piso in PISOS_MONITOREADOS:
-    pred = predict_60_min_ma(df_data, piso, 'temp_C')
-    if pred is not None:
-        fig_temp.add_annotation(
-            x=latest_timestamp + pd.Timedelta(minutes=60),
-            y=pred,
-            text=f"P{piso}: {pred}°C (Pred)",
-            showarrow=True,
-            arrowhead=2,
-            arrowsize=1,
-            arrowwidth=2,
-            font=dict(color="red" if pred >= UMBRALES['temp_C']['Media']['min'] else "blue")
-        )
+    # Las figuras de Plotly solo se reconstruyen si hay lecturas nuevas (o cambió el edificio/rango)
+    shown_rango, notice, fig_temp, fig_hum, fig_energia = session_section(
+        'tendencias', (edificio, rango, data_watermark(data)), lambda: build_trend_figures(data, edificio, rango))
 
-fig_temp.update_xaxes(range=[df_4_hours['timestamp'].min(), latest_timestamp + pd.Timedelta(minutes=65)])
-col1.plotly_chart(fig_temp, use_container_width=True)
-
-# Gráfico de Humedad (CON LÍNEAS DE UMBRAL)
-fig_hum = px.line(
-    df_4_hours[df_4_hours['variable'] == 'humedad_pct'],
-    x='timestamp',
-    y='valor',
-    color='piso',
-    title='Humedad Relativa (%) - Umbrales de Confort',
-    line_dash='piso'
-)
+    if notice:
+        st.caption(notice)
+    st.subheader(f"Tendencias Recientes ({shown_rango})")
+    col1, col2 = st.columns(2)
+    col1.plotly_chart(fig_temp, use_container_width=True, key='fig_temp')
+    col2.plotly_chart(fig_hum, use_container_width=True, key='fig_hum')
 
-# --- AÑADIR LÍNEAS DE UMBRAL DE HUMEDAD ---
-fig_hum.add_hline(
-    y=UMBRALES['humedad_pct']['Critica']['high'], 
-    line_dash="dash", 
-    line_color="red",
-    annotation_text=f"Crítica Alta ({UMBRALES['humedad_pct']['Critica']['high']}%)",
-    annotation_position="top left"
-)
-fig_hum.add_hline(
-    y=UMBRALES['humedad_pct']['Critica']['low'], 
-    line_dash="dash", 
-    line_color="red",
-    annotation_text=f"Crítica Baja ({UMBRALES['humedad_pct']['Critica']['low']}%)",
-    annotation_position="bottom right"
-)
+    st.subheader("Consumo Eléctrico (kW)")
+    st.plotly_chart(fig_energia, use_container_width=True, key='fig_energia')
 
-col2.plotly_chart(fig_hum, use_container_width=True)
+trend_charts(edificio, rango)
 
 
-# Gráfico de Energía (columna completa)
-st.subheader("Consumo Eléctrico (kW)")
-fig_energia = px.line(
-    df_4_hours[df_4_hours['variable'] == 'energia_kW'],
-    x='timestamp',
-    y='valor',
-    color='piso',
-    title='Consumo de Energía (kW)',
-    line_dash='piso'
-)
+# --- 9. TABLA DE ALERTAS, FILTROS E HISTORIAL DE TRANSICIONES ---
+ACTIVE_TABLE_COLUMNS = ['desde', 'piso', 'variable', 'nivel', 'valor', 'recomendacion', 'tipo']
 
-# --- AÑADIR LÍNEA DE UMBRAL DE ENERGÍA ---
-fig_energia.add_hline(
-    y=UMBRALES['energia_kW']['Critica'],
-    line_dash="dash",
-    line_color="red",
-    annotation_text=f"Sobrecarga Crítica ({UMBRALES['energia_kW']['Critica']}kW)"
-)
+@st.fragment(run_every=REFRESH_EVERY)
+def alert_tables(edificio):
+    data = get_data_and_alerts()
+    if data[0].empty:
+        return
 
-st.plotly_chart(fig_energia, use_container_width=True)
+    st.subheader("Tabla de Alertas Activas")
 
+    # Los filtros viven dentro del fragmento: cambiarlos solo vuelve a ejecutar esta sección
+    cols_filter = st.columns(2)
+    selected_piso = cols_filter[0].multiselect(
+        "Filtrar por Piso:",
+        options=PISOS_MONITOREADOS,
+        default=PISOS_MONITOREADOS,
+        format_func=lambda x: f"Piso {x}"
+    )
 
-# --- 8. TABLA DE ALERTAS Y FILTROS ---
-st.subheader("Tabla de Alertas Activas")
+    selected_nivel = cols_filter[1].multiselect(
+        "Filtrar por Nivel de Alerta:",
+        options=ALERT_LEVELS[:0:-1], # De mayor a menor severidad
+        default=['Crítica', 'Media', 'Preventiva Media']
+    )
 
-cols_filter = st.columns(2)
-selected_piso = cols_filter[0].multiselect(
-    "Filtrar por Piso:",
-    options=PISOS_MONITOREADOS,
-    default=PISOS_MONITOREADOS,
-    format_func=lambda x: f"Piso {x}"
-)
+    def build():
+        # Umbrales de T/H/Energía: alertas abiertas del motor con estado (una fila por (piso, variable),
+        # sin parpadeo). Preventiva, riesgo combinado y anomalías: las del último ciclo de generate_alerts.
+        df_active = data[2][data[2]['edificio'] == edificio].assign(tipo='Actual')
+        df_snapshot = data[1][data[1]['edificio'] == edificio]
+        df_snapshot = df_snapshot[~((df_snapshot['tipo'] == 'Actual') & df_snapshot['variable'].isin(get_rules().variables))]
+        df_snapshot = df_snapshot.rename(columns={'timestamp': 'desde'}).assign(valor=float('nan'))
+        df_alerts = pd.concat([df[ACTIVE_TABLE_COLUMNS] for df in (df_active, df_snapshot) if not df.empty]
+                              or [pd.DataFrame(columns=ACTIVE_TABLE_COLUMNS)], ignore_index=True)
+        df_history = data[3][data[3]['edificio'] == edificio]
+        df_filtered_alerts = df_alerts[
+            df_alerts['piso'].isin(selected_piso) & 
+            df_alerts['nivel'].isin(selected_nivel)
+        ]
+        # 'nivel' es un categórico ordenado por severidad: se ordena por sus códigos
+        df_display = df_filtered_alerts.assign(nivel=lambda d: as_levels(d['nivel'])).sort_values(
+            by='nivel', ascending=False, kind='stable')
+        df_history = df_history[df_history['piso'].isin(selected_piso)]
+        return df_display, df_history
+
+    df_display, df_history = session_section(
+        'alertas', (edificio, tuple(selected_piso), tuple(selected_nivel), data_watermark(data)), build)
+
+    if df_display.empty:
+        st.info("No hay alertas activas que coincidan con los filtros seleccionados.")
+    else:
+        st.dataframe(
+            df_display,
+            use_container_width=True,
+            column_config={
+                "desde": st.column_config.DatetimeColumn("Activa Desde", format="YYYY-MM-DD HH:mm"),
+                "piso": st.column_config.NumberColumn("Piso", format="%d"),
+                "variable": "Variable",
+                "nivel": st.column_config.TextColumn("Nivel de Riesgo"),
+                "valor": "Lectura",
+                "recomendacion": "Recomendación/Acción",
+                "tipo": "Tipo de Alerta"
+            }
+        )
 
-selected_nivel = cols_filter[1].multiselect(
-    "Filtrar por Nivel de Alerta:",
-    options=['Crítica', 'Media', 'Informativa', 'Preventiva Media', 'Preventiva Crítica'],
-    default=['Crítica', 'Media', 'Preventiva Media']
-)
+    # Motor de alertas con estado
+    st.subheader("Historial de Transiciones de Alertas")
+
+    if df_history.empty:
+        st.info("Sin aperturas, escalamientos ni cierres de alertas para los pisos seleccionados.")
+    else:
+        st.dataframe(
+            df_history.iloc[::-1][['timestamp', 'piso', 'variable', 'evento', 'nivel_anterior', 'nivel', 'valor', 'desde']],
+            use_container_width=True,
+            column_config={
+                "timestamp": st.column_config.DatetimeColumn("Hora", format="YYYY-MM-DD HH:mm:ss"),
+                "piso": st.column_config.NumberColumn("Piso", format="%d"),
+                "variable": "Variable",
+                "evento": "Transición",
+                "nivel_anterior": "Nivel Anterior",
+                "nivel": "Nivel",
+                "valor": "Lectura",
+                "desde": st.column_config.DatetimeColumn("Condición Desde", format="YYYY-MM-DD HH:mm:ss"),
+            }
+        )
 
-df_filtered_alerts = df_alerts[
-    df_alerts['piso'].isin(selected_piso) & 
-    df_alerts['nivel'].isin(selected_nivel)
-]
-
-if df_filtered_alerts.empty:
-    st.info("No hay alertas activas que coincidan con los filtros seleccionados.")
-else:
-    level_map = {'Crítica': 4, 'Preventiva Crítica': 3.5, 'Media': 3, 'Preventiva Media': 2.5, 'Informativa': 2, 'OK': 1}
-    df_display = df_filtered_alerts[[
-        'timestamp', 'piso', 'variable', 'nivel', 'recomendacion', 'tipo'
-    ]].sort_values(by='nivel', key=lambda x: x.map(level_map), ascending=False)
-    
-    st.dataframe(
-        df_display,
-        use_container_width=True,
-        column_config={
-            "timestamp": st.column_config.DatetimeColumn("Hora de Alerta", format="YYYY-MM-DD HH:mm"),
-            "piso": st.column_config.NumberColumn("Piso", format="%d"),
-            "variable": "Variable",
-            "nivel": st.column_config.TextColumn("Nivel de Riesgo"),
-            "recomendacion": "Recomendación/Acción",
-            "tipo": "Tipo de Alerta"
-        }
-    )
\ No newline at end of file
+alert_tables(edificio)
+
+
+# --- 10. PANEL DE DIAGNÓSTICO (INSTRUMENTACIÓN) ---
+if st.sidebar.checkbox("Diagnóstico de rendimiento", value=False):
+    @st.fragment(run_every=REFRESH_EVERY)
+    def diagnostics_panel():
+        st.divider()
+        st.subheader("Diagnóstico de Rendimiento (este proceso)")
+        cols = st.columns(2)
+        enabled = cols[0].toggle("Instrumentación activa", value=metrics.is_enabled())
+        metrics.set_enabled(enabled)
+        if cols[1].button("Perfilar el próximo ciclo de recarga (cProfile)"):
+            metrics.request_profile()
+            get_data_and_alerts.clear() # Fuerza la recarga en el próximo refresco
+
+        stages = pd.DataFrame(metrics.stage_table(),
+                              columns=['etapa', 'llamadas', 'media_ms', 'p50_ms', 'p95_ms', 'ultima_ms'])
+        if stages.empty:
+            st.info("Sin mediciones todavía.")
+        else:
+            st.dataframe(stages.sort_values('p95_ms', ascending=False), use_container_width=True, hide_index=True)
+        counters = pd.DataFrame(metrics.counter_table(), columns=['contador', 'etiquetas', 'valor'])
+        if not counters.empty:
+            st.dataframe(counters, use_container_width=True, hide_index=True)
+
+        profile = metrics.last_profile()
+        if profile is not None:
+            path, summary = profile
+            st.caption(f"Último perfil: {path}")
+            st.code(summary)
+
+    diagnostics_panel()
@@ -0,0 +1,168 @@
+# =========================================================
+# MÓDULO: alert_daemon.py (BACKEND - DAEMON DE ALERTAS SIN INTERFAZ)
+# Propósito: Ejecutar el ciclo ingesta -> predicción -> alertas con su propio
+# período, aunque nadie tenga el dashboard abierto, y publicar los resultados
+# (estado por piso, alertas, transiciones, predicciones) en ALERTS_DIR.
+# No importa Streamlit ni Plotly; pandas y el backend se importan al arrancar
+# el ciclo (la ayuda de la línea de comandos responde sin cargarlos).
+# Uso (desde la raíz):
+#   python -m backend.alert_daemon
+#   python -m backend.alert_daemon --intervalo 2 --origen ring
+#   python -m backend.alert_daemon --una-vez
+#   python -m backend.alert_daemon --una-vez --perfilar   (cProfile del ciclo en METRICS_DIR)
+#   python -m backend.alert_daemon --procesos 4   (predicción + alertas repartidas en 4 procesos)
+# =========================================================
+
+import argparse
+import time
+
+_T0 = time.perf_counter()
+
+from configuracion.config import ALERTS_DIR, DAEMON_INTERVAL_SECONDS, DATA_SOURCE, DATA_DIR, SHARD_WORKERS
+
+CPU_REPORT_SECONDS = 60.0 # Cada cuánto se informa el uso de CPU del daemon
+
+
+class AlertDaemon:
+    """
+    Un ciclo (`run_once`) lee solo las lecturas nuevas del almacén o del
+    buffer compartido; si no hubo lecturas nuevas ni cambio de reglas no
+    recalcula nada y solo marca el latido. Si las hubo, actualiza las
+    predicciones, las alertas vigentes (que además activan la corrección en
+    el simulador), el motor de alertas con estado y el estado por piso, y
+    publica una versión nueva.
+    Con `workers` > 0, la predicción y las alertas se evalúan en ese número de
+    procesos (ver backend/sharding.py); el motor con estado sigue en este.
+    """
+
+    def __init__(self, output=ALERTS_DIR, source=DATA_SOURCE, data_dir=DATA_DIR, workers=SHARD_WORKERS):
+        from backend import core_logic, metrics
+        from backend.alert_store import AlertStore
+
+        self.core = core_logic
+        self.metrics = metrics
+        self.store = AlertStore(core_logic._resolve_data_path(output))
+        self.source = source
+        self.data_dir = data_dir
+        self.sharded = None
+        if workers > 0:
+            from backend.sharding import ShardedEvaluator
+            self.sharded = ShardedEvaluator(workers).start()
+        self.startup_seconds = time.perf_counter() - _T0 # Importaciones y conexión, antes del primer ciclo
+        self._last_frame = None
+        self._last_rules = None
+        self.cycles = 0
+        self.published = 0
+
+    def run_once(self):
+        """Ejecuta un ciclo. Retorna la versión publicada o None si no hubo cambios."""
+        with self.metrics.profile_cycle('daemon'), self.metrics.timed('daemon_ciclo'):
+            version = self._cycle()
+        self.metrics.export('daemon') # Archivo <METRICS_DIR>/daemon.prom (a lo sumo cada METRICS_EXPORT_SECONDS)
+        return version
+
+    def _cycle(self):
+        core = self.core
+        self.cycles += 1
+        df = core.load_and_prepare_data(self.data_dir, source=self.source)
+        rules = core.get_rules()
+        if df.empty or (df is self._last_frame and rules is self._last_rules):
+            self.store.heartbeat()
+            return None
+
+        if self.sharded is not None:
+            df_alerts, forecast, critical_keys, shifts = self.sharded.evaluate(df)
+            self.metrics.count('alertas_emitidas', len(df_alerts))
+        else:
+            df_alerts, critical_keys, shifts = core.evaluate_alert_cycle(df) # Usa las predicciones ya sincronizadas con df
+            forecast = core.get_predictions(df)
+        core.apply_alert_actions(critical_keys, shifts) # Correcciones y plan de redistribución para el simulador
+        active, _ = core.update_alert_state(df)
+        keys = list(dict.fromkeys(zip(df['edificio'].to_numpy(), df['piso'].to_numpy().tolist())))
+        status = core.get_floor_status_table(df_alerts, sorted(keys))
+
+        meta = {
+            'last_reading': str(df.index.max()),
+            'published_at': time.time(),
+            'rules_version': rules.version,
+            'startup_seconds': self.startup_seconds,
+        }
+        frames = {
+            'alerts': df_alerts,
+            'active': active,
+            'events': core.get_alert_history(),
+            'forecast': forecast,
+            'status': status,
+        }
+        version = self.store.publish(frames, meta)
+        self._last_frame, self._last_rules = df, rules
+        self.published += 1
+        return version
+
+    def close(self):
+        if self.sharded is not None:
+            self.sharded.close()
+
+    def run(self, interval=DAEMON_INTERVAL_SECONDS, once=False, profile=False):
+        """
+        Ciclo principal: un `run_once` cada `interval` segundos, con reporte
+        periódico de CPU. Con `profile` el primer ciclo se perfila con cProfile.
+        """
+        if profile:
+            self.metrics.request_profile()
+        t0 = time.perf_counter()
+        version = self.run_once()
+        print(f"🚀 Daemon de alertas listo en {self.startup_seconds * 1000:.0f} ms; primer ciclo en "
+              f"{(time.perf_counter() - t0) * 1000:.0f} ms (publicando en '{self.store.directory}').")
+        if profile and self.metrics.last_profile() is not None:
+            path, summary = self.metrics.last_profile()
+            print(f"🔬 Perfil del primer ciclo guardado en '{path}':\n{summary}")
+        if once:
+            return version
+
+        wall0, cpu0 = time.monotonic(), time.process_time()
+        next_tick = time.monotonic() + interval
+        while True:
+            time.sleep(max(0.0, next_tick - time.monotonic()))
+            next_tick += interval
+            try:
+                version = self.run_once()
+            except Exception as e:
+                print(f"ERROR en el ciclo del daemon: {e}")
+                continue
+            if version is not None:
+                print(f"📣 Publicada versión {version} ({self.published} en total).")
+
+            wall = time.monotonic() - wall0
+            if wall >= CPU_REPORT_SECONDS:
+                cpu = time.process_time() - cpu0
+                print(f"⏱️  CPU del daemon: {100 * cpu / wall:.2f}% en los últimos {wall:.0f}s "
+                      f"({self.cycles} ciclos, {self.published} publicaciones).")
+                wall0, cpu0 = time.monotonic(), time.process_time()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Daemon de alertas SmartFloors (sin interfaz).")
+    parser.add_argument('--intervalo', type=float, default=DAEMON_INTERVAL_SECONDS,
+                        help="Segundos entre ciclos.")
+    parser.add_argument('--origen', choices=['store', 'ring'], default=DATA_SOURCE,
+                        help="Lecturas desde el almacén en disco o desde el buffer compartido.")
+    parser.add_argument('--datos', default=DATA_DIR, help="Directorio del almacén de lecturas (relativo a la raíz).")
+    parser.add_argument('--salida', default=ALERTS_DIR, help="Directorio de publicación (relativo a la raíz).")
+    parser.add_argument('--una-vez', action='store_true', help="Ejecutar un solo ciclo y terminar.")
+    parser.add_argument('--perfilar', action='store_true', help="Perfilar el primer ciclo con cProfile.")
+    parser.add_argument('--procesos', type=int, default=SHARD_WORKERS,
+                        help="Procesos para predicción + alertas (0: en el mismo proceso).")
+    args = parser.parse_args(argv)
+
+    daemon = AlertDaemon(args.salida, args.origen, args.datos, args.procesos)
+    try:
+        daemon.run(args.intervalo, once=args.una_vez, profile=args.perfilar)
+    except KeyboardInterrupt:
+        print("\nDaemon de alertas detenido.")
+    finally:
+        daemon.close()
+
+
+if __name__ == '__main__':
+    main()
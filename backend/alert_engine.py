@@ -0,0 +1,232 @@
+# =========================================================
+# MÓDULO: alert_engine.py (BACKEND - MOTOR DE ALERTAS CON ESTADO)
+# Propósito: Máquina de estados por (edificio, piso, variable) que consume
+# solo las lecturas nuevas y emite únicamente transiciones (apertura,
+# escalamiento, desescalamiento, cierre), con histéresis y duraciones
+# mínimas para evitar el parpadeo alrededor de los umbrales.
+# =========================================================
+
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from configuracion.config import (ALERT_HYSTERESIS, ALERT_MIN_OPEN_SECONDS, ALERT_MIN_CLEAR_SECONDS,
+                                  ALERT_HISTORY_SIZE)
+from backend.predictor import StreamingSeriesModel, occurrence_rounds
+from backend.schema import exact_readings
+
+EVENT_COLUMNS = ['timestamp', 'edificio', 'piso', 'variable', 'nivel', 'evento', 'nivel_anterior', 'valor',
+                 'desde', 'recomendacion']
+ACTIVE_COLUMNS = ['edificio', 'piso', 'variable', 'nivel', 'desde', 'valor', 'recomendacion']
+
+OPEN, ESCALATE, DEESCALATE, CLEAR = 'apertura', 'escalamiento', 'desescalamiento', 'cierre'
+NO_LEVEL = -1
+NO_LEVEL_NAME = 'OK'
+NS_PER_SECOND = 10**9
+ENGINE_WARMUP = 24 # Lecturas por serie para reconstruir el estado tras un reinicio del historial
+
+
+class AlertEngine(StreamingSeriesModel):
+    """
+    Estado de alerta de todas las series a la vez.
+
+    Cada (edificio, piso) ocupa una fila y cada variable una columna de los
+    arreglos de estado: nivel activo (índice en el orden de UMBRALES, que va
+    de menor a mayor severidad), dirección del cambio pendiente y desde cuándo
+    se sostiene.
+
+    - Subir de nivel usa los umbrales exactos; bajar exige que la lectura
+      recupere además el margen de histéresis de la variable.
+    - Un cambio se confirma solo si la lectura se mantiene por encima (o por
+      debajo) del nivel activo durante `min_open_seconds` (subidas) o
+      `min_clear_seconds` (bajadas); se pasa al nivel que corresponde en ese momento.
+    - Se evalúa el nivel más severo que se cumple (a diferencia de
+      generate_alerts, que conserva la regla original de primer nivel en orden).
+    """
+
+    warmup = ENGINE_WARMUP
+
+    def __init__(self, rules, hysteresis=ALERT_HYSTERESIS, min_open_seconds=ALERT_MIN_OPEN_SECONDS,
+                 min_clear_seconds=ALERT_MIN_CLEAR_SECONDS, history_size=ALERT_HISTORY_SIZE, capacity=16):
+        self.rules = rules
+        self.hysteresis = hysteresis
+        self.min_open = int(min_open_seconds * NS_PER_SECOND)
+        self.min_clear = int(min_clear_seconds * NS_PER_SECOND)
+        self.history = deque(maxlen=history_size)
+        self._new_events = 0
+        super().__init__(rules.variables, capacity)
+
+    def set_rules(self, rules):
+        """
+        Adopta un RuleSet nuevo (recarga en caliente). Los niveles activos se
+        conservan por nombre; los que ya no existen se descartan sin emitir
+        transiciones y se reevalúan con la siguiente lectura. Si cambian las
+        variables, el estado se reasigna por columna: las variables nuevas
+        empiezan sin alerta y las eliminadas se descartan (también sin transiciones).
+        """
+        if rules is self.rules:
+            return
+        if list(rules.variables) != self.variables:
+            self._set_variables(rules.variables)
+        for j, var in enumerate(self.variables):
+            old_names = list(self.rules.compiled[var]['levels']) if var in self.rules.compiled else []
+            new_names = list(rules.compiled[var]['levels']) if var in rules.compiled else []
+            remap = np.array([new_names.index(name) if name in new_names else NO_LEVEL for name in old_names] + [NO_LEVEL])
+            self._level[:, j] = remap[self._level[:, j]]
+            self._pending[:, j] = 0
+        self.rules = rules
+
+    def _set_variables(self, variables):
+        """Reasigna los arreglos de estado a `variables`, copiando las columnas de las que se conservan."""
+        old = {name: value for name, value in vars(self).items()
+               if isinstance(value, np.ndarray) and value.shape == (self._capacity, len(self.variables))}
+        old_columns = {var: j for j, var in enumerate(self.variables)}
+        self.variables = list(variables)
+        self._allocate(self._capacity)
+        for j, var in enumerate(self.variables):
+            if var in old_columns:
+                for name, value in old.items():
+                    getattr(self, name)[:, j] = value[:, old_columns[var]]
+
+    def _allocate(self, capacity):
+        shape = (capacity, len(self.variables))
+        self._level = np.full(shape, NO_LEVEL, dtype=np.int64)
+        self._pending = np.zeros(shape, dtype=np.int64) # +1 subida / -1 bajada / 0 sin cambio pendiente
+        self._pending_since = np.zeros(shape, dtype=np.int64)
+        self._since = np.zeros(shape, dtype=np.int64)
+        self._side = np.zeros(shape, dtype=np.int64)
+        self._value = np.full(shape, np.nan)
+
+    # ------------------- EVALUACIÓN -------------------
+
+    def _candidate(self, var, values, current):
+        """Nivel al que debería pasar cada serie (con histéresis para bajar) y lado del rango (0 bajo / 1 alto)."""
+        rules = self.rules.compiled[var]
+        margin = self.hysteresis.get(var, 0.0)
+        v = values[:, None]
+        n_levels = len(rules['levels'])
+
+        below = v < rules['low']
+        above = np.where(rules['high_inclusive'], v >= rules['high'], v > rules['high'])
+        hits = below | above
+        raw = np.where(hits.any(axis=1), n_levels - 1 - hits[:, ::-1].argmax(axis=1), NO_LEVEL)
+
+        relaxed_below = v < rules['low'] + margin
+        relaxed_above = np.where(rules['high_inclusive'], v >= rules['high'] - margin, v > rules['high'] - margin)
+        relaxed = relaxed_below | relaxed_above
+        held = np.where(relaxed.any(axis=1), n_levels - 1 - relaxed[:, ::-1].argmax(axis=1), NO_LEVEL)
+
+        candidate = np.where(raw >= current, raw, np.maximum(raw, np.minimum(current, held)))
+        candidate = np.where(np.isnan(values), current, candidate)
+        level = np.maximum(candidate, 0)
+        side = np.where(relaxed_below[np.arange(len(values)), level], 0, 1)
+        return candidate, side
+
+    def _step(self, slots, values, times):
+        """Avanza una ronda (una lectura por serie, sin repetir) y registra las transiciones."""
+        for j, var in enumerate(self.variables):
+            current = self._level[slots, j]
+            candidate, side = self._candidate(var, values[:, j], current)
+            self._value[slots, j] = values[:, j]
+
+            direction = np.sign(candidate - current)
+            changed = direction != 0
+            since = np.where(changed & (direction != self._pending[slots, j]), times, self._pending_since[slots, j])
+            required = np.where(direction > 0, self.min_open, self.min_clear)
+            fire = changed & (times - since >= required)
+
+            self._pending[slots, j] = np.where(fire, 0, direction)
+            self._pending_since[slots, j] = since
+            if not fire.any():
+                continue
+
+            fired = slots[fire]
+            new_level, old_level = candidate[fire], current[fire]
+            self._level[fired, j] = new_level
+            self._side[fired, j] = side[fire]
+            opened = old_level == NO_LEVEL
+            self._since[fired[opened], j] = since[fire][opened]
+            self._record(fired, j, new_level, old_level, side[fire], values[fire, j], times[fire])
+
+    # ------------------- SALIDAS -------------------
+
+    def _level_names(self, var, levels):
+        names = np.append(self.rules.compiled[var]['levels'], NO_LEVEL_NAME)
+        return names[np.where(levels >= 0, levels, len(names) - 1)]
+
+    def _recommendations(self, var, levels, sides, pisos):
+        levels, pisos = np.asarray(levels), np.asarray(pisos)
+        texts = np.full(len(levels), '', dtype=object)
+        active = levels >= 0
+        if active.any():
+            templates = self.rules.level_templates(var, levels[active], np.asarray(sides)[active])
+            texts[active] = self.rules.recommendations(templates, pisos[active])
+        return texts
+
+    def _record(self, slots, j, new_level, old_level, sides, values, times):
+        var = self.variables[j]
+        events = np.where(old_level == NO_LEVEL, OPEN,
+                          np.where(new_level == NO_LEVEL, CLEAR,
+                                   np.where(new_level > old_level, ESCALATE, DEESCALATE)))
+        keys = [self._keys[s] for s in slots]
+        pisos = [k[1] for k in keys]
+        rows = zip(
+            pd.to_datetime(times), [k[0] for k in keys], pisos, [var] * len(slots),
+            self._level_names(var, new_level), events, self._level_names(var, old_level), np.round(values, 2),
+            pd.to_datetime(self._since[slots, j]), self._recommendations(var, new_level, sides, pisos),
+        )
+        self.history.extend(rows)
+        self._new_events += len(slots)
+
+    def sync(self, df):
+        self._new_events = 0
+        super().sync(df)
+
+    def update(self, df):
+        """
+        Incorpora lecturas nuevas (DataFrame indexado por timestamp con
+        'edificio', 'piso' y las variables) por rondas vectorizadas, en orden
+        de tiempo. Retorna las transiciones emitidas.
+        """
+        if df.empty:
+            return pd.DataFrame(columns=EVENT_COLUMNS)
+        df = df.sort_index(kind='stable')
+        slots = self.register(list(zip(df['edificio'].to_numpy(), df['piso'].to_numpy())))
+        values = exact_readings(df[self.variables])
+        times = df.index.to_numpy().astype('datetime64[ns]').astype(np.int64)
+        before = self._new_events
+        for positions in occurrence_rounds(slots):
+            self._step(slots[positions], values[positions], times[positions])
+        return self.recent_events(self._new_events - before)
+
+    def recent_events(self, n=None):
+        """Transiciones emitidas por la última llamada a sync (o las últimas `n`)."""
+        n = self._new_events if n is None else n
+        n = min(n, len(self.history))
+        rows = list(self.history)[len(self.history) - n:] if n else []
+        return pd.DataFrame(rows, columns=EVENT_COLUMNS)
+
+    def events(self):
+        """Historial acotado de transiciones (las más antiguas se descartan)."""
+        return pd.DataFrame(list(self.history), columns=EVENT_COLUMNS)
+
+    def active(self):
+        """Alertas abiertas: una fila por (edificio, piso, variable) con su nivel actual y desde cuándo."""
+        n = len(self._keys)
+        rows, cols = np.nonzero(self._level[:n] >= 0)
+        if len(rows) == 0:
+            return pd.DataFrame(columns=ACTIVE_COLUMNS)
+        keys = [self._keys[r] for r in rows]
+        pisos = [k[1] for k in keys]
+        frame = pd.DataFrame({
+            'edificio': [k[0] for k in keys],
+            'piso': pisos,
+            'variable': [self.variables[c] for c in cols],
+            'nivel': [self.rules.compiled[self.variables[c]]['levels'][self._level[r, c]] for r, c in zip(rows, cols)],
+            'desde': pd.to_datetime(self._since[rows, cols]),
+            'valor': np.round(self._value[rows, cols], 2),
+            'recomendacion': [self._recommendations(self.variables[c], [self._level[r, c]], [self._side[r, c]], [p])[0]
+                              for r, c, p in zip(rows, cols, pisos)],
+        })
+        return frame.sort_values(['edificio', 'piso', 'variable'], kind='stable').reset_index(drop=True)
@@ -0,0 +1,124 @@
+# =========================================================
+# MÓDULO: alert_store.py (BACKEND - RESULTADOS PUBLICADOS DE ALERTAS)
+# Propósito: Directorio donde el daemon de alertas publica cada ciclo el estado
+# por piso, las alertas vigentes, las alertas abiertas del motor con estado,
+# el historial de transiciones y las predicciones. El dashboard (y cualquier
+# otro consumidor) solo lee.
+# =========================================================
+
+import glob
+import json
+import os
+import time
+
+import pandas as pd
+
+from backend import metrics
+
+MANIFEST_NAME = 'status.json'
+FRAMES = ('alerts', 'active', 'events', 'forecast', 'status')
+READ_RETRIES = 3
+KEEP_VERSIONS = 2 # Versiones retenidas en disco: un lector a mitad de lectura nunca pierde sus archivos
+
+
+def _frame_path(directory, name, version):
+    return os.path.join(directory, f'{name}.{version}.parquet')
+
+
+class AlertStore:
+    """
+    Publicación por versiones: los DataFrames de la versión N se escriben como
+    '<nombre>.N.parquet' y al final el manifiesto (status.json) se reemplaza de
+    forma atómica apuntando a N. Un lector toma la versión del manifiesto y lee
+    exactamente esos archivos: nunca mezcla dos ciclos del daemon.
+
+    Cuando no hay nada nuevo el daemon solo actualiza la fecha del manifiesto
+    (latido), sin reescribir archivos.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._cached = None # (versión, resultado) de la última lectura
+
+    # ------------------- ESCRITURA (DAEMON) -------------------
+
+    def publish(self, frames, meta):
+        """
+        Publica una versión nueva. `frames` es {nombre: DataFrame} (ver FRAMES)
+        y `meta` un diccionario serializable en JSON (se agrega 'version').
+        Retorna la versión publicada.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        version = time.time_ns() # Única también entre reinicios del daemon
+        for name, frame in frames.items():
+            path = _frame_path(self.directory, name, version)
+            frame.to_parquet(path + '.tmp', index=False)
+            os.replace(path + '.tmp', path)
+
+        manifest = dict(meta, version=version, frames=sorted(frames))
+        tmp_path = os.path.join(self.directory, MANIFEST_NAME + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, default=str)
+        os.replace(tmp_path, os.path.join(self.directory, MANIFEST_NAME))
+        self._prune(version)
+        return version
+
+    def heartbeat(self):
+        """Marca que el daemon sigue vivo aunque no haya publicado nada nuevo."""
+        try:
+            os.utime(os.path.join(self.directory, MANIFEST_NAME))
+        except FileNotFoundError:
+            pass
+
+    def _prune(self, version):
+        versions = set()
+        for path in glob.glob(os.path.join(self.directory, '*.parquet')):
+            try:
+                versions.add(int(os.path.basename(path).split('.')[1]))
+            except (IndexError, ValueError):
+                continue
+        for old in sorted(versions)[:-KEEP_VERSIONS]:
+            for name in FRAMES:
+                try:
+                    os.remove(_frame_path(self.directory, name, old))
+                except FileNotFoundError:
+                    pass
+
+    # ------------------- LECTURA (DASHBOARD) -------------------
+
+    def _read_manifest(self):
+        """Manifiesto y segundos desde el último latido. (None, None) si aún no hay publicaciones."""
+        path = os.path.join(self.directory, MANIFEST_NAME)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            age = time.time() - os.stat(path).st_mtime
+        except (FileNotFoundError, ValueError):
+            return None, None
+        return manifest, age
+
+    def read(self, max_age=None):
+        """
+        Última versión publicada: {'meta': manifiesto, nombre: DataFrame, ...}.
+        Retorna None si no hay publicaciones o si el último latido es más
+        antiguo que `max_age` segundos (daemon detenido). Mientras la versión
+        no cambie se retorna el mismo resultado sin releer los archivos.
+        """
+        for _ in range(READ_RETRIES):
+            manifest, age = self._read_manifest()
+            if manifest is None or (max_age is not None and age > max_age):
+                return None
+            version = manifest['version']
+            hit = self._cached is not None and self._cached[0] == version
+            metrics.cache_access('alertas_publicadas', hit)
+            if hit:
+                return self._cached[1]
+            try:
+                result = {name: pd.read_parquet(_frame_path(self.directory, name, version))
+                          for name in manifest['frames']}
+            except FileNotFoundError:
+                continue # Versión podada mientras se leía: se reintenta con el manifiesto nuevo
+            result['meta'] = manifest
+            self._cached = (version, result)
+            return result
+        return None
@@ -0,0 +1,122 @@
+# =========================================================
+# MÓDULO: anomaly.py (BACKEND - DETECCIÓN ESTADÍSTICA DE ANOMALÍAS)
+# Propósito: Detectar en streaming lecturas atípicas de energía y humedad
+# aunque no crucen UMBRALES (picos de consumo, saltos de ±15% de humedad):
+# z-score contra una media/varianza EWMA de cada (edificio, piso, variable)
+# para los picos y CUSUM para los cambios de nivel sostenidos. El estado son
+# arreglos (series, variables) y cada lectura lo actualiza en O(1), todas las
+# series a la vez.
+# =========================================================
+
+import numpy as np
+
+from configuracion.config import (ANOMALY_VARIABLES, ANOMALY_ALPHA, ANOMALY_Z_THRESHOLD, ANOMALY_CUSUM_K,
+                                  ANOMALY_CUSUM_H, ANOMALY_WARMUP_READINGS, ANOMALY_HOLD_READINGS,
+                                  ANOMALY_MAX_SPIKE_RUN, ANOMALY_MIN_STD)
+from backend.predictor import StreamingSeriesModel
+
+# Código por (serie, variable) -> nivel de la alerta 'Anomalía'
+ANOMALY_LEVELS = np.array([None, 'Informativa', 'Media'], dtype=object)
+NONE, SHIFT, SPIKE = 0, 1, 2
+# Desvío máximo (en desviaciones) con que una lectura mueve la línea base: acota el efecto de
+# los picos que aún no se detectan (arranque, varianza inflada) aunque sean frecuentes
+CLIP_SIGMAS = 2.0
+
+
+class AnomalyDetector(StreamingSeriesModel):
+    """
+    Por lectura y variable:
+      - z = (x - media) / desviación, con media y varianza EWMA (factor `alpha`)
+        y una desviación mínima por variable (ruido de medición).
+      - |z| >= `z_threshold` es un pico (nivel 'Media'). Los picos no entran a
+        la línea base, salvo que se repitan más de `max_spike_run` lecturas
+        seguidas: entonces es el nivel nuevo y la línea base se reancla. Las
+        demás lecturas la actualizan con el desvío recortado a CLIP_SIGMAS.
+      - CUSUM bilateral sobre z (holgura `cusum_k`, umbral `cusum_h`) detecta
+        desplazamientos sostenidos más chicos (nivel 'Informativa').
+    Una anomalía queda vigente `hold` lecturas de su serie. `levels()` da el
+    código vigente de todas las series (ver ANOMALY_LEVELS).
+    """
+
+    def __init__(self, variables=ANOMALY_VARIABLES, alpha=ANOMALY_ALPHA, z_threshold=ANOMALY_Z_THRESHOLD,
+                 cusum_k=ANOMALY_CUSUM_K, cusum_h=ANOMALY_CUSUM_H, min_readings=ANOMALY_WARMUP_READINGS,
+                 hold=ANOMALY_HOLD_READINGS, max_spike_run=ANOMALY_MAX_SPIKE_RUN, min_std=ANOMALY_MIN_STD,
+                 capacity=16):
+        self.alpha, self.z_threshold = alpha, z_threshold
+        self.cusum_k, self.cusum_h = cusum_k, cusum_h
+        self.min_readings, self.hold, self.max_spike_run = min_readings, hold, max_spike_run
+        self._min_std = np.array([min_std.get(v, 0.0) for v in variables])
+        # Al reconstruir tras un reinicio: lecturas suficientes para asentar la EWMA
+        self.warmup = max(min_readings, int(round(3 / alpha)))
+        super().__init__(variables, capacity)
+
+    def _allocate(self, capacity):
+        shape = (capacity, len(self.variables))
+        self._mean = np.zeros(shape)
+        self._var = np.zeros(shape)
+        self._counts = np.zeros(shape, dtype=np.int64)
+        self._cusum_pos = np.zeros(shape)
+        self._cusum_neg = np.zeros(shape)
+        self._spike_run = np.zeros(shape, dtype=np.int64)
+        self._hold = np.zeros(shape, dtype=np.int64)
+        self._level = np.zeros(shape, dtype=np.int8)
+        self._z = np.zeros(shape)
+
+    def _push(self, slots, values):
+        mean, var, counts = self._mean[slots], self._var[slots], self._counts[slots]
+        valid = ~np.isnan(values)
+        x = np.where(valid, values, mean)
+        ready = valid & (counts >= self.min_readings)
+
+        std = np.maximum(np.sqrt(var), self._min_std)
+        z = np.where(ready, (x - mean) / std, 0.0)
+        spike = ready & (np.abs(z) >= self.z_threshold)
+
+        # CUSUM sobre las lecturas que no son picos
+        z_cusum = np.where(spike, 0.0, z)
+        cusum_pos = np.maximum(0.0, self._cusum_pos[slots] + z_cusum - self.cusum_k)
+        cusum_neg = np.maximum(0.0, self._cusum_neg[slots] - z_cusum - self.cusum_k)
+        shift = ready & ~spike & ((cusum_pos > self.cusum_h) | (cusum_neg > self.cusum_h))
+        alarm = spike | shift
+        self._cusum_pos[slots] = np.where(alarm, 0.0, cusum_pos)
+        self._cusum_neg[slots] = np.where(alarm, 0.0, cusum_neg)
+
+        # Línea base: los picos aislados no la contaminan; una racha larga es un nivel nuevo
+        spike_run = np.where(spike, self._spike_run[slots] + 1, 0)
+        reanchor = spike_run > self.max_spike_run
+        update = valid & (~spike | reanchor)
+        first = valid & (counts == 0)
+        clip = CLIP_SIGMAS * std
+        diff = np.clip(x - mean, -clip, clip)
+        increment = self.alpha * diff
+        new_mean = np.where(reanchor | first, x, mean + increment)
+        new_var = np.where(first, 0.0, (1 - self.alpha) * (var + diff * increment))
+        self._mean[slots] = np.where(update, new_mean, mean)
+        self._var[slots] = np.where(update & ~reanchor, new_var, var)
+        self._spike_run[slots] = np.where(reanchor, 0, spike_run)
+        self._counts[slots] = counts + valid
+
+        # Anomalía vigente: la más severa de las últimas `hold` lecturas de la serie
+        hold = np.where(valid, np.maximum(self._hold[slots] - 1, 0), self._hold[slots])
+        level = np.where(hold > 0, self._level[slots], NONE)
+        new_level = np.where(spike, SPIKE, np.where(shift, SHIFT, NONE))
+        self._level[slots] = np.where(alarm, np.maximum(level, new_level), level)
+        self._hold[slots] = np.where(alarm, self.hold, hold)
+        self._z[slots] = np.where(valid, z, self._z[slots])
+
+    def _forecast(self, n):
+        """Media EWMA (línea base) de cada serie."""
+        return np.where(self._counts[:n] > 0, self._mean[:n], np.nan)
+
+    def levels(self):
+        """Código de anomalía vigente (series, variables) en el orden de registro de las series."""
+        return self._level[:len(self._keys)]
+
+    def levels_of(self, keys):
+        """Códigos vigentes para las claves (edificio, piso) pedidas; 0 para las no registradas."""
+        result = np.zeros((len(keys), len(self.variables)), dtype=np.int8)
+        rows = [(i, self._slots[k]) for i, k in enumerate(keys) if k in self._slots]
+        if rows:
+            positions, slots = np.array(rows).T
+            result[positions] = self._level[slots]
+        return result
@@ -0,0 +1,103 @@
+# =========================================================
+# MÓDULO: api_client.py (BACKEND - CLIENTE DE LA API DE LECTURA)
+# Propósito: Cliente (urllib) de backend/api_server.py para el dashboard:
+# revalida con ETag/If-None-Match (sin cuerpo si nada cambió) y pide las
+# lecturas en modo delta ('since'), anexándolas a su copia local.
+# =========================================================
+
+import json
+import threading
+import urllib.error
+import urllib.request
+from urllib.parse import urlencode
+
+import pandas as pd
+
+from configuracion.config import API_URL
+from backend.schema import to_sensor_frame, concat_sensor_frames, as_levels
+
+DATE_COLUMNS = ('timestamp', 'desde')
+
+
+def _frame(table):
+    """Tabla {'columns', 'data'} de la API -> DataFrame con las fechas y los niveles (categórico ordenado) convertidos."""
+    frame = pd.DataFrame(table['data'], columns=table['columns'])
+    for column in DATE_COLUMNS:
+        if column in frame.columns:
+            frame[column] = pd.to_datetime(frame[column])
+    if 'nivel' in frame.columns:
+        frame['nivel'] = as_levels(frame['nivel'])
+    return frame
+
+
+class ApiClient:
+    """
+    Cliente compartido por las sesiones del dashboard de un mismo proceso.
+    `snapshot()` retorna (lecturas, alertas, alertas abiertas, transiciones, predicciones, meta)
+    con el mismo formato que producen las funciones de core_logic.
+    """
+
+    def __init__(self, base_url=API_URL, timeout=5.0):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self._responses = {} # {url: (etag, contenido)}
+        self._readings = pd.DataFrame()
+        self._series_url = None
+        self._epoch = None # Prefijo del ETag: cambia si el servidor se reinició
+        self._lock = threading.Lock()
+
+    def _get(self, path, params=None):
+        """GET con revalidación: si el servidor responde 304 se reutiliza el contenido anterior."""
+        url = f'{self.base_url}{path}' + (f'?{urlencode(params)}' if params else '')
+        cached = self._responses.get(url)
+        request = urllib.request.Request(url)
+        if cached is not None:
+            request.add_header('If-None-Match', cached[0])
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                etag = response.headers.get('ETag')
+                payload = json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            if e.code == 304 and cached is not None:
+                return cached[1]
+            raise
+        self._responses[url] = (etag, payload)
+        self._check_epoch(etag)
+        return payload
+
+    def _check_epoch(self, etag):
+        epoch = etag.strip('"').split('-')[0] if etag else None
+        if epoch != self._epoch:
+            # Servidor nuevo: las versiones y la copia local de lecturas ya no son comparables
+            self._epoch = epoch
+            self._readings = pd.DataFrame()
+
+    def _sync_readings(self, meta):
+        last = self._readings.index.max() if not self._readings.empty else None
+        # Misma precisión (ns) que las fechas de la API: 'since' es exactamente la última lectura local
+        params = {'since': last.as_unit('ns').isoformat()} if last is not None else None
+        payload = self._get('/series', params)
+        # Cada lectura nueva cambia la URL delta: solo se retiene la última (para revalidarla)
+        url = f'{self.base_url}/series' + (f'?{urlencode(params)}' if params else '')
+        if self._series_url not in (None, url):
+            self._responses.pop(self._series_url, None)
+        self._series_url = url
+        rows = _frame(payload['rows'])
+        if last is not None:
+            rows = rows[rows['timestamp'] > last] # Una respuesta sin lecturas nuevas no debe repetir filas
+        if not rows.empty:
+            self._readings = concat_sensor_frames(self._readings, to_sensor_frame(rows))
+        first = pd.Timestamp(meta['first_reading']) if meta.get('first_reading') else None
+        if first is not None and not self._readings.empty and self._readings.index.min() < first:
+            # Misma retención que el servidor
+            self._readings = self._readings[self._readings.index >= first]
+        return self._readings
+
+    def snapshot(self):
+        with self._lock:
+            meta = self._get('/status')['meta']
+            readings = self._sync_readings(meta)
+            alerts = self._get('/alerts')
+            forecast = self._get('/forecast')
+            return (readings, _frame(alerts['alerts']), _frame(alerts['active']), _frame(alerts['events']),
+                    _frame(forecast['forecast']), meta)
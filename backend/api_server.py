@@ -0,0 +1,301 @@
+# =========================================================
+# MÓDULO: api_server.py (BACKEND - API LOCAL DE LECTURA)
+# Propósito: Servir por HTTP (solo biblioteca estándar) el estado por piso,
+# las alertas, las lecturas y las predicciones a muchos visores a la vez.
+# Los datos se cargan una sola vez por versión y cada respuesta serializada
+# se guarda en caché: sumar visores casi no cuesta. Soporta ETag /
+# If-None-Match y respuestas delta ('since': solo filas posteriores a T).
+# Uso (desde la raíz):
+#   python -m backend.api_server
+#   curl 'http://127.0.0.1:9760/series?piso=2&var=temp_C&from=2025-01-06T10:00'
+#   curl http://127.0.0.1:9760/metrics   (métricas de este proceso, formato Prometheus)
+# =========================================================
+
+import argparse
+import json
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+import pandas as pd
+
+from configuracion.config import (API_HOST, API_PORT, API_REFRESH_SECONDS, API_CACHE_SIZE, DATA_DIR,
+                                  DATA_SOURCE)
+from backend import core_logic, metrics
+from backend.schema import READING_VARIABLES, exact_readings
+
+# ------------------- ESTADO COMPARTIDO -------------------
+
+class ApiState:
+    """
+    Datos vigentes de la API. `refresh()` (a lo sumo cada `refresh_seconds`,
+    lo llame quien lo llame) incorpora las lecturas nuevas y toma las alertas
+    publicadas por el daemon o, si no está activo, las calcula aquí una sola
+    vez para todos los visores. `version` cambia solo cuando cambian los datos.
+    """
+
+    def __init__(self, data_dir=DATA_DIR, source=DATA_SOURCE, refresh_seconds=API_REFRESH_SECONDS):
+        self.data_dir = data_dir
+        self.source = source
+        self.refresh_seconds = refresh_seconds
+        self.version = 0
+        self.epoch = time.time_ns() # Distingue las versiones de este proceso de las de un reinicio anterior
+        self.readings = pd.DataFrame()
+        self.alerts = self.active = self.events = self.forecast = self.status = pd.DataFrame()
+        self.meta = {}
+        self._lock = threading.Lock()
+        self._next_refresh = 0.0
+        self._inputs = None # (lecturas, versión publicada o reglas) de la última actualización
+
+    def refresh(self):
+        now = time.monotonic()
+        if now < self._next_refresh:
+            return self.version
+        with self._lock:
+            if now < self._next_refresh:
+                return self.version
+            self._next_refresh = now + self.refresh_seconds
+            try:
+                with metrics.timed('api_actualizacion'):
+                    self._load()
+            except Exception as e:
+                print(f"ERROR al actualizar los datos de la API: {e}")
+        return self.version
+
+    def _load(self):
+        df = core_logic.load_and_prepare_data(self.data_dir, source=self.source)
+        published = core_logic.load_published_alerts()
+        rules = core_logic.get_rules()
+        inputs = (id(df), published['meta']['version'] if published is not None else rules)
+        if inputs == self._inputs or df.empty:
+            return
+
+        if published is not None:
+            alerts, active, events = published['alerts'], published['active'], published['events']
+            forecast, status = published['forecast'], published['status']
+            origin = 'daemon'
+        else:
+            alerts = core_logic.generate_alerts(df)
+            active, _ = core_logic.update_alert_state(df)
+            events = core_logic.get_alert_history()
+            forecast = core_logic.get_predictions(df)
+            keys = dict.fromkeys(zip(df['edificio'].to_numpy(), df['piso'].to_numpy().tolist()))
+            status = core_logic.get_floor_status_table(alerts, sorted(keys))
+            origin = 'api'
+
+        # Publicación de la versión nueva: las peticiones en curso terminan con la anterior
+        self.readings, self.alerts, self.active, self.events = df, alerts, active, events
+        self.forecast, self.status = forecast, status
+        self.meta = {'first_reading': _iso(df.index.min()), 'last_reading': _iso(df.index.max()), 'origin': origin,
+                     'rules_version': rules.version}
+        self._inputs = inputs
+        self.version += 1
+
+# ------------------- RESPUESTAS -------------------
+
+class BadRequest(ValueError):
+    """Parámetros de consulta no válidos (respuesta 400)."""
+
+
+def _param(query, name, default=None):
+    values = query.get(name)
+    return values[-1] if values else default
+
+
+def _timestamp(query, name):
+    value = _param(query, name)
+    if value is None:
+        return None
+    try:
+        ts = pd.Timestamp(value)
+    except ValueError:
+        raise BadRequest(f"'{name}' no es una fecha válida: {value}")
+    return ts.tz_convert(None) if ts.tzinfo is not None else ts # Las lecturas están en hora local sin zona
+
+
+def _iso(ts):
+    """Fecha ISO 8601 con precisión de nanosegundos, la misma de las tablas (ver _table)."""
+    return pd.Timestamp(ts).as_unit('ns').isoformat()
+
+
+def _table(frame):
+    """
+    DataFrame -> JSON {'columns': [...], 'data': [[...], ...]} con fechas ISO 8601
+    sin truncar: el cliente pide los deltas con 'since' = su última lectura, que
+    debe coincidir exactamente con la del servidor.
+    """
+    frame = frame.assign(**{c: exact_readings(frame[c]) for c in READING_VARIABLES if c in frame.columns})
+    return frame.to_json(orient='split', index=False, date_format='iso', date_unit='ns')
+
+
+def _since(frame, since, column='timestamp'):
+    """Filas con `column` posterior a `since` (respuesta delta)."""
+    if since is None or frame.empty:
+        return frame
+    return frame[pd.to_datetime(frame[column]) > since]
+
+
+def _series(state, query):
+    """Lecturas filtradas: edificio, piso (lista separada por comas), var (ídem), from/to y since."""
+    df = state.readings
+    variables = _param(query, 'var')
+    variables = variables.split(',') if variables else READING_VARIABLES
+    unknown = [v for v in variables if v not in READING_VARIABLES]
+    if unknown:
+        raise BadRequest(f"Variables desconocidas: {', '.join(unknown)}")
+
+    start, end, since = _timestamp(query, 'from'), _timestamp(query, 'to'), _timestamp(query, 'since')
+    if not df.empty:
+        index = df.index
+        if index.is_monotonic_increasing:
+            # Lecturas en orden de llegada: el rango de tiempo se resuelve con búsqueda binaria
+            lo = 0 if start is None else index.searchsorted(start, side='left')
+            if since is not None:
+                lo = max(lo, index.searchsorted(since, side='right'))
+            hi = len(index) if end is None else index.searchsorted(end, side='right')
+            df = df.iloc[lo:max(lo, hi)]
+        else:
+            mask = np.ones(len(df), dtype=bool)
+            if start is not None:
+                mask &= index >= start
+            if since is not None:
+                mask &= index > since
+            if end is not None:
+                mask &= index <= end
+            df = df[mask]
+
+        edificio = _param(query, 'edificio')
+        if edificio is not None:
+            df = df[df['edificio'] == edificio]
+        pisos = _param(query, 'piso')
+        if pisos:
+            try:
+                df = df[df['piso'].isin([int(p) for p in pisos.split(',')])]
+            except ValueError:
+                raise BadRequest(f"'piso' debe ser una lista de enteros: {pisos}")
+        df = df[['edificio', 'piso'] + variables].reset_index()
+    return f'"rows": {_table(df)}'
+
+
+def _alerts(state, query):
+    since = _timestamp(query, 'since')
+    return (f'"alerts": {_table(state.alerts)}, "active": {_table(state.active)}, '
+            f'"events": {_table(_since(state.events, since))}')
+
+
+def _forecast(state, query):
+    return f'"forecast": {_table(state.forecast)}'
+
+
+def _status(state, query):
+    return f'"meta": {json.dumps(state.meta)}, "floors": {_table(state.status)}'
+
+
+ROUTES = {'/status': _status, '/alerts': _alerts, '/series': _series, '/forecast': _forecast}
+
+
+class ResponseCache:
+    """Respuestas serializadas por (ruta, consulta, versión de datos), con desalojo LRU."""
+
+    def __init__(self, size=API_CACHE_SIZE):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key, body):
+        with self._lock:
+            self._entries[key] = body
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+# ------------------- SERVIDOR HTTP -------------------
+
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1' # Conexiones persistentes: un visor reutiliza su conexión
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == '/metrics':
+            # Sin caché ni ETag: los contadores cambian en cada petición
+            return self._send(200, metrics.REGISTRY.to_prometheus().encode('utf-8'),
+                              content_type='text/plain; version=0.0.4; charset=utf-8')
+        route = ROUTES.get(url.path)
+        if route is None:
+            return self._send(404, b'{"error": "ruta no encontrada"}')
+
+        state, cache = self.server.state, self.server.cache
+        version = state.refresh()
+        etag = f'"{state.epoch}-{version}"'
+        if self.headers.get('If-None-Match') == etag:
+            metrics.count('respuestas_no_modificadas')
+            return self._send(304, b'', etag)
+
+        key = (url.path, url.query, version)
+        body = cache.get(key)
+        metrics.cache_access('respuestas_api', body is not None)
+        if body is None:
+            try:
+                with metrics.timed(f'api{url.path.replace("/", "_")}'):
+                    content = route(state, parse_qs(url.query))
+            except BadRequest as e:
+                return self._send(400, json.dumps({'error': str(e)}).encode('utf-8'))
+            body = f'{{"version": {version}, {content}}}'.encode('utf-8')
+            cache.put(key, body)
+        self._send(200, body, etag)
+
+    def _send(self, code, body, etag=None, content_type='application/json; charset=utf-8'):
+        self.send_response(code)
+        if etag is not None:
+            self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache') # Siempre revalidar con If-None-Match
+        if code != 304:
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # Sin una línea por petición: con muchos visores sería el costo dominante
+
+
+class ApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, state, host=API_HOST, port=API_PORT, cache_size=API_CACHE_SIZE):
+        super().__init__((host, port), ApiHandler)
+        self.state = state
+        self.cache = ResponseCache(cache_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API local de lectura SmartFloors.")
+    parser.add_argument('--host', default=API_HOST)
+    parser.add_argument('--port', type=int, default=API_PORT)
+    parser.add_argument('--origen', choices=['store', 'ring'], default=DATA_SOURCE,
+                        help="Lecturas desde el almacén en disco o desde el buffer compartido.")
+    parser.add_argument('--datos', default=DATA_DIR, help="Directorio del almacén de lecturas (relativo a la raíz).")
+    args = parser.parse_args()
+
+    server = ApiServer(ApiState(args.datos, args.origen), args.host, args.port)
+    print(f"🌐 API de lectura en http://{args.host}:{args.port} (/status, /alerts, /series, /forecast, /metrics)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nAPI de lectura detenida.")
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+# =========================================================
+# MÓDULO: backtest.py (BACKEND - EVALUACIÓN DE MODELOS DE PRONÓSTICO)
+# Propósito: Reproducir datos del simulador y medir, por modelo, la precisión
+# (MAE a +60 min) y el costo (series/segundo) del motor de pronóstico.
+# Uso (desde la raíz): python -m backend.backtest --days 3 --models ma holt holt_winters
+# =========================================================
+
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+import pandas as pd
+
+from configuracion.config import (WINDOWS_SIZE_MINUTES, FORECAST_HORIZON_MINUTES, SEASON_LENGTH_MINUTES,
+                                  DATA_DIR, STORAGE_BACKEND)
+from backend.forecasting import MODELS, make_forecaster
+
+BACKTEST_VARIABLES = ('temp_C', 'humedad_pct')
+
+# ------------------- DATOS DE REPRODUCCIÓN -------------------
+
+def simulate_history(days, start='2025-01-01', seed=0):
+    """Reproduce el simulador a 1 lectura/minuto durante `days` días (semilla fija)."""
+    import data_simulator
+
+    np.random.seed(seed)
+    random.seed(seed)
+    start = pd.Timestamp(start)
+    frames = [data_simulator.generate_live_data(start + pd.Timedelta(minutes=i)) for i in range(int(days * 24 * 60))]
+    return pd.concat(frames, ignore_index=True).set_index('timestamp')
+
+
+def sampling_seconds(df):
+    """Intervalo típico (mediana, en segundos) entre lecturas consecutivas del historial."""
+    times = pd.DatetimeIndex(df.index.unique()).sort_values()
+    return times.to_series().diff().median().total_seconds() if len(times) > 1 else 0.0
+
+
+def to_minutes(df, variables=BACKTEST_VARIABLES):
+    """
+    Re-muestrea el historial a 1 lectura/minuto por serie (promedio del minuto),
+    la resolución que suponen el horizonte, la ventana y la estacionalidad (en
+    minutos). Los minutos sin lecturas repiten el valor anterior de la serie.
+    """
+    minute = pd.DatetimeIndex(df.index).floor('min').rename('timestamp')
+    grouped = df.groupby([minute, 'edificio', 'piso'], observed=True)[list(variables)].mean()
+    wide = grouped.unstack(['edificio', 'piso'])
+    wide = wide.reindex(pd.date_range(wide.index.min(), wide.index.max(), freq='min', name='timestamp')).ffill()
+    return wide.stack(['edificio', 'piso'], future_stack=True).dropna().reset_index(['edificio', 'piso'])
+
+
+def to_matrix(df, variables=BACKTEST_VARIABLES, replicas=1):
+    """
+    Convierte el historial en un arreglo (ticks, series, variables) y la lista de
+    claves (edificio, piso). `replicas` duplica las series como edificios extra
+    para medir el rendimiento con más series.
+    """
+    wide = df.set_index(['edificio', 'piso'], append=True)[list(variables)].unstack(['edificio', 'piso'])
+    keys = list(dict.fromkeys((e, p) for _, e, p in wide.columns))
+    values = wide.to_numpy().reshape(len(wide), len(variables), len(keys)).transpose(0, 2, 1)
+
+    if replicas > 1:
+        values = np.concatenate([values] * replicas, axis=1)
+        keys = [(f'{e}{r}', p) for r in range(replicas) for e, p in keys]
+    return values, keys
+
+# ------------------- BACKTEST -------------------
+
+def backtest(model, values, keys, horizon=FORECAST_HORIZON_MINUTES, burn_in=0, variables=BACKTEST_VARIABLES, **params):
+    """
+    Alimenta el modelo tick a tick y compara el pronóstico hecho en t con el
+    valor real en t + horizon (a partir de `burn_in` ticks).
+    """
+    forecaster = make_forecaster(model, horizon, WINDOWS_SIZE_MINUTES, variables,
+                                 season_length=SEASON_LENGTH_MINUTES, **params)
+    slots = forecaster.register(keys)
+    ticks = len(values)
+    predictions = np.empty_like(values)
+
+    start = time.perf_counter()
+    for t in range(ticks):
+        forecaster.push(slots, values[t])
+        predictions[t] = forecaster.forecast_values()[slots]
+    elapsed = time.perf_counter() - start
+
+    errors = np.abs(predictions[burn_in:ticks - horizon] - values[burn_in + horizon:])
+    mae = np.nanmean(errors, axis=(0, 1))
+    return {
+        'model': model,
+        'mae': {var: round(float(m), 4) for var, m in zip(variables, mae)},
+        'series': len(keys),
+        'ticks': ticks,
+        'seconds': round(elapsed, 4),
+        'series_per_second': round(len(keys) * ticks / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest de los modelos de pronóstico a +60 min.")
+    parser.add_argument('--models', nargs='+', default=list(MODELS), choices=MODELS)
+    parser.add_argument('--days', type=float, default=3, help="Días simulados a reproducir.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--burn-in-hours', type=float, default=24, help="Horas iniciales excluidas del MAE.")
+    parser.add_argument('--replicas', type=int, default=1, help="Copias de las series (medición de rendimiento).")
+    parser.add_argument('--from-store', action='store_true', help="Usar el historial del almacén en vez de simular.")
+    parser.add_argument('--json', help="Ruta donde guardar los resultados en JSON.")
+    args = parser.parse_args()
+
+    if args.from_store:
+        from backend.storage import open_store
+        df = open_store(DATA_DIR, STORAGE_BACKEND).read().set_index('timestamp')
+        # El horizonte y las ventanas se cuentan en lecturas: con el simulador en vivo (cada 5 s)
+        # +60 lecturas serían +5 min, así que el almacén se lleva a 1 lectura/minuto
+        interval = sampling_seconds(df)
+        df = to_minutes(df)
+        print(f"Almacén: lecturas cada {interval:g} s re-muestreadas a 1/min "
+              f"(horizonte +{FORECAST_HORIZON_MINUTES} lecturas = +{FORECAST_HORIZON_MINUTES} min).")
+    else:
+        df = simulate_history(args.days, seed=args.seed)
+    values, keys = to_matrix(df, replicas=args.replicas)
+    burn_in = min(int(args.burn_in_hours * 60), max(0, len(values) - FORECAST_HORIZON_MINUTES - 1))
+
+    results = [backtest(model, values, keys, burn_in=burn_in) for model in args.models]
+
+    print(f"{'Modelo':<14}" + ''.join(f"{'MAE ' + v:>18}" for v in BACKTEST_VARIABLES) + f"{'series/s':>14}")
+    for r in results:
+        print(f"{r['model']:<14}" + ''.join(f"{r['mae'][v]:>18.4f}" for v in BACKTEST_VARIABLES)
+              + f"{r['series_per_second']:>14,.0f}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
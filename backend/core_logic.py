@@ -6,51 +6,180 @@
 import pandas as pd
 import numpy as np
 import os 
-import sys 
-import random
+import threading
 
 # Importa las constantes y configuraciones
-from configuracion.config import UMBRALES, RECOMENDACIONES, WINDOWS_SIZE_MINUTES, PISOS_MONITOREADOS 
-
-# --- IMPOTACIÓN CRÍTICA DEL SIMULADOR PARA EL BUCLE CERRADO ---
-try:
-    # Ajusta el path para importar data_simulator.py (que está en la carpeta raíz)
-    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
-    from data_simulator import system_correction_active 
-except ImportError:
-    # Modo seguro en caso de fallo de importación (la simulación de corrección no funcionará)
-    system_correction_active = {p: False for p in PISOS_MONITOREADOS} 
-    print("Advertencia: No se pudo enlazar la lógica de corrección con el simulador.")
+from configuracion.config import (WINDOWS_SIZE_MINUTES, DATA_DIR,
+                                  STORAGE_BACKEND, FORECAST_MODEL, FORECAST_HORIZON_MINUTES, SEASON_LENGTH_MINUTES,
+                                  RING_PATH, DATA_SOURCE, ROLLUP_DIR, RULES_FILE, ALERTS_DIR,
+                                  DAEMON_STALE_SECONDS, ANOMALY_VARIABLES, REDISTRIBUTION_KW_PER_C,
+                                  REDISTRIBUTION_TTL_TICKS)
+from backend.storage import open_store
+from backend.shm_ring import SharedRing, readings_to_frame
+from backend.forecasting import make_forecaster
+from backend.rollups import RollupStore
+from backend.alert_engine import AlertEngine
+from backend.rules import RuleRegistry
+from backend.alert_store import AlertStore
+from backend.anomaly import AnomalyDetector, ANOMALY_LEVELS
+from backend.redistribution import plan_redistribution, fill_destinations
+from backend.schema import to_sensor_frame, concat_sensor_frames, exact_readings, as_levels
+from backend.floor_status import FloorStatusIndex, OK_SUMMARY
+from backend import metrics
+
+# --- ESTADO DE CORRECCIÓN PARA EL BUCLE CERRADO ---
+# Correcciones ya solicitadas por este proceso (claves: (edificio, piso)). El simulador
+# las recibe a través de los flags del buffer compartido (RING_PATH), no importando este módulo.
+system_correction_active = {}
 
 # ------------------- FUNCIONES DE INGESTA Y PRE-PROCESAMIENTO -------------------
 
-def load_and_prepare_data(filepath='smartfloors_data.csv'):
+# Lectores incrementales por ruta, compartidos por todas las sesiones del dashboard
+# dentro del mismo proceso: {ruta: {'reader': lector incremental del almacén, 'frame': DataFrame}}
+_tail_cache = {}
+_tail_lock = threading.Lock()
+
+def _load_incremental(full_path):
+    """Parsea solo las filas nuevas del log y las anexa al DataFrame en caché."""
+    entry = _tail_cache.get(full_path)
+    if entry is None:
+        reader = open_store(full_path, STORAGE_BACKEND).tail_reader()
+        entry = _tail_cache[full_path] = {'reader': reader, 'frame': pd.DataFrame()}
+
+    with metrics.timed('ingesta_lectura'): # Lectura y parseo (CSV o Parquet) de las filas nuevas
+        update = entry['reader'].poll()
+    metrics.cache_access('lecturas', update is None)
+    if update is None:
+        # Sin cambios en el log: se retorna el mismo DataFrame, sin reparsear.
+        return entry['frame']
+
+    reset, new_rows = update
+    df = pd.DataFrame() if reset else entry['frame']
+    if not new_rows.empty:
+        # Esquema compacto (edificio categórico, piso int16, lecturas float32)
+        with metrics.timed('ingesta_esquema'):
+            df = concat_sensor_frames(df, to_sensor_frame(new_rows))
+        metrics.count('filas_ingeridas', len(new_rows))
+        if entry['reader'].max_records:
+            df = df.tail(entry['reader'].max_records)
+
+    entry['frame'] = df
+    return df
+
+# Raíz del proyecto (carpeta que contiene backend/), la misma para el dashboard, el daemon y los scripts
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def _resolve_data_path(filepath):
+    """Ruta absoluta del directorio de datos, relativa a la raíz del proyecto."""
+    return os.path.join(ROOT_DIR, filepath)
+
+# Conexiones al buffer compartido del simulador, por ruta
+_rings = {}
+
+def _get_ring(ring_path):
+    """Conexión (perezosa) al buffer compartido; se renueva si el simulador lo recreó. None si no existe."""
+    ring = _rings.get(ring_path)
+    if ring is None or ring.is_stale():
+        ring = _rings[ring_path] = SharedRing.attach(ring_path)
+    return ring
+
+def _load_from_ring(ring_path):
+    """Copia solo las lecturas nuevas del buffer compartido y las anexa al DataFrame en caché."""
+    ring = _get_ring(ring_path)
+    if ring is None:
+        return pd.DataFrame()
+
+    entry = _tail_cache.get(ring_path)
+    if entry is None or entry['ring'] is not ring:
+        entry = _tail_cache[ring_path] = {'ring': ring, 'seq': 0, 'frame': pd.DataFrame()}
+
+    records, seq, lost = ring.read_since(entry['seq'])
+    metrics.cache_access('lecturas', seq == entry['seq'])
+    if seq == entry['seq']:
+        return entry['frame']
+
+    with metrics.timed('ingesta_esquema'):
+        new_rows = to_sensor_frame(readings_to_frame(records))
+        df = new_rows if lost else concat_sensor_frames(entry['frame'], new_rows)
+    metrics.count('filas_ingeridas', len(new_rows))
+    entry['seq'] = seq
+    entry['frame'] = df.tail(ring.capacity)
+    return entry['frame']
+
+@metrics.instrumented('ingesta')
+def load_and_prepare_data(filepath=DATA_DIR, source=DATA_SOURCE):
     """
-    Función de Ingesta. Carga el CSV y prepara el DataFrame, usando una ruta robusta.
+    Función de Ingesta. Lee el almacén del simulador y prepara el DataFrame, usando una ruta robusta.
+    La lectura es incremental: solo se parsean las filas nuevas desde la última llamada y,
+    si el log no cambió, se retorna el DataFrame en caché (no debe modificarse in-place).
+    Con source='ring' las lecturas se toman del buffer compartido (RING_PATH) en lugar del disco.
     """
+    full_path = _resolve_data_path(RING_PATH if source == 'ring' else filepath)
     
-    try:
-        # Intenta determinar la ruta absoluta del archivo CSV.
-        dashboard_path = os.path.dirname(os.path.abspath(sys.argv[0]))
-        root_dir = os.path.abspath(os.path.join(dashboard_path, '..', '..'))
-        full_path = os.path.join(root_dir, filepath)
-    except IndexError:
-        full_path = filepath
-    
-    try:
-        df = pd.read_csv(full_path) 
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df = df.set_index('timestamp')
-        
-        if df.empty:
-             return pd.DataFrame() 
+    with _tail_lock:
+        try:
+            df = _load_from_ring(full_path) if source == 'ring' else _load_incremental(full_path)
+        except Exception as e:
+            # Estado del lector incierto: se descarta y la próxima llamada relee todo.
+            _tail_cache.pop(full_path, None)
+            return pd.DataFrame()
 
-        return df
-    except FileNotFoundError:
+    if df.empty:
         return pd.DataFrame()
+    return df
+
+@metrics.instrumented('lectura_ventana')
+def load_window(columns=None, pisos=None, start=None, end=None, filepath=DATA_DIR):
+    """
+    Carga solo las columnas y pisos pedidos en el rango [start, end] (p. ej. solo 'temp_C' del Piso 2).
+    Con el backend Parquet la proyección y el rango de tiempo se resuelven en disco.
+    """
+    try:
+        df = open_store(_resolve_data_path(filepath), STORAGE_BACKEND).read(columns, pisos, start, end)
     except Exception as e:
         return pd.DataFrame()
 
+    if df.empty:
+        return pd.DataFrame()
+    return to_sensor_frame(df)
+
+# Conexiones (solo lectura) a los rollups, por ruta
+_rollups = {}
+
+@metrics.instrumented('rollups')
+def load_rollup_window(edificio, start, end, stats, filepath=ROLLUP_DIR):
+    """
+    Series del edificio en [start, end] desde el nivel de agregación adecuado
+    (1 min / 15 min / 1 h), en el formato largo de los gráficos. `stats` indica
+    la estadística por variable, p. ej. {'temp_C': 'mean', 'energia_kW': 'max'}.
+    Retorna un DataFrame vacío si aún no hay rollups.
+    """
+    path = _resolve_data_path(filepath)
+    store = _rollups.get(path)
+    if store is None or store.is_stale():
+        store = _rollups[path] = RollupStore.attach(path)
+    if store is None:
+        return pd.DataFrame()
+    return store.chart_series(edificio, start, end, stats)
+
+# Lectores de los resultados publicados por el daemon de alertas, por ruta
+_alert_stores = {}
+
+def load_published_alerts(filepath=ALERTS_DIR, max_age=DAEMON_STALE_SECONDS):
+    """
+    Última publicación del daemon de alertas (backend/alert_daemon.py):
+    {'alerts', 'active', 'events', 'forecast', 'status', 'meta'}. Retorna None
+    si no hay publicaciones o si el daemon no dio señales en `max_age` segundos.
+    """
+    path = _resolve_data_path(filepath)
+    store = _alert_stores.get(path)
+    if store is None:
+        store = _alert_stores[path] = AlertStore(path)
+    try:
+        return store.read(max_age)
+    except Exception as e:
+        return None
+
 # ------------------- FUNCIONES DE PREDICCIÓN (MVP SIMPLE) -------------------
 
 def predict_60_min_ma(df, piso, variable):
@@ -65,137 +194,332 @@ def predict_60_min_ma(df, piso, variable):
     prediction = latest_data.mean()
     return round(prediction, 2)
 
+# Predictor incremental (modelo FORECAST_MODEL) compartido por el pipeline de alertas
+# y el dashboard: cada llamada solo incorpora las filas nuevas del DataFrame recibido.
+_predictor = make_forecaster(FORECAST_MODEL, FORECAST_HORIZON_MINUTES, WINDOWS_SIZE_MINUTES,
+                             season_length=SEASON_LENGTH_MINUTES)
+_predictor_lock = threading.Lock()
+
+@metrics.instrumented('prediccion')
+def get_predictions(df):
+    """
+    Predicción a +60 minutos (modelo FORECAST_MODEL) de todas las series a la vez.
+    Retorna un DataFrame con columnas 'edificio', 'piso' y una por variable.
+    """
+    with _predictor_lock:
+        _predictor.sync(df)
+        return _predictor.predict()
+
+
+# Detector de anomalías en streaming (EWMA z-score / CUSUM), sincronizado igual que el predictor
+_anomaly_detector = AnomalyDetector()
+_anomaly_lock = threading.Lock()
+
+@metrics.instrumented('anomalias')
+def get_anomaly_levels(df, keys):
+    """
+    Códigos de anomalía vigentes (ver backend/anomaly.py) de las claves
+    (edificio, piso) pedidas, una columna por variable de ANOMALY_VARIABLES.
+    """
+    with _anomaly_lock:
+        _anomaly_detector.sync(df)
+        return _anomaly_detector.levels_of(keys)
+
 
 # ------------------- FUNCIONES DE REGLAS DE NEGOCIO Y ALERTAS -------------------
 
-def _check_umbral(value, umbral_config, var_name): 
-    """Función auxiliar para verificar si un valor cruza un umbral."""
-    for level, limits in umbral_config.items():
-        
-        # 1. Variables con rangos (Temperatura, Humedad)
-        if isinstance(limits, dict): 
-            if var_name == 'temp_C' and 'min' in limits and value >= limits['min']:
-                return level
-            
-            elif var_name == 'humedad_pct' and 'low' in limits and 'high' in limits:
-                if value < limits['low'] or value > limits['high']:
-                    return level
-        
-        # 2. Variables con umbral simple flotante (Energía)
-        elif isinstance(limits, (float, int)) and value >= limits:
-            return level
-            
-    return None
+ALERT_COLUMNS = ['timestamp', 'edificio', 'piso', 'variable', 'nivel', 'recomendacion', 'tipo']
+ALERT_VARIABLES = ['temp_C', 'humedad_pct', 'energia_kW']
+# Posiciones por lectura en el orden de las alertas: T/H/Energía, Preventiva, Combinado y una por variable de anomalía
+ORDER_SLOTS = 5 + len(ANOMALY_VARIABLES)
+
+# Reglas compiladas (configuracion.config + RULES_FILE opcional), recargadas en caliente
+_rule_registry = RuleRegistry(_resolve_data_path(RULES_FILE))
+
+def get_rules():
+    """RuleSet vigente (se recompila si el archivo de reglas cambió)."""
+    return _rule_registry.current()
+
+def _latest_by_series(df):
+    """
+    Última lectura de cada (edificio, piso), ordenada por edificio y piso, con
+    las lecturas en float64 (2 decimales) para comparar exactamente contra los umbrales.
+    """
+    latest = df[~df.duplicated(['edificio', 'piso'], keep='last')]
+    latest = latest.dropna(subset=ALERT_VARIABLES).sort_values(['edificio', 'piso'], kind='stable')
+    latest = latest.reset_index(drop=True)
+    return latest.assign(**{var: exact_readings(latest[var]) for var in ALERT_VARIABLES})
+
+def evaluate_alerts(rules, edificios, pisos, readings, temp_pred, anomalies=None):
+    """
+    Aplica las reglas de alerta a un conjunto de lecturas, sin efectos secundarios.
+    Cada posición i es una evaluación independiente: (edificios[i], pisos[i]), la
+    lectura readings[var][i] de cada variable y la predicción de temperatura temp_pred[i].
+    `anomalies` ({variable: código por posición}, ver backend/anomaly.py) agrega las alertas 'Anomalía'.
+    Retorna (alertas con la columna '_fila' = posición, ordenadas por posición y dentro
+    de ella T/H/Energía, Preventiva, Riesgo combinado, Anomalías; máscara de alertas críticas por posición).
+    'nivel' es un categórico ordenado por severidad (LEVEL_DTYPE).
+    """
+    order = np.arange(len(pisos))
+    is_critical_alert = np.zeros(len(pisos), dtype=bool)
+    blocks = []
+
+    # 1. Alertas por Condiciones Actuales (T, H, Energía)
+    for var_pos, var in enumerate(ALERT_VARIABLES):
+        if var not in rules.compiled:
+            continue
+        level_idx, side = rules.evaluate(var, readings[var])
+        hit = level_idx >= 0
+        if not hit.any():
+            continue
+
+        levels = rules.compiled[var]['levels'][level_idx[hit]]
+        is_critical_alert[hit] |= levels == 'Crítica'
+        templates = rules.level_templates(var, level_idx[hit], side[hit])
+        blocks.append(pd.DataFrame({
+            'edificio': edificios[hit],
+            'piso': pisos[hit],
+            'variable': var,
+            'nivel': levels,
+            'recomendacion': rules.recommendations(templates, pisos[hit]),
+            'tipo': 'Actual',
+            '_orden': order[hit] * ORDER_SLOTS + var_pos,
+        }))
+
+    # 2. Alerta Preventiva (Predicción de Temperatura)
+    preventive = (temp_pred != 0) & (temp_pred >= rules.preventive_temp)
+    if preventive.any():
+        template = rules.fixed_templates['preventiva_temp_C']
+        blocks.append(pd.DataFrame({
+            'edificio': edificios[preventive],
+            'piso': pisos[preventive],
+            'variable': 'Temperatura (Predicción)',
+            'nivel': 'Preventiva Media',
+            'recomendacion': rules.recommendations(np.full(int(preventive.sum()), template), pisos[preventive]),
+            'tipo': 'Preventiva',
+            '_orden': order[preventive] * ORDER_SLOTS + 3,
+        }))
+
+    # 3. Alerta de Riesgo Combinado (Temp Media/Crítica + Energía Media/Crítica)
+    is_thermal_risk = readings['temp_C'] >= rules.preventive_temp
+    is_high_energy = readings['energia_kW'] >= rules.high_energy
+    combined = is_thermal_risk & is_high_energy
+    if combined.any():
+        template = rules.fixed_templates['riesgo_combinado_Critica']
+        blocks.append(pd.DataFrame({
+            'edificio': edificios[combined],
+            'piso': pisos[combined],
+            'variable': 'riesgo combinado',
+            'nivel': 'Crítica',
+            'recomendacion': rules.recommendations(np.full(int(combined.sum()), template), pisos[combined]),
+            'tipo': 'Actual',
+            '_orden': order[combined] * ORDER_SLOTS + 4,
+        }))
+        is_critical_alert |= combined
+
+    # 4. Anomalías estadísticas (EWMA z-score / CUSUM): desvíos del patrón del piso bajo los umbrales fijos
+    for var_pos, (var, codes) in enumerate((anomalies or {}).items()):
+        hit = codes > 0
+        if not hit.any():
+            continue
+        template = rules.fixed_templates[f'anomalia_{var}']
+        blocks.append(pd.DataFrame({
+            'edificio': edificios[hit],
+            'piso': pisos[hit],
+            'variable': var,
+            'nivel': ANOMALY_LEVELS[codes[hit]],
+            'recomendacion': rules.recommendations(np.full(int(hit.sum()), template), pisos[hit]),
+            'tipo': 'Anomalía',
+            '_orden': order[hit] * ORDER_SLOTS + 5 + var_pos,
+        }))
+
+    if not blocks:
+        return pd.DataFrame(columns=ALERT_COLUMNS[1:] + ['_fila']), is_critical_alert
+    df_alerts = pd.concat(blocks, ignore_index=True).sort_values('_orden', kind='stable')
+    df_alerts['nivel'] = as_levels(df_alerts['nivel']) # Categórico ordenado por severidad
+    df_alerts['_fila'] = df_alerts.pop('_orden') // ORDER_SLOTS
+    return df_alerts.reset_index(drop=True), is_critical_alert
+
+def activate_corrections(critical_keys):
+    """Notifica las alertas críticas de las claves (edificio, piso) y activa su corrección simulada."""
+    # --- FUNCIÓN DE NOTIFICACIÓN Y CORRECCIÓN (Simulación) ---
+    for key in critical_keys:
+        if not system_correction_active.get(key, False):
+            system_correction_active[key] = True
+            print(f"*** ALERTA CRÍTICA DETECTADA en Edificio {key[0]} Piso {key[1]}. INICIANDO CORRECCIÓN SIMULADA ***")
+
+    # Bucle cerrado entre procesos: el simulador lee estos flags en su siguiente tick.
+    ring = _get_ring(_resolve_data_path(RING_PATH))
+    if ring is not None and critical_keys:
+        ring.set_corrections(ring.slots_of(critical_keys), True)
+
+def applied_load_shifts(keys):
+    """kW que el simulador ya traslada en cada clave (edificio, piso), según el buffer compartido (0 sin él)."""
+    ring = _get_ring(_resolve_data_path(RING_PATH))
+    if ring is None or not keys:
+        return np.zeros(len(keys))
+    return ring.load_shifts(ring.slots_of(keys))
+
+def publish_load_shifts(keys, shifts):
+    """
+    Publica el plan de redistribución vigente en el buffer compartido: el
+    simulador lo aplica desde su siguiente tick y lo descarta si no se vuelve
+    a publicar en REDISTRIBUTION_TTL_TICKS ticks.
+    """
+    ring = _get_ring(_resolve_data_path(RING_PATH))
+    if ring is not None and keys:
+        ring.set_load_shifts(ring.slots_of(keys), shifts, REDISTRIBUTION_TTL_TICKS)
+
+def apply_alert_actions(critical_keys, shifts):
+    """
+    Cierra el bucle con el simulador: activa las correcciones de `critical_keys`
+    y publica el plan `shifts` = (claves, kW). Solo lo llaman los procesos que
+    dirigen la simulación (daemon y dashboard local), no las consultas.
+    """
+    activate_corrections(critical_keys)
+    publish_load_shifts(*shifts)
+
+@metrics.instrumented('redistribucion')
+def get_redistribution_plan(rules, edificios, pisos, readings, forecast, applied=None):
+    """
+    Plan de redistribución de carga entre los pisos de cada edificio (ver
+    backend/redistribution.py) para las series evaluadas, una por posición.
+    `forecast` es {variable: pronóstico por posición}. Se planifica sobre la
+    carga propia de cada piso (lectura y pronóstico menos los kW `applied`
+    que ya se trasladan y su efecto térmico) para que el plan no se deshaga al aplicarse.
+    """
+    global _plan_destinations
+    applied = np.zeros(len(pisos)) if applied is None else applied
+    heat = applied / REDISTRIBUTION_KW_PER_C
+    plan = plan_redistribution(rules, pd.factorize(edificios)[0], pisos,
+                               readings['energia_kW'] - applied, readings['temp_C'] - heat,
+                               forecast['energia_kW'] - applied, forecast['temp_C'] - heat)
+    # Destinos vigentes por piso: también completan el 'Piso Y' de las alertas abiertas del motor
+    _plan_destinations = dict(zip(zip(edificios.tolist(), pisos.tolist()), plan.destinations()))
+    return plan
 
 def generate_alerts(df):
     """
-    Función principal de Backend: genera todas las alertas del sistema y 
-    activa la simulación de corrección si se detecta una CRÍTICA.
+    Función principal de Backend: genera todas las alertas del sistema.
+    Evalúa todos los (edificio, piso) y variables en una sola pasada vectorizada.
+    No toca el buffer compartido: para activar correcciones y publicar el plan
+    de redistribución usar evaluate_alert_cycle + apply_alert_actions.
+    """
+    return evaluate_alert_cycle(df)[0]
+
+@metrics.instrumented('alertas')
+def evaluate_alert_cycle(df):
+    """
+    Evaluación completa de un ciclo. Retorna (alertas, claves (edificio, piso)
+    con alerta CRÍTICA, (claves, kW a trasladar) del plan de redistribución).
+    El 'Piso Y' de las recomendaciones de energía sale de ese plan.
     """
-    global system_correction_active 
-    
     if df.empty:
         # Si el input está vacío, retorna un DF vacío con columnas definidas
-        return pd.DataFrame(columns=['timestamp', 'piso', 'variable', 'nivel', 'recomendacion', 'tipo'])
+        return pd.DataFrame(columns=ALERT_COLUMNS), [], ([], [])
 
-    alerts = []
+    rules = get_rules() # Una sola versión de las reglas para toda la evaluación
     current_time = df.index.max()
-    
-    for piso in PISOS_MONITOREADOS:
-        latest_data = df[df['piso'] == piso].tail(1)
-        if latest_data.empty: continue
-        latest_data = latest_data.iloc[0]
-        
-        is_critical_alert = False
+    latest = _latest_by_series(df)
+    edificios = latest['edificio'].to_numpy()
+    pisos = latest['piso'].to_numpy()
+
+    keys = list(zip(edificios, pisos))
+    predictions = get_predictions(df).set_index(['edificio', 'piso'])
+    predictions = predictions.reindex(pd.MultiIndex.from_arrays([edificios, pisos]))
+    forecast = {var: predictions[var].to_numpy(dtype=float) for var in ('temp_C', 'energia_kW')}
+    readings = {var: latest[var].to_numpy(dtype=float) for var in ALERT_VARIABLES}
+    anomalies = dict(zip(ANOMALY_VARIABLES, get_anomaly_levels(df, keys).T))
+    df_alerts, is_critical_alert = evaluate_alerts(rules, edificios, pisos, readings, forecast['temp_C'], anomalies)
+    metrics.count('alertas_emitidas', len(df_alerts))
+
+    plan = get_redistribution_plan(rules, edificios, pisos, readings, forecast, applied_load_shifts(keys))
+    if not df_alerts.empty:
+        destinations = plan.destinations()[df_alerts['_fila'].to_numpy(dtype=np.int64)]
+        df_alerts['recomendacion'] = fill_destinations(df_alerts['recomendacion'], destinations)
+
+    critical_keys = list(zip(edificios[is_critical_alert], pisos[is_critical_alert]))
+    shifts = (keys, plan.shift)
 
-        # 1. Alertas por Condiciones Actuales (T, H, Energía)
-        for var in ['temp_C', 'humedad_pct', 'energia_kW']:
-            level = _check_umbral(latest_data[var], UMBRALES[var], var)
-            
-            if level:
-                if level == 'Critica':
-                    is_critical_alert = True
-                
-                # Determinar la clave de la recomendación
-                rec_key = f'{var}_{level}'
-                if var == 'humedad_pct' and level == 'Critica':
-                    if latest_data[var] < UMBRALES['humedad_pct'][level]['low']:
-                        rec_key = f'humedad_pct_Critica_low'
-                    elif latest_data[var] > UMBRALES['humedad_pct'][level]['high']:
-                        rec_key = f'humedad_pct_Critica_high'
-                elif var == 'energia_kW':
-                    rec_key = f'energia_kW_Critica' 
-
-                alerts.append({
-                    'timestamp': current_time,
-                    'piso': piso,
-                    'variable': var,
-                    'nivel': level,
-                    'recomendacion': RECOMENDACIONES.get(rec_key, f'Revisar {var} en Piso {piso}.').replace('Piso X', f'Piso {piso}'),
-                    'tipo': 'Actual'
-                })
-        
-        # 2. Alerta Preventiva (Predicción de Temperatura)
-        temp_pred = predict_60_min_ma(df, piso, 'temp_C')
-        if temp_pred and temp_pred >= UMBRALES['temp_C']['Media']['min']:
-            alerts.append({
-                'timestamp': current_time,
-                'piso': piso,
-                'variable': 'Temperatura (Predicción)',
-                'nivel': 'Preventiva Media',
-                'recomendacion': RECOMENDACIONES['preventiva_temp_C'].replace('Piso X', f'Piso {piso}'),
-                'tipo': 'Preventiva'
-            })
-
-        # 3. Alerta de Riesgo Combinado (Temp Media/Crítica + Energía Media/Crítica)
-        is_thermal_risk = latest_data['temp_C'] >= UMBRALES['temp_C']['Media']['min']
-        is_high_energy = latest_data['energia_kW'] >= UMBRALES['energia_kW']['Media']
-        
-        if is_thermal_risk and is_high_energy:
-             alerts.append({
-                'timestamp': current_time,
-                'piso': piso,
-                'variable': 'riesgo combinado',
-                'nivel': 'Crítica',
-                'recomendacion': RECOMENDACIONES['riesgo_combinado_Critica'].replace('Piso X', f'Piso {piso}'),
-                'tipo': 'Actual'
-            })
-             is_critical_alert = True 
-             
-        # --- FUNCIÓN DE NOTIFICACIÓN Y CORRECCIÓN (Simulación) ---
-        if is_critical_alert and not system_correction_active[piso]:
-             system_correction_active[piso] = True
-             print(f"*** ALERTA CRÍTICA DETECTADA en Piso {piso}. INICIANDO CORRECCIÓN SIMULADA ***")
-    
-    # --- CORRECCIÓN FINAL DEL ERROR ---
     # Garantiza que el DataFrame de alertas siempre tenga las columnas necesarias, incluso si está vacío.
-    df_alerts = pd.DataFrame(alerts, columns=['timestamp', 'piso', 'variable', 'nivel', 'recomendacion', 'tipo'])
-    return df_alerts
+    if df_alerts.empty:
+        return pd.DataFrame(columns=ALERT_COLUMNS), critical_keys, shifts
+
+    # Orden: por edificio y piso, y dentro de cada piso T/H/Energía, Preventiva, Riesgo combinado, Anomalías.
+    df_alerts.insert(0, 'timestamp', current_time)
+    return df_alerts[ALERT_COLUMNS], critical_keys, shifts
+
+# Motor de alertas con estado: consume solo las lecturas nuevas y emite transiciones
+_plan_destinations = {} # {(edificio, piso): destino} del último plan de redistribución
+_alert_engine = AlertEngine(get_rules())
+_alert_engine_lock = threading.Lock()
+
+@metrics.instrumented('alertas_estado')
+def update_alert_state(df):
+    """
+    Avanza el motor de alertas con las lecturas de `df` posteriores a la última
+    vista. Retorna (alertas abiertas, transiciones emitidas en esta llamada).
+    El 'Piso Y' de las alertas abiertas sale del último plan de redistribución.
+    """
+    with _alert_engine_lock:
+        _alert_engine.set_rules(get_rules())
+        _alert_engine.sync(df)
+        events = _alert_engine.recent_events()
+        metrics.count('transiciones_emitidas', len(events))
+        active = _alert_engine.active()
+    if not active.empty:
+        destinations = [_plan_destinations.get(key) for key in zip(active['edificio'], active['piso'].tolist())]
+        active['recomendacion'] = fill_destinations(active['recomendacion'], destinations)
+    return active, events
+
+def get_alert_history():
+    """Historial acotado de transiciones (apertura, escalamiento, desescalamiento, cierre)."""
+    with _alert_engine_lock:
+        return _alert_engine.events()
 
 # ------------------- FUNCIONES DE INTERFAZ DE BACKEND -------------------
 
-def get_floor_status(df_alerts, piso):
+def get_floor_status(df_alerts, piso, edificio=None):
     """
     Retorna el estado más crítico y un resumen para el Frontend.
+    Con `edificio`, solo considera las alertas de ese edificio.
+    Para muchos pisos, usar get_floor_status_index (búsquedas O(1)).
     """
-    level_order = {'Crítica': 4, 'Preventiva Crítica': 3.5, 'Media': 3, 'Preventiva Media': 2.5, 'Informativa': 2, 'OK': 1}
-    
     # La columna 'piso' ahora está garantizada por la corrección en generate_alerts
     alerts_piso = df_alerts[df_alerts['piso'] == piso]
+    if edificio is not None:
+        alerts_piso = alerts_piso[alerts_piso['edificio'] == edificio]
     
     if alerts_piso.empty:
-        return 'OK', 'Sin problemas de eficiencia o confort.'
-        
-    max_level = 'OK'
-    max_score = 1
-    
-    for level in alerts_piso['nivel'].unique():
-        if level in level_order and level_order[level] > max_score:
-            max_score = level_order[level]
-            max_level = level
+        return 'OK', OK_SUMMARY
+
+    # Máximo del categórico ordenado = nivel más severo (los niveles desconocidos no cuentan)
+    max_level = as_levels(alerts_piso['nivel']).max()
+    max_level = 'OK' if pd.isna(max_level) else max_level
             
     summary = ', '.join(alerts_piso['variable'].unique()) + ' fuera de rango.'
     
     display_level = max_level.replace('Preventiva ', '') 
     
-    return display_level, summary
\ No newline at end of file
+    return display_level, summary
+
+# Estado por piso materializado, compartido por las sesiones del dashboard y la API del proceso
+_status_index = FloorStatusIndex()
+
+def get_floor_status_index(df_alerts, keys=()):
+    """
+    Índice de estado por piso (ver backend/floor_status.py) actualizado con
+    `df_alerts` (el frame completo de alertas vigentes, no uno filtrado): solo
+    se recalculan los pisos cuyas alertas cambiaron desde la llamada anterior.
+    """
+    return _status_index.update(df_alerts, keys)
+
+@metrics.instrumented('estado_pisos')
+def get_floor_status_table(df_alerts, keys):
+    """
+    Estado de todos los pisos a la vez (mismo resultado que get_floor_status
+    piso por piso). `keys` son los (edificio, piso) a reportar; los que no
+    tienen alertas quedan en 'OK'. Retorna columnas 'edificio', 'piso', 'nivel'
+    (categórico ordenado por severidad), 'resumen'.
+    """
+    return get_floor_status_index(df_alerts, keys).table(keys)
@@ -0,0 +1,141 @@
+# =========================================================
+# MÓDULO: downsampling.py (BACKEND - REDUCCIÓN DE PUNTOS PARA GRÁFICOS)
+# Propósito: Reducir cada serie (edificio, piso, variable) a un presupuesto de
+# puntos acorde al ancho del gráfico (LTTB o envolvente min/max, ambos
+# conservan los picos) antes de enviarla al navegador, con caché por
+# (serie, ventana, resolución).
+# =========================================================
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from configuracion.config import DOWNSAMPLE_METHOD, CHART_POINTS, DOWNSAMPLE_CACHE_SIZE
+from backend.schema import floor_series, exact_readings
+from backend import metrics
+
+METHODS = ('lttb', 'minmax')
+CHART_VARIABLES = ['temp_C', 'humedad_pct', 'energia_kW']
+
+# ------------------- ALGORITMOS -------------------
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: índices de los `n_out` puntos que mejor
+    conservan la forma visual de la serie. Siempre incluye el primero y el último.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # n_out - 2 cubetas entre el primer y el último punto
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    cum_x = np.concatenate(([0.0], np.cumsum(x)))
+    cum_y = np.concatenate(([0.0], np.cumsum(y)))
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        avg_x = (cum_x[next_hi] - cum_x[next_lo]) / (next_hi - next_lo)
+        avg_y = (cum_y[next_hi] - cum_y[next_lo]) / (next_hi - next_lo)
+
+        # Área del triángulo (punto elegido anterior, candidato, promedio de la cubeta siguiente)
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        selected[i + 1] = a
+    return selected
+
+
+def minmax_indices(y, n_out):
+    """
+    Envolvente min/max: el mínimo y el máximo de cada cubeta (a lo sumo
+    `n_out` puntos), más el primero y el último. Ningún pico se pierde.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 4:
+        return np.arange(n)
+
+    buckets = (n_out - 2) // 2
+    interior = np.arange(1, n - 1)
+    bucket = (interior - 1) * buckets // (n - 2)
+    order = np.lexsort((y[interior], bucket)) # por cubeta y, dentro de ella, por valor
+    sorted_bucket = bucket[order]
+    starts = np.flatnonzero(np.r_[True, sorted_bucket[1:] != sorted_bucket[:-1]])
+    ends = np.r_[starts[1:], len(order)] - 1
+    return np.unique(np.concatenate(([0], interior[order[starts]], interior[order[ends]], [n - 1])))
+
+
+def downsample_indices(x, y, n_out, method=DOWNSAMPLE_METHOD):
+    """Índices (ordenados) de los puntos a conservar de la serie (x, y)."""
+    if method == 'lttb':
+        return lttb_indices(x, y, n_out)
+    if method == 'minmax':
+        return minmax_indices(y, n_out)
+    raise ValueError(f"Método de reducción desconocido: {method}")
+
+# ------------------- SERIES PARA GRÁFICOS -------------------
+
+# Caché LRU compartida por las sesiones del dashboard:
+# {(edificio, piso, variable, inicio, fin, puntos, método, n, última_lectura): (timestamps, valores)}
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _series_points(key, timestamps, values, budget, method):
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit is not None:
+            _cache.move_to_end(key)
+    metrics.cache_access('reduccion', hit is not None)
+    if hit is not None:
+        return hit
+
+    valid = ~np.isnan(values)
+    timestamps, values = timestamps[valid], values[valid]
+    x = (timestamps - timestamps[0]).astype(np.float64) if len(timestamps) else timestamps.astype(np.float64)
+    keep = downsample_indices(x, values, budget, method)
+    result = (timestamps[keep], values[keep])
+
+    with _cache_lock:
+        _cache[key] = result
+        while len(_cache) > DOWNSAMPLE_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
+
+
+def chart_series(df, edificio, start=None, end=None, variables=CHART_VARIABLES, budget=CHART_POINTS,
+                 method=DOWNSAMPLE_METHOD):
+    """
+    Series reducidas del edificio en la ventana (start, end] listas para
+    graficar: formato largo con columnas 'timestamp', 'edificio', 'piso',
+    'variable' y 'valor' (el mismo del DataFrame derretido del dashboard),
+    con a lo sumo `budget` puntos por (piso, variable).
+    """
+    series = floor_series(df, edificio, start, end, variables)
+    if not series:
+        return pd.DataFrame(columns=['timestamp', 'edificio', 'piso', 'variable', 'valor'])
+    window_key = (start, end)
+
+    parts_ts, parts_val, parts_piso, parts_var = [], [], [], []
+    for j, var in enumerate(variables):
+        for piso, (timestamps, values) in series.items():
+            key = (edificio, piso, var, window_key, budget, method, len(timestamps), timestamps[-1])
+            ts, vals = _series_points(key, timestamps, exact_readings(values[:, j]), budget, method)
+            parts_ts.append(ts)
+            parts_val.append(vals)
+            parts_piso.append(np.full(len(ts), piso))
+            parts_var.append(np.full(len(ts), var, dtype=object))
+
+    # Un único DataFrame al final (no uno por serie)
+    return pd.DataFrame({
+        'timestamp': np.concatenate(parts_ts).astype('datetime64[ns]'),
+        'edificio': edificio,
+        'piso': np.concatenate(parts_piso),
+        'variable': np.concatenate(parts_var),
+        'valor': np.concatenate(parts_val),
+    })
@@ -0,0 +1,154 @@
+# =========================================================
+# MÓDULO: floor_status.py (BACKEND - ÍNDICE MATERIALIZADO DE ESTADO POR PISO)
+# Propósito: Mantener el estado de cada (edificio, piso) (nivel más severo,
+# resumen y variables afectadas) para que las tarjetas, los filtros por
+# nivel y las tablas ordenadas del dashboard sean búsquedas en diccionarios.
+# Se construye con una sola agrupación de las alertas y, con cada frame de
+# alertas nuevo, solo se recalculan los pisos cuyas alertas cambiaron.
+# =========================================================
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from backend.schema import ALERT_LEVELS, LEVEL_DTYPE, as_levels
+
+OK_SUMMARY = 'Sin problemas de eficiencia o confort.'
+# Nivel mostrado en el estado de un piso: las preventivas cuentan como su nivel
+STATUS_LEVELS = [level.replace('Preventiva ', '') for level in ALERT_LEVELS]
+
+
+class FloorStatusIndex:
+    """
+    Estado por piso: {(edificio, piso): (nivel, resumen, variables)} más
+    los pisos de cada nivel ({nivel: set de claves}). El nivel es el de la
+    alerta más severa del piso (orden de LEVEL_DTYPE; 'Preventiva Media'
+    se muestra como 'Media'); los pisos sin alertas están en 'OK'.
+
+    `update(df_alerts, keys)` agrupa las alertas por piso una vez, con una
+    firma (suma de hashes de variable, nivel y posición de la fila dentro del
+    piso, así un cambio de orden también cuenta) y el código de nivel máximo
+    por piso; el resumen (la parte cara, con texto) solo se rearma en los
+    pisos cuya firma cambió. Pasarle el mismo frame otra vez no hace nada.
+    """
+
+    def __init__(self):
+        self._status = {}
+        self._signatures = {}
+        self._by_level = {level: set() for level in dict.fromkeys(STATUS_LEVELS)}
+        self._source = None
+        self._ranked = None
+        self.version = 0
+        self._lock = threading.Lock()
+
+    # ------------------- ACTUALIZACIÓN -------------------
+
+    def _groups(self, df_alerts):
+        """(claves, firma, código de nivel máximo) por piso con alertas, en una sola agrupación."""
+        if df_alerts.empty:
+            return [], np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64)
+        levels = as_levels(df_alerts['nivel'])
+        frame = pd.DataFrame({
+            'edificio': np.asarray(df_alerts['edificio'], dtype=object),
+            'piso': np.asarray(df_alerts['piso'], dtype=np.int64),
+            '_codigo': levels.codes.astype(np.int64), # -1: nivel fuera de ALERT_LEVELS (cuenta como 'OK')
+        })
+        # La posición de cada fila dentro de su piso entra en el hash: el resumen sigue ese orden
+        position = frame.groupby(['edificio', 'piso'], sort=False).cumcount().to_numpy()
+        frame['_firma'] = pd.util.hash_pandas_object(
+            pd.DataFrame({'variable': np.asarray(df_alerts['variable'], dtype=object), 'nivel': levels,
+                          'posicion': position}),
+            index=False).to_numpy()
+        grouped = frame.groupby(['edificio', 'piso'], sort=False).agg(_firma=('_firma', 'sum'),
+                                                                     _codigo=('_codigo', 'max'))
+        return list(grouped.index), grouped['_firma'].to_numpy(), grouped['_codigo'].to_numpy()
+
+    def _set(self, key, status):
+        old = self._status.get(key)
+        if old is not None:
+            self._by_level[old[0]].discard(key)
+        self._status[key] = status
+        self._by_level[status[0]].add(key)
+
+    def update(self, df_alerts, keys=()):
+        """Incorpora el frame de alertas vigente (completo, de todos los edificios) y los pisos `keys` sin alertas."""
+        with self._lock:
+            new_keys = [key for key in keys if key not in self._status]
+            if df_alerts is self._source and not new_keys:
+                return self
+            for key in new_keys:
+                self._set(key, ('OK', OK_SUMMARY, ()))
+
+            group_keys, signatures, codes = self._groups(df_alerts)
+            previous = self._signatures
+            current = dict(zip(group_keys, signatures.tolist()))
+            changed = [i for i, key in enumerate(group_keys) if previous.get(key) != current[key]]
+            cleared = [key for key in previous if key not in current]
+
+            for key in cleared:
+                self._set(key, ('OK', OK_SUMMARY, ()))
+            if changed:
+                variables = self._variables(df_alerts, [group_keys[i] for i in changed])
+                for i in changed:
+                    key = group_keys[i]
+                    level = STATUS_LEVELS[codes[i]] if codes[i] > 0 else 'OK'
+                    names = variables[key]
+                    self._set(key, (level, ', '.join(names) + ' fuera de rango.', names))
+
+            self._signatures = current
+            self._source = df_alerts
+            if changed or cleared or new_keys:
+                self._ranked = None
+                self.version += 1
+            return self
+
+    @staticmethod
+    def _variables(df_alerts, keys):
+        """Variables afectadas (sin repetir, en orden de aparición) de los pisos `keys`."""
+        index = pd.MultiIndex.from_arrays([np.asarray(df_alerts['edificio'], dtype=object),
+                                           np.asarray(df_alerts['piso'], dtype=np.int64)])
+        rows = df_alerts[index.isin(keys)]
+        rows_index = index[index.isin(keys)]
+        result = {}
+        for key, variable in zip(rows_index, rows['variable'].to_numpy()):
+            names = result.setdefault(key, [])
+            if variable not in names:
+                names.append(variable)
+        return {key: tuple(names) for key, names in result.items()}
+
+    # ------------------- CONSULTAS -------------------
+
+    def get(self, edificio, piso):
+        """(nivel, resumen) del piso; 'OK' si no tiene alertas."""
+        status = self._status.get((edificio, piso))
+        return ('OK', OK_SUMMARY) if status is None else status[:2]
+
+    def variables(self, edificio, piso):
+        """Variables con alertas del piso."""
+        status = self._status.get((edificio, piso))
+        return () if status is None else status[2]
+
+    def floors_at(self, level):
+        """Claves (edificio, piso) cuyo estado es `level` ('OK', 'Informativa', 'Media' o 'Crítica')."""
+        return self._by_level.get(level, set())
+
+    def ranked(self):
+        """Claves de todos los pisos ordenadas por severidad (mayor primero), luego por edificio y piso."""
+        ranked = self._ranked
+        if ranked is None:
+            with self._lock:
+                order = {level: i for i, level in enumerate(ALERT_LEVELS)}
+                ranked = self._ranked = sorted(self._status, key=lambda k: (-order[self._status[k][0]], k))
+        return ranked
+
+    def table(self, keys):
+        """Estado de los pisos `keys` con columnas 'edificio', 'piso', 'nivel' (categórico ordenado), 'resumen'."""
+        keys = list(keys)
+        states = [self.get(*key) for key in keys]
+        return pd.DataFrame({
+            'edificio': [k[0] for k in keys],
+            'piso': [k[1] for k in keys],
+            'nivel': pd.Categorical([s[0] for s in states], dtype=LEVEL_DTYPE),
+            'resumen': [s[1] for s in states],
+        })
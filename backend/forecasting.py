@@ -0,0 +1,103 @@
+# =========================================================
+# MÓDULO: forecasting.py (BACKEND - MOTOR DE PRONÓSTICO)
+# Propósito: Suavizamiento exponencial Holt (tendencia) y Holt-Winters
+# (ciclo diario) vectorizado sobre todas las series (edificio, piso),
+# con actualización incremental por tick.
+# =========================================================
+
+import numpy as np
+
+from backend.predictor import DEFAULT_VARIABLES, RollingMeanPredictor, StreamingSeriesModel
+
+MODELS = ('ma', 'holt', 'holt_winters')
+
+
+def _damped_steps(phi, horizon):
+    """Suma phi + phi^2 + ... + phi^h (tendencia amortiguada acumulada a `horizon` pasos)."""
+    if phi == 1.0:
+        return float(horizon)
+    return phi * (1 - phi ** horizon) / (1 - phi)
+
+
+class HoltForecaster(StreamingSeriesModel):
+    """
+    Holt lineal (nivel + tendencia amortiguada) para todas las series a la vez.
+    El estado son arreglos (series, variables); cada lectura lo actualiza en O(1).
+    """
+
+    def __init__(self, horizon, variables=DEFAULT_VARIABLES, alpha=0.3, beta=0.02, phi=0.98, capacity=16):
+        self.horizon = horizon
+        self.alpha, self.beta, self.phi = alpha, beta, phi
+        # Sin historial previo, unas pocas lecturas bastan para arrancar nivel y tendencia.
+        self.warmup = max(2, int(round(3 / alpha)))
+        super().__init__(variables, capacity)
+
+    def _allocate(self, capacity):
+        shape = (capacity, len(self.variables))
+        self._level = np.zeros(shape)
+        self._trend = np.zeros(shape)
+        self._counts = np.zeros(capacity, dtype=np.int64)
+
+    def _smooth(self, slots, target):
+        """Actualiza nivel y tendencia hacia `target`; retorna el nivel nuevo."""
+        first = (self._counts[slots] == 0)[:, None]
+        prev_level = self._level[slots]
+        prev_trend = self._trend[slots]
+
+        level = self.alpha * target + (1 - self.alpha) * (prev_level + self.phi * prev_trend)
+        trend = self.beta * (level - prev_level) + (1 - self.beta) * self.phi * prev_trend
+        self._level[slots] = np.where(first, target, level)
+        self._trend[slots] = np.where(first, 0.0, trend)
+        self._counts[slots] += 1
+        return self._level[slots]
+
+    def _push(self, slots, values):
+        self._smooth(slots, values)
+
+    def _forecast(self, n):
+        steps = _damped_steps(self.phi, self.horizon)
+        return np.where(self._counts[:n, None] > 0, self._level[:n] + steps * self._trend[:n], np.nan)
+
+
+class HoltWintersForecaster(HoltForecaster):
+    """
+    Holt-Winters aditivo: Holt sobre la serie desestacionalizada más un
+    componente estacional de `season_length` lecturas (ciclo diario) por serie.
+    """
+
+    def __init__(self, horizon, season_length, variables=DEFAULT_VARIABLES,
+                 alpha=0.3, beta=0.02, gamma=0.1, phi=0.98, capacity=16):
+        self.season_length = season_length
+        self.gamma = gamma
+        super().__init__(horizon, variables, alpha, beta, phi, capacity)
+        self.warmup = season_length
+
+    def _allocate(self, capacity):
+        super()._allocate(capacity)
+        self._season = np.zeros((capacity, len(self.variables), self.season_length))
+
+    def _push(self, slots, values):
+        phase = self._counts[slots] % self.season_length
+        season = self._season[slots, :, phase]
+        level = self._smooth(slots, values - season)
+        self._season[slots, :, phase] = self.gamma * (values - level) + (1 - self.gamma) * season
+
+    def _forecast(self, n):
+        phase = (self._counts[:n] - 1 + self.horizon) % self.season_length
+        season = self._season[np.arange(n), :, phase]
+        return super()._forecast(n) + season
+
+
+def make_forecaster(model, horizon, window, variables=DEFAULT_VARIABLES, season_length=1440, **params):
+    """
+    Construye el modelo de pronóstico `model` ('ma', 'holt' o 'holt_winters').
+    `window` es la ventana del promedio móvil; `horizon` y `season_length` se
+    expresan en lecturas por serie.
+    """
+    if model == 'ma':
+        return RollingMeanPredictor(window, variables)
+    if model == 'holt':
+        return HoltForecaster(horizon, variables, **params)
+    if model == 'holt_winters':
+        return HoltWintersForecaster(horizon, season_length, variables, **params)
+    raise ValueError(f"Modelo de pronóstico desconocido: {model}")
@@ -0,0 +1,312 @@
+# =========================================================
+# MÓDULO: ingest_server.py (BACKEND - INGESTA DE SENSORES)
+# Propósito: Servicio asyncio que recibe lecturas de dispositivos de campo
+# (TCP: JSON por línea; UDP: registros binarios de ancho fijo), las valida,
+# las agrupa en micro-lotes hacia el almacén y aplica contrapresión cuando
+# la escritura se atrasa. Incluye un cliente de reproducción del simulador.
+# Uso (desde la raíz):
+#   python -m backend.ingest_server serve
+#   python -m backend.ingest_server replay --rate 20000 --edificios 10 --pisos 20 --udp
+# =========================================================
+
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from configuracion.config import DATA_DIR, STORAGE_BACKEND, INGEST_HOST, INGEST_PORT
+from backend.shm_ring import READING_DTYPE, readings_to_frame
+from backend.schema import PISO_DTYPE
+from backend.storage import open_store
+from backend.rollups import open_rollups
+
+READING_COLUMNS = ['timestamp', 'edificio', 'piso', 'temp_C', 'humedad_pct', 'energia_kW']
+
+# Rangos físicamente plausibles; fuera de ellos la lectura se rechaza
+VALID_RANGES = {
+    'temp_C': (-40.0, 85.0),
+    'humedad_pct': (0.0, 100.0),
+    'energia_kW': (0.0, 10000.0),
+}
+
+BATCH_MAX_READINGS = 20000 # Lecturas máximas por escritura al almacén
+FLUSH_INTERVAL_SECONDS = 0.5 # Tiempo máximo que una lectura espera en el micro-lote
+QUEUE_MAX_BATCHES = 64 # Lotes en cola antes de aplicar contrapresión
+REPORT_INTERVAL_SECONDS = 5.0
+DEFAULT_MAX_RECORDS = 1_000_000
+
+# ------------------- VALIDACIÓN -------------------
+
+def validate_readings(df):
+    """
+    Valida un lote contra el esquema de lecturas de forma vectorizada.
+    Retorna (lecturas_válidas, cantidad_rechazada).
+    """
+    if df.empty:
+        return pd.DataFrame(columns=READING_COLUMNS), 0
+    missing = [c for c in READING_COLUMNS if c not in df.columns]
+    if missing:
+        return pd.DataFrame(columns=READING_COLUMNS), len(df)
+
+    ts = df['timestamp']
+    if pd.api.types.is_numeric_dtype(ts):
+        ts = pd.to_datetime(ts, unit='s', errors='coerce')
+    else:
+        ts = pd.to_datetime(ts, errors='coerce', format='ISO8601')
+
+    valid = pd.DataFrame({
+        'timestamp': ts,
+        'edificio': df['edificio'].astype(str),
+        'piso': pd.to_numeric(df['piso'], errors='coerce'),
+    })
+    # Piso entero y representable en PISO_DTYPE: 2.7 o 70000 no se redondean ni desbordan a otro piso
+    piso_range = np.iinfo(PISO_DTYPE)
+    ok = (valid['timestamp'].notna() & valid['piso'].between(piso_range.min, piso_range.max)
+          & (valid['piso'] % 1 == 0) & (valid['edificio'].str.len().between(1, 8)))
+    for var, (low, high) in VALID_RANGES.items():
+        valid[var] = pd.to_numeric(df[var], errors='coerce')
+        ok &= valid[var].between(low, high)
+
+    valid = valid[ok.to_numpy()]
+    valid['piso'] = valid['piso'].astype(np.int64)
+    return valid.reset_index(drop=True), int((~ok).sum())
+
+
+def decode_binary(payload):
+    """Decodifica registros binarios (READING_DTYPE, 32 bytes c/u). None si el tamaño no es válido."""
+    if len(payload) % READING_DTYPE.itemsize:
+        return None
+    return readings_to_frame(np.frombuffer(payload, dtype=READING_DTYPE)).reset_index()
+
+
+def encode_binary(df):
+    """Codifica lecturas (formato de generate_live_data) como registros binarios de ancho fijo."""
+    records = np.empty(len(df), dtype=READING_DTYPE)
+    records['ts'] = pd.to_datetime(df['timestamp']).values.astype('datetime64[ns]').astype(np.int64)
+    records['edificio'] = df['edificio'].astype(str).str.encode('ascii').to_numpy()
+    records['piso'] = df['piso'].to_numpy()
+    for var in VALID_RANGES:
+        records[var] = df[var].to_numpy()
+    return records.tobytes()
+
+# ------------------- SERVIDOR -------------------
+
+class IngestServer:
+    """
+    Recibe lecturas por TCP (JSON por línea) y UDP (binario) y las escribe en
+    el almacén en micro-lotes de hasta BATCH_MAX_READINGS o cada
+    FLUSH_INTERVAL_SECONDS.
+
+    Contrapresión: la cola es acotada. Una conexión TCP espera a que haya
+    espacio antes de seguir leyendo su socket (el control de flujo TCP frena
+    al emisor); en UDP, sin control de flujo, los datagramas que no caben se
+    descartan y se contabilizan.
+    """
+
+    def __init__(self, store, host=INGEST_HOST, port=INGEST_PORT, rollups=None):
+        self.store = store
+        self.rollups = rollups
+        self.host = host
+        self.port = port
+        self.queue = asyncio.Queue(maxsize=QUEUE_MAX_BATCHES)
+        self.stats = {'received': 0, 'written': 0, 'rejected': 0, 'dropped': 0, 'backpressure_waits': 0}
+
+    # --- TCP: JSON por línea ---
+
+    async def _handle_tcp(self, reader, writer):
+        pending = b''
+        try:
+            while True:
+                chunk = await reader.read(1 << 16)
+                if not chunk:
+                    break
+                lines = (pending + chunk).split(b'\n')
+                pending = lines.pop()
+
+                records = []
+                for line in lines:
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        self.stats['rejected'] += 1
+                        continue
+                    if isinstance(record, dict):
+                        records.append(record)
+                    else:
+                        self.stats['rejected'] += 1 # JSON válido pero no es un objeto (p. ej. 123 o [1, 2])
+                if records:
+                    await self._enqueue(pd.DataFrame.from_records(records))
+        finally:
+            writer.close()
+
+    async def _enqueue(self, df):
+        self.stats['received'] += len(df)
+        if self.queue.full():
+            self.stats['backpressure_waits'] += 1
+        await self.queue.put(df)
+
+    # --- UDP: registros binarios ---
+
+    def _handle_datagram(self, payload):
+        df = decode_binary(payload)
+        if df is None:
+            self.stats['rejected'] += 1
+            return
+        self.stats['received'] += len(df)
+        try:
+            self.queue.put_nowait(df)
+        except asyncio.QueueFull:
+            self.stats['dropped'] += len(df)
+
+    # --- Escritura en micro-lotes ---
+
+    async def _writer(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            size = len(batch[0])
+            deadline = loop.time() + FLUSH_INTERVAL_SECONDS
+            while size < BATCH_MAX_READINGS:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    df = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(df)
+                size += len(df)
+
+            valid, rejected = validate_readings(pd.concat(batch, ignore_index=True))
+            self.stats['rejected'] += rejected
+            if not valid.empty:
+                # La escritura a disco no bloquea el bucle de eventos
+                await loop.run_in_executor(None, self._write, valid)
+                self.stats['written'] += len(valid)
+
+    def _write(self, df):
+        self.store.append(df)
+        if self.rollups is not None:
+            try:
+                self.rollups.update(df)
+            except ValueError as e:
+                # Más series que las reservadas: la ingesta sigue, sin histórico agregado
+                print(f"Advertencia: {e}. Rollups desactivados.")
+                self.rollups = None
+
+    async def _reporter(self):
+        last_written, last_time = 0, time.perf_counter()
+        while True:
+            await asyncio.sleep(REPORT_INTERVAL_SECONDS)
+            now = time.perf_counter()
+            rate = (self.stats['written'] - last_written) / (now - last_time)
+            last_written, last_time = self.stats['written'], now
+            print(f"📥 Ingesta: {rate:,.0f} lecturas/s | escritas {self.stats['written']:,} | "
+                  f"rechazadas {self.stats['rejected']:,} | descartadas {self.stats['dropped']:,} | "
+                  f"cola {self.queue.qsize()}/{QUEUE_MAX_BATCHES}")
+
+    async def serve(self):
+        loop = asyncio.get_running_loop()
+        tcp = await asyncio.start_server(self._handle_tcp, self.host, self.port)
+        server = self
+
+        class _UDPProtocol(asyncio.DatagramProtocol):
+            def datagram_received(self, data, addr):
+                server._handle_datagram(data)
+
+        udp, _ = await loop.create_datagram_endpoint(_UDPProtocol, local_addr=(self.host, self.port))
+        print(f"--- SERVICIO DE INGESTA en {self.host}:{self.port} (TCP JSON / UDP binario) ---")
+        try:
+            await asyncio.gather(tcp.serve_forever(), self._writer(), self._reporter())
+        finally:
+            udp.close()
+            tcp.close()
+
+# ------------------- CLIENTE DE REPRODUCCIÓN -------------------
+
+async def replay_client(rate, n_edificios, pisos, duration, use_udp=False, seed=None,
+                        host=INGEST_HOST, port=INGEST_PORT, step_seconds=60):
+    """
+    Reproduce la salida del simulador vectorizado contra el servicio a
+    `rate` lecturas/s durante `duration` segundos. Retorna las lecturas enviadas.
+    """
+    from data_simulator import VectorizedSimulator
+
+    sim = VectorizedSimulator(n_edificios, pisos, seed)
+    ticks_per_second = rate / len(sim.piso)
+    start = pd.Timestamp.now().floor('s')
+    loop = asyncio.get_running_loop()
+
+    if use_udp:
+        transport, _ = await loop.create_datagram_endpoint(asyncio.DatagramProtocol, remote_addr=(host, port))
+        per_datagram = 60000 // READING_DTYPE.itemsize # Cabe en un datagrama UDP
+    else:
+        _, writer = await asyncio.open_connection(host, port)
+
+    sent, tick = 0, 0
+    t0 = loop.time()
+    while loop.time() - t0 < duration:
+        df = sim.step(start + pd.Timedelta(seconds=tick * step_seconds))
+        if use_udp:
+            payload = encode_binary(df)
+            step = per_datagram * READING_DTYPE.itemsize
+            for i in range(0, len(payload), step):
+                transport.sendto(payload[i:i + step])
+        else:
+            lines = df.assign(timestamp=df['timestamp'].dt.strftime('%Y-%m-%dT%H:%M:%S')).to_json(
+                orient='records', lines=True)
+            writer.write(lines.encode('utf-8') + b'\n')
+            await writer.drain() # Respeta la contrapresión del servidor
+        sent += len(df)
+        tick += 1
+
+        # Ritmo: el tick `tick` debería salir en t0 + tick / ticks_per_second
+        delay = t0 + tick / ticks_per_second - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    elapsed = loop.time() - t0
+    if use_udp:
+        transport.close()
+    else:
+        writer.close()
+        await writer.wait_closed()
+    print(f"✅ Cliente: {sent:,} lecturas enviadas en {elapsed:.1f}s ({sent / elapsed:,.0f} lecturas/s, "
+          f"{'UDP binario' if use_udp else 'TCP JSON'})")
+    return sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servicio de ingesta de sensores SmartFloors.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    serve = sub.add_parser('serve', help="Iniciar el servicio de ingesta.")
+    serve.add_argument('--max-records', type=int, default=DEFAULT_MAX_RECORDS, help="Retención del almacén.")
+    serve.add_argument('--reset', action='store_true', help="Vaciar el almacén al iniciar.")
+
+    replay = sub.add_parser('replay', help="Reproducir el simulador contra el servicio.")
+    replay.add_argument('--rate', type=float, default=1000, help="Lecturas por segundo.")
+    replay.add_argument('--edificios', type=int, default=1)
+    replay.add_argument('--pisos', type=int, default=3)
+    replay.add_argument('--duration', type=float, default=30, help="Segundos de envío.")
+    replay.add_argument('--udp', action='store_true', help="Enviar registros binarios por UDP (por defecto TCP JSON).")
+    replay.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        store = open_store(DATA_DIR, STORAGE_BACKEND, args.max_records)
+        if args.reset:
+            store.reset()
+        asyncio.run(IngestServer(store, rollups=open_rollups()).serve())
+    else:
+        pisos = list(range(1, args.pisos + 1))
+        asyncio.run(replay_client(args.rate, args.edificios, pisos, args.duration, args.udp, args.seed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,280 @@
+# =========================================================
+# MÓDULO: metrics.py (BACKEND - INSTRUMENTACIÓN DE RUTAS CRÍTICAS)
+# Propósito: Temporizadores por etapa (histogramas de latencia) y contadores
+# (filas ingeridas, alertas emitidas, aciertos de caché) de bajo costo, que
+# se activan/desactivan en caliente. Se exportan en formato de texto de
+# Prometheus (archivo por proceso en METRICS_DIR o endpoint /metrics de la
+# API) y como tabla para el panel de diagnóstico del dashboard. Incluye una
+# captura opcional con cProfile de un ciclo de refresco.
+# =========================================================
+
+import cProfile
+import functools
+import io
+import os
+import pstats
+import threading
+import time
+from bisect import bisect_left
+
+from configuracion.config import METRICS_ENABLED, METRICS_DIR, METRICS_EXPORT_SECONDS, METRICS_BUCKETS
+
+PREFIX = 'smartfloors'
+
+# ------------------- REGISTRO -------------------
+
+class Histogram:
+    """Histograma de latencias (segundos) con cubetas fijas, como los de Prometheus."""
+
+    __slots__ = ('bounds', 'counts', 'sum', 'count', 'last')
+
+    def __init__(self, bounds=METRICS_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1) # La última cubeta es +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.last = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(self.bounds, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+        self.last = seconds
+
+    def quantile(self, q):
+        """Cuantil aproximado (interpolación lineal dentro de la cubeta), como histogram_quantile."""
+        if self.count == 0:
+            return float('nan')
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                if i == len(self.bounds):
+                    return self.bounds[-1] # Cubeta +Inf: cota inferior conocida
+                lower = self.bounds[i - 1] if i else 0.0
+                return lower + (self.bounds[i] - lower) * (rank - seen) / n
+            seen += n
+        return self.bounds[-1]
+
+
+class Registry:
+    """Contadores {(nombre, etiquetas): valor} e histogramas {etapa: Histogram}, compartidos por los hilos del proceso."""
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def count(self, name, n=1, labels=()):
+        key = (name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def to_prometheus(self):
+        """Contadores e histogramas en formato de texto de exposición de Prometheus."""
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items())
+        lines = []
+        declared = set()
+        for (name, labels), value in counters:
+            metric = f'{PREFIX}_{name}_total'
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f'# TYPE {metric} counter')
+            lines.append(f'{metric}{_labels(labels)} {value}')
+
+        metric = f'{PREFIX}_stage_seconds'
+        if histograms:
+            lines.append(f'# HELP {metric} Latencia por etapa de las rutas críticas.')
+            lines.append(f'# TYPE {metric} histogram')
+        for stage, h in histograms:
+            cumulative = 0
+            for bound, n in zip(h.bounds + ('+Inf',), h.counts):
+                cumulative += n
+                lines.append(f'{metric}_bucket{_labels((("stage", stage), ("le", str(bound))))} {cumulative}')
+            lines.append(f'{metric}_sum{_labels((("stage", stage),))} {h.sum:.6f}')
+            lines.append(f'{metric}_count{_labels((("stage", stage),))} {h.count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels):
+    return '{' + ','.join(f'{k}="{v}"' for k, v in labels) + '}' if labels else ''
+
+
+REGISTRY = Registry()
+_state = {'enabled': METRICS_ENABLED}
+_next_export = {} # {proceso: monotonic de la próxima escritura permitida}
+
+def set_enabled(flag):
+    """Activa o desactiva la instrumentación (lo ya registrado se conserva)."""
+    _state['enabled'] = bool(flag)
+
+def is_enabled():
+    return _state['enabled']
+
+# ------------------- TEMPORIZADORES Y CONTADORES -------------------
+
+class _Timer:
+    __slots__ = ('stage', 't0')
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        REGISTRY.observe(self.stage, time.perf_counter() - self.t0)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+def timed(stage):
+    """`with timed('etapa'):` registra la duración del bloque (sin costo si la instrumentación está apagada)."""
+    return _Timer(stage) if _state['enabled'] else _NULL_TIMER
+
+def instrumented(stage):
+    """Decorador: registra la duración de cada llamada a la función como la etapa `stage`."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _state['enabled']:
+                return func(*args, **kwargs)
+            t0 = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                REGISTRY.observe(stage, time.perf_counter() - t0)
+        return wrapper
+    return decorate
+
+def count(name, n=1, **labels):
+    """Suma `n` al contador `name` (con etiquetas opcionales, p. ej. cache='lecturas')."""
+    if _state['enabled'] and n:
+        REGISTRY.count(name, n, tuple(sorted(labels.items())))
+
+def cache_access(cache, hit):
+    """Registra un acierto o fallo de la caché `cache`."""
+    count('cache_hits' if hit else 'cache_misses', cache=cache)
+
+# ------------------- EXPORTACIÓN -------------------
+
+def stage_table():
+    """Resumen por etapa para el panel de diagnóstico: [(etapa, n, media ms, p50 ms, p95 ms, última ms)]."""
+    with REGISTRY._lock:
+        items = sorted((stage, h.count, h.sum, h.quantile(0.5), h.quantile(0.95), h.last)
+                       for stage, h in REGISTRY.histograms.items())
+    return [(stage, n, 1000 * total / n if n else 0.0, 1000 * p50, 1000 * p95, 1000 * last)
+            for stage, n, total, p50, p95, last in items]
+
+def counter_table():
+    """Contadores como [(nombre, etiquetas 'k=v', valor)]."""
+    with REGISTRY._lock:
+        items = sorted(REGISTRY.counters.items())
+    return [(name, ','.join(f'{k}={v}' for k, v in labels), value) for (name, labels), value in items]
+
+def write_prometheus(path):
+    """Escribe el archivo de texto de forma atómica (apto para el textfile collector de node_exporter)."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(REGISTRY.to_prometheus())
+    os.replace(tmp_path, path)
+
+def export(role, directory=METRICS_DIR, min_interval=METRICS_EXPORT_SECONDS):
+    """
+    Escribe '<directory>/<role>.prom' a lo sumo cada `min_interval` segundos
+    (un archivo por proceso: simulador, daemon, dashboard). `directory` es
+    relativo a la raíz del proyecto. No hace nada si la instrumentación está apagada.
+    """
+    now = time.monotonic()
+    if not _state['enabled'] or now < _next_export.get(role, 0.0):
+        return
+    _next_export[role] = now + min_interval
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    try:
+        write_prometheus(os.path.join(root, directory, f'{role}.prom'))
+    except OSError as e:
+        print(f"ERROR al exportar métricas: {e}")
+
+# ------------------- PERFILADO (cProfile) -------------------
+
+_profile = {'requested': False, 'running': False, 'last': None}
+_profile_lock = threading.Lock()
+
+def request_profile():
+    """Pide perfilar con cProfile el próximo ciclo envuelto en `profile_cycle`."""
+    _profile['requested'] = True
+
+def last_profile():
+    """(archivo .prof, resumen de texto) del último ciclo perfilado, o None."""
+    return _profile['last']
+
+
+class _ProfileCycle:
+    def __init__(self, role, directory, top):
+        self.role, self.directory, self.top = role, directory, top
+        self.profiler = None
+
+    def __enter__(self):
+        with _profile_lock:
+            # Un solo perfilador a la vez en el proceso (cProfile no admite anidarlos)
+            if not _profile['requested'] or _profile['running']:
+                return self
+            _profile['requested'], _profile['running'] = False, True
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc):
+        if self.profiler is None:
+            return False
+        self.profiler.disable()
+        root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        path = os.path.join(root, self.directory, f'{self.role}.{time.strftime("%Y%m%d-%H%M%S")}.prof')
+        summary = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=summary).sort_stats('cumulative')
+        stats.print_stats(self.top)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            stats.dump_stats(path)
+        except OSError as e:
+            path = None
+            print(f"ERROR al guardar el perfil: {e}")
+        _profile['last'] = (path, summary.getvalue())
+        _profile['running'] = False
+        return False
+
+
+def profile_cycle(role, directory=METRICS_DIR, top=25):
+    """
+    `with profile_cycle('dashboard'):` perfila el bloque solo si se pidió con
+    request_profile(); guarda '<directory>/<role>.<fecha>.prof' (para snakeviz
+    o pstats) y un resumen de las `top` funciones con más tiempo acumulado.
+    """
+    return _ProfileCycle(role, directory, top)
@@ -0,0 +1,287 @@
+# =========================================================
+# MÓDULO: parquet_store.py (BACKEND - ALMACENAMIENTO COLUMNAR)
+# Propósito: Backend 'parquet' de storage.py. Lecturas en archivos Parquet
+# particionados por hora, con timestamps int64 (ns epoch), proyección de
+# columnas y filtrado por rango de tiempo empujado al disco.
+# =========================================================
+
+import os
+import shutil
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from backend.storage import READ_RETRIES, _manifest_path, _read_manifest, _write_manifest
+
+NS_PER_HOUR = 3600 * 10**9
+COMPACT_PARTS = 60 # Partes de una hora que disparan su compactación en un solo archivo
+
+# ------------------- CONVERSIONES -------------------
+
+def _to_epoch_ns(values):
+    """Convierte timestamps (datetime64/texto) a int64 en nanosegundos epoch."""
+    return pd.to_datetime(values).values.astype('datetime64[ns]').astype(np.int64)
+
+
+def _partition_name(hour):
+    return 'hour=' + pd.Timestamp(hour * NS_PER_HOUR).strftime('%Y%m%d%H')
+
+
+def _table_to_frame(table):
+    """Convierte una tabla de disco al formato del resto del sistema (columna 'timestamp')."""
+    df = table.to_pandas()
+    if 'seq' in df.columns:
+        df = df.drop(columns='seq')
+    if 'ts' in df.columns:
+        df.insert(0, 'timestamp', pd.to_datetime(df.pop('ts').values, unit='ns'))
+    return df
+
+# ------------------- ALMACÉN -------------------
+
+class ParquetHourStore:
+    """
+    Backend 'parquet': cada append escribe un archivo de parte dentro de la
+    partición de su hora (`hour=AAAAMMDDHH/`). Las horas cerradas (y la hora
+    actual cuando acumula COMPACT_PARTS partes) se compactan en un único
+    archivo. Como en el backend CSV, los lectores solo ven los archivos
+    publicados en el manifiesto, que se reemplaza de forma atómica.
+
+    Cada fila lleva la columna `seq` (número de append) para que el lector
+    incremental lea solo lo nuevo aunque los archivos se hayan compactado.
+    """
+
+    backend = 'parquet'
+
+    def __init__(self, directory, max_records=None):
+        self.directory = directory
+        self.max_records = max_records
+        self._manifest = None
+
+    def _empty_manifest(self):
+        return {'backend': 'parquet', 'log_id': uuid.uuid4().hex, 'max_records': self.max_records,
+                'next_id': 0, 'next_seq': 1, 'files': []}
+
+    def _get_manifest(self):
+        if self._manifest is None:
+            self._manifest = _read_manifest(self.directory) or self._empty_manifest()
+            if self.max_records is not None:
+                # Reapertura con otro límite: el manifiesto (que usan los lectores para recortar) adopta el nuevo
+                self._manifest['max_records'] = self.max_records
+        return self._manifest
+
+    # --- Escritura ---
+
+    def reset(self):
+        """Elimina el historial existente y deja un almacén vacío."""
+        if os.path.isdir(self.directory):
+            shutil.rmtree(self.directory)
+        os.makedirs(self.directory)
+        self._manifest = self._empty_manifest()
+        _write_manifest(self.directory, self._manifest)
+
+    def _write_file(self, table, hour, prefix):
+        manifest = self._manifest
+        rel_path = os.path.join(_partition_name(hour), f"{prefix}-{manifest['next_id']:08d}.parquet")
+        manifest['next_id'] += 1
+        os.makedirs(os.path.join(self.directory, _partition_name(hour)), exist_ok=True)
+        pq.write_table(table, os.path.join(self.directory, rel_path))
+
+        ts = table.column('ts').to_numpy()
+        seq = table.column('seq').to_numpy()
+        return {'file': rel_path, 'hour': int(hour), 'rows': table.num_rows,
+                'min_ts': int(ts.min()), 'max_ts': int(ts.max()),
+                'min_seq': int(seq.min()), 'max_seq': int(seq.max())}
+
+    def _compact(self, entries):
+        """Une varias partes de una misma hora en un archivo; retorna los archivos reemplazados."""
+        table = pa.concat_tables([pq.read_table(os.path.join(self.directory, e['file'])) for e in entries])
+        merged = self._write_file(table, entries[0]['hour'], 'c')
+        files = self._manifest['files']
+        first = files.index(entries[0])
+        for e in entries:
+            files.remove(e)
+        files.insert(first, merged)
+        return entries
+
+    def _compact_hours(self):
+        files = self._manifest['files']
+        if not files:
+            return []
+        current_hour = files[-1]['hour']
+        by_hour = {}
+        for e in files:
+            by_hour.setdefault(e['hour'], []).append(e)
+
+        removed = []
+        for hour, entries in by_hour.items():
+            if (hour < current_hour and len(entries) > 1) or len(entries) >= COMPACT_PARTS:
+                removed += self._compact(entries)
+        return removed
+
+    def _drop_old_files(self):
+        """Retira los archivos más antiguos mientras el resto siga cubriendo max_records."""
+        if not self.max_records:
+            return []
+        files = self._manifest['files']
+        total_rows = sum(e['rows'] for e in files)
+        dropped = []
+        while len(files) > 1 and total_rows - files[0]['rows'] >= self.max_records:
+            total_rows -= files[0]['rows']
+            dropped.append(files.pop(0))
+        return dropped
+
+    def append(self, df):
+        """Anexa las filas de `df` (con columna 'timestamp') y publica el nuevo manifiesto."""
+        if df.empty:
+            return
+
+        manifest = self._get_manifest()
+        os.makedirs(self.directory, exist_ok=True)
+
+        frame = df.drop(columns='timestamp')
+        frame.insert(0, 'ts', _to_epoch_ns(df['timestamp']))
+        frame.insert(0, 'seq', np.full(len(frame), manifest['next_seq'], dtype=np.int64))
+        manifest['next_seq'] += 1
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+
+        hours = frame['ts'].values // NS_PER_HOUR
+        unique_hours = np.unique(hours)
+        for hour in unique_hours:
+            part = table if len(unique_hours) == 1 else table.filter(pa.array(hours == hour))
+            manifest['files'].append(self._write_file(part, hour, 'part'))
+
+        removed = self._compact_hours() + self._drop_old_files()
+        _write_manifest(self.directory, manifest)
+
+        # Los archivos reemplazados se borran solo después de publicar el manifiesto.
+        for old in removed:
+            try:
+                os.remove(os.path.join(self.directory, old['file']))
+            except FileNotFoundError:
+                pass
+
+    # --- Lectura ---
+
+    def tail_reader(self):
+        return ParquetTailReader(self.directory)
+
+    def time_range(self):
+        """(primera, última) lectura retenida según el manifiesto, sin leer datos; None si está vacío."""
+        manifest = _read_manifest(self.directory)
+        if not manifest or not manifest['files']:
+            return None
+        lo = min(e['min_ts'] for e in manifest['files'])
+        hi = max(e['max_ts'] for e in manifest['files'])
+        return pd.Timestamp(lo), pd.Timestamp(hi)
+
+    def read(self, columns=None, pisos=None, start=None, end=None):
+        """
+        Lee las lecturas en [start, end] con proyección de columnas.
+
+        Las particiones fuera del rango se descartan con las estadísticas del
+        manifiesto, y dentro de cada archivo el filtro de tiempo/piso se
+        evalúa sobre los row groups (predicate pushdown). Sin filtros, el
+        resultado se recorta a max_records como en el backend CSV.
+        """
+        lo = None if start is None else int(_to_epoch_ns([start])[0])
+        hi = None if end is None else int(_to_epoch_ns([end])[0])
+        filters = []
+        if lo is not None:
+            filters.append(('ts', '>=', lo))
+        if hi is not None:
+            filters.append(('ts', '<=', hi))
+        if pisos is not None:
+            filters.append(('piso', 'in', list(pisos)))
+        projection = None if columns is None else ['ts'] + [c for c in columns if c not in ('ts', 'timestamp')]
+
+        for _ in range(READ_RETRIES):
+            manifest = _read_manifest(self.directory)
+            if manifest is None:
+                return pd.DataFrame()
+            entries = [
+                e for e in manifest['files']
+                if (lo is None or e['max_ts'] >= lo) and (hi is None or e['min_ts'] <= hi)
+            ]
+            try:
+                tables = [
+                    pq.read_table(os.path.join(self.directory, e['file']), columns=projection,
+                                  filters=filters or None)
+                    for e in entries
+                ]
+            except FileNotFoundError:
+                continue
+
+            if not tables:
+                return pd.DataFrame()
+            df = _table_to_frame(pa.concat_tables(tables))
+            if not filters and manifest.get('max_records'):
+                df = df.tail(manifest['max_records']).reset_index(drop=True)
+            return df
+
+        return pd.DataFrame()
+
+
+class ParquetTailReader:
+    """
+    Lector incremental del backend Parquet. Recuerda la firma del manifiesto y
+    el último `seq` leído; `poll()` solo lee filas con `seq` mayor, empujando
+    ese filtro a los archivos (las partes compactadas no se releen).
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._reset_state()
+
+    def _reset_state(self):
+        self.max_records = None
+        self._signature = None
+        self._log_id = None
+        self._last_seq = 0
+
+    def poll(self):
+        """Misma semántica que SegmentTailReader.poll(): None o (reset, nuevas_filas)."""
+        try:
+            st = os.stat(_manifest_path(self.directory))
+        except FileNotFoundError:
+            if self._log_id is None:
+                return None
+            self._reset_state()
+            return True, pd.DataFrame()
+
+        signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if signature == self._signature:
+            return None
+
+        reset = False
+        tables = []
+        for _ in range(READ_RETRIES):
+            manifest = _read_manifest(self.directory)
+            if manifest is None:
+                break
+            if manifest.get('log_id') != self._log_id:
+                self._log_id = manifest.get('log_id')
+                self._last_seq = 0
+                tables = []
+                reset = True
+            self.max_records = manifest.get('max_records')
+
+            try:
+                new_tables = [
+                    pq.read_table(os.path.join(self.directory, e['file']),
+                                  filters=[('seq', '>', self._last_seq)])
+                    for e in manifest['files'] if e['max_seq'] > self._last_seq
+                ]
+            except FileNotFoundError:
+                continue
+
+            tables += new_tables
+            if manifest['files']:
+                self._last_seq = max(self._last_seq, max(e['max_seq'] for e in manifest['files']))
+            self._signature = signature
+            break
+
+        new_rows = _table_to_frame(pa.concat_tables(tables)) if tables else pd.DataFrame()
+        return reset, new_rows
@@ -0,0 +1,175 @@
+# =========================================================
+# MÓDULO: predictor.py (BACKEND - PREDICCIÓN INCREMENTAL)
+# Propósito: Promedio móvil en streaming para todas las series
+# (edificio, piso, variable), con actualización O(1) por lectura.
+# =========================================================
+
+import numpy as np
+import pandas as pd
+
+from backend.schema import exact_readings
+
+SERIES_KEYS = ['edificio', 'piso']
+DEFAULT_VARIABLES = ('temp_C', 'humedad_pct', 'energia_kW')
+RESYNC_EVERY = 10000 # Recalcular sumas desde el buffer cada N rondas (evita deriva de punto flotante)
+
+
+def occurrence_rounds(slots):
+    """
+    Posiciones de un lote agrupadas por ronda: la ronda r contiene la r-ésima
+    lectura de cada serie (en el orden del lote), así que ninguna serie se repite
+    dentro de una ronda. Una sola ordenación, sin recorrer el lote por cada ronda.
+    """
+    if len(slots) == 0:
+        return []
+    occurrence = pd.Series(slots).groupby(slots).cumcount().to_numpy()
+    order = np.argsort(occurrence, kind='stable')
+    return np.split(order, np.flatnonzero(np.diff(occurrence[order])) + 1)
+
+
+class StreamingSeriesModel:
+    """
+    Base de los modelos en streaming: asigna a cada (edificio, piso) una fila
+    de los arreglos de estado y alimenta lecturas nuevas por rondas
+    vectorizadas. Las subclases definen `_allocate`, `_push` y `_forecast`.
+    """
+
+    # Lecturas por serie necesarias para reconstruir el estado tras un reinicio.
+    warmup = 1
+
+    def __init__(self, variables=DEFAULT_VARIABLES, capacity=16):
+        self.variables = list(variables)
+        self.reset(capacity)
+
+    def reset(self, capacity=16):
+        """Descarta todo el estado acumulado."""
+        self._slots = {}
+        self._keys = []
+        self._capacity = capacity
+        self._allocate(capacity)
+        self.last_timestamp = None
+
+    def _allocate(self, capacity):
+        raise NotImplementedError
+
+    def _push(self, slots, values):
+        raise NotImplementedError
+
+    def _forecast(self, n):
+        raise NotImplementedError
+
+    def _grow(self, needed):
+        """Amplía los arreglos de estado (eje 0) conservando las filas existentes."""
+        if needed <= self._capacity:
+            return
+        old = {name: value for name, value in vars(self).items()
+               if isinstance(value, np.ndarray) and value.shape[:1] == (self._capacity,)}
+        capacity = max(needed, self._capacity * 2)
+        self._allocate(capacity)
+        for name, value in old.items():
+            getattr(self, name)[:len(value)] = value
+        self._capacity = capacity
+
+    def register(self, keys):
+        """Asigna (o recupera) la fila de estado de cada clave (edificio, piso)."""
+        slots = np.empty(len(keys), dtype=np.int64)
+        for i, key in enumerate(keys):
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = self._slots[key] = len(self._keys)
+                self._keys.append(key)
+            slots[i] = slot
+        self._grow(len(self._keys))
+        return slots
+
+    def push(self, slots, values):
+        """Inserta una lectura por serie: `slots` sin repetir, `values` de forma (len(slots), variables)."""
+        self._push(slots, np.asarray(values, dtype=float))
+
+    def update(self, df):
+        """
+        Incorpora lecturas nuevas (DataFrame con 'edificio', 'piso' y las
+        variables, ordenado por tiempo). Si una serie trae varias lecturas en
+        el lote, se procesan por rondas: cada ronda es vectorizada y no repite serie.
+        """
+        if df.empty:
+            return
+        slots = self.register(list(zip(df['edificio'].to_numpy(), df['piso'].to_numpy())))
+        values = exact_readings(df[self.variables])
+        for positions in occurrence_rounds(slots):
+            self._push(slots[positions], values[positions])
+
+    def sync(self, df):
+        """
+        Sincroniza con un DataFrame histórico indexado por timestamp (como el de
+        load_and_prepare_data) incorporando solo las filas posteriores a la
+        última vista. Si hay un hueco o el historial fue reiniciado, se
+        reconstruye desde las últimas `warmup` lecturas de cada serie.
+        """
+        if df.empty:
+            return
+        index = df.index
+        if (self.last_timestamp is None
+                or index[-1] < self.last_timestamp
+                or index[0] > self.last_timestamp):
+            self.reset(self._capacity)
+            self.update(df.groupby(SERIES_KEYS, sort=False).tail(self.warmup))
+        else:
+            start = index.searchsorted(self.last_timestamp, side='right')
+            self.update(df.iloc[start:])
+        self.last_timestamp = index[-1]
+
+    def forecast_values(self):
+        """Pronóstico de todas las series registradas como arreglo (series, variables)."""
+        return self._forecast(len(self._keys))
+
+    def predict(self):
+        """Pronóstico (redondeado a 2 decimales) de todas las series como DataFrame."""
+        n = len(self._keys)
+        if n == 0:
+            return pd.DataFrame(columns=SERIES_KEYS + self.variables)
+        result = pd.DataFrame(np.round(self._forecast(n), 2), columns=self.variables)
+        result.insert(0, 'piso', [k[1] for k in self._keys])
+        result.insert(0, 'edificio', [k[0] for k in self._keys])
+        return result
+
+
+class RollingMeanPredictor(StreamingSeriesModel):
+    """
+    Promedio móvil de las últimas `window` lecturas de cada serie.
+
+    Cada (edificio, piso) ocupa una fila de un buffer circular de forma
+    (series, variables, window) y guarda su suma acumulada: una lectura nueva
+    reemplaza a la más antigua y ajusta la suma, sin recorrer el historial.
+    `predict()` responde todas las series a la vez.
+    """
+
+    def __init__(self, window, variables=DEFAULT_VARIABLES, capacity=16):
+        self.window = window
+        self.warmup = window
+        super().__init__(variables, capacity)
+
+    def _allocate(self, capacity):
+        self._buffer = np.zeros((capacity, len(self.variables), self.window))
+        self._sums = np.zeros((capacity, len(self.variables)))
+        self._counts = np.zeros(capacity, dtype=np.int64)
+        self._pos = np.zeros(capacity, dtype=np.int64)
+        self._rounds = 0
+
+    def _push(self, slots, values):
+        """Inserta una lectura por serie (slots sin repetir) en O(1) por lectura."""
+        pos = self._pos[slots]
+        old = self._buffer[slots, :, pos]
+        self._buffer[slots, :, pos] = values
+        self._sums[slots] += values - old
+        self._counts[slots] = np.minimum(self._counts[slots] + 1, self.window)
+        self._pos[slots] = (pos + 1) % self.window
+
+        self._rounds += 1
+        if self._rounds % RESYNC_EVERY == 0:
+            self._sums = self._buffer.sum(axis=2)
+
+    def _forecast(self, n):
+        counts = self._counts[:n, None]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(counts > 0, self._sums[:n] / counts, np.nan)
@@ -0,0 +1,142 @@
+# =========================================================
+# MÓDULO: redistribution.py (BACKEND - REDISTRIBUCIÓN DE CARGA ELÉCTRICA)
+# Propósito: Calcular a qué pisos mover la carga de los pisos con energía
+# alta (actual o pronosticada a +60 min) sin llevar a ningún receptor a
+# alerta: ni su energía ni su temperatura pueden pasar el primer umbral de
+# UMBRALES. Es un problema de transporte por edificio que se resuelve con
+# un reparto voraz en orden de piso, vectorizado sobre todos los edificios a
+# la vez. Completa el 'Piso Y' de la recomendación de energía y da los kW
+# que el bucle de corrección del simulador traslada entre pisos.
+# =========================================================
+
+import numpy as np
+
+from configuracion.config import REDISTRIBUTION_MARGIN_KW, REDISTRIBUTION_MARGIN_C, REDISTRIBUTION_KW_PER_C
+
+DESTINO_PLACEHOLDER = 'Piso Y'
+DESTINO_DEFAULT = 'piso con más margen' # Sin receptores con capacidad en el edificio
+MIN_TRANSFER_KW = 0.005 # Traslados menores se descartan (se informan con 2 decimales)
+UNITS_PER_KW = 1000 # El reparto se hace en enteros (milésimas de kW): exacto con cualquier número de grupos
+
+
+class RedistributionPlan:
+    """
+    Traslados (fila donante, fila receptora, kW) entre las filas de una
+    evaluación. `shift` es el balance de cada fila: negativo si cede carga,
+    positivo si la recibe.
+    """
+
+    def __init__(self, pisos, source, target, kw):
+        self.pisos = pisos
+        self.source = source
+        self.target = target
+        self.kw = kw
+        self.shift = np.zeros(len(pisos))
+        np.add.at(self.shift, source, -kw)
+        np.add.at(self.shift, target, kw)
+
+    def __len__(self):
+        return len(self.kw)
+
+    def destinations(self):
+        """Texto de destino por fila ('Piso 4 (2.1 kW) y Piso 6 (0.8 kW)'); None en las que no ceden carga."""
+        texts = np.full(len(self.pisos), None, dtype=object)
+        parts = [f'Piso {p} ({kw:.1f} kW)' for p, kw in zip(self.pisos[self.target].tolist(), self.kw.tolist())]
+        # Los traslados de cada donante son contiguos (ver plan_redistribution)
+        starts = np.flatnonzero(np.r_[True, self.source[1:] != self.source[:-1]]) if len(parts) else []
+        for start, end in zip(list(starts), list(starts[1:]) + [len(parts)]):
+            texts[self.source[start]] = (parts[start] if end - start == 1
+                                         else ', '.join(parts[start:end - 1]) + ' y ' + parts[end - 1])
+        return texts
+
+
+def _limit(rules, var):
+    """Primer umbral superior (el del nivel menos severo) de `var`, o None si la variable no tiene reglas."""
+    compiled = rules.compiled.get(var)
+    return None if compiled is None else float(compiled['high'][0])
+
+
+def _intervals(groups, pisos, amounts, span):
+    """
+    Filas con `amounts` > 0 ordenadas por (grupo, piso) y sus intervalos
+    [inicio, fin) acumulados dentro de su grupo, desplazados `span` por grupo
+    para que los grupos no se solapen.
+    """
+    rows = np.flatnonzero(amounts > 0)
+    rows = rows[np.lexsort((pisos[rows], groups[rows]))]
+    amount = amounts[rows]
+    end = np.cumsum(amount)
+    start = end - amount
+    first = np.ones(len(rows), dtype=bool)
+    first[1:] = groups[rows][1:] != groups[rows][:-1]
+    base = np.maximum.accumulate(np.where(first, start, 0)) # Acumulado al empezar el grupo
+    offset = groups[rows] * span - base
+    return rows, start + offset, end + offset
+
+
+def plan_redistribution(rules, groups, pisos, energia, temp, energia_pred=None, temp_pred=None,
+                        margin_kw=REDISTRIBUTION_MARGIN_KW, margin_c=REDISTRIBUTION_MARGIN_C,
+                        kw_per_c=REDISTRIBUTION_KW_PER_C):
+    """
+    Plan de redistribución para una evaluación: cada fila es un piso y `groups`
+    (enteros >= 0) indica entre qué filas se puede mover carga (el edificio, o
+    el edificio en un instante al reproducir el historial).
+
+    - Carga y calor de cada piso: el máximo entre la lectura y el pronóstico.
+    - Donantes: pisos con carga >= primer umbral de energía; ceden hasta
+      quedar `margin_kw` por debajo.
+    - Receptores: el resto; reciben lo que les falta para quedar `margin_kw`
+      bajo ese umbral, limitado por su margen térmico bajo el primer umbral
+      de temperatura (menos `margin_c`) a `kw_per_c` kW por °C.
+    Dentro de cada grupo, donantes y receptores en orden de piso se recorren
+    a la vez (regla de la esquina noroeste): la carga va a los pisos
+    receptores más cercanos en ese orden. Todo el reparto son sumas
+    acumuladas y búsquedas binarias sobre todos los grupos a la vez.
+    """
+    groups = np.asarray(groups, dtype=np.int64)
+    pisos = np.asarray(pisos)
+    energy_limit, temp_limit = _limit(rules, 'energia_kW'), _limit(rules, 'temp_C')
+    empty = np.empty(0, dtype=np.int64)
+    if energy_limit is None or temp_limit is None or not len(pisos):
+        return RedistributionPlan(pisos, empty, empty, np.empty(0))
+
+    load = np.asarray(energia, dtype=float)
+    heat = np.asarray(temp, dtype=float)
+    if energia_pred is not None:
+        load = np.fmax(load, energia_pred)
+    if temp_pred is not None:
+        heat = np.fmax(heat, temp_pred)
+    valid = ~np.isnan(load) & ~np.isnan(heat)
+    target = energy_limit - margin_kw
+
+    donor = valid & (load >= energy_limit)
+    excess = np.where(donor, load - target, 0.0)
+    room = np.minimum(target - load, (temp_limit - margin_c - heat) * kw_per_c)
+    room = np.where(valid & ~donor, np.maximum(room, 0.0), 0.0)
+    if not excess.any() or not room.any():
+        return RedistributionPlan(pisos, empty, empty, np.empty(0))
+
+    # Intervalos de oferta y de capacidad sobre un mismo eje por grupo; cada tramo entre
+    # extremos consecutivos pertenece a lo sumo a un donante y a un receptor
+    excess = np.round(excess * UNITS_PER_KW).astype(np.int64)
+    room = np.round(room * UNITS_PER_KW).astype(np.int64)
+    span = max(np.bincount(groups, excess).max(), np.bincount(groups, room).max()) + 1
+    d_rows, d_start, d_end = _intervals(groups, pisos, excess, int(span))
+    r_rows, r_start, r_end = _intervals(groups, pisos, room, int(span))
+    points = np.unique(np.concatenate([d_start, d_end, r_start, r_end]))
+    start, length = points[:-1], np.diff(points)
+    d = np.minimum(np.searchsorted(d_end, start, side='right'), len(d_end) - 1)
+    r = np.minimum(np.searchsorted(r_end, start, side='right'), len(r_end) - 1)
+    moved = ((d_start[d] <= start) & (start < d_end[d]) & (r_start[r] <= start) & (start < r_end[r])
+             & (length >= MIN_TRANSFER_KW * UNITS_PER_KW))
+    kw = np.round(length[moved] / UNITS_PER_KW, 2)
+    return RedistributionPlan(pisos, d_rows[d[moved]], r_rows[r[moved]], kw)
+
+
+def fill_destinations(recommendations, destinations):
+    """Reemplaza DESTINO_PLACEHOLDER en cada recomendación por su destino (o DESTINO_DEFAULT si no hay)."""
+    result = np.asarray(recommendations, dtype=object).copy()
+    for i, text in enumerate(result):
+        if isinstance(text, str) and DESTINO_PLACEHOLDER in text:
+            result[i] = text.replace(DESTINO_PLACEHOLDER, destinations[i] or DESTINO_DEFAULT)
+    return result
@@ -0,0 +1,243 @@
+# =========================================================
+# MÓDULO: replay.py (BACKEND - REPRODUCCIÓN HISTÓRICA DE ALERTAS)
+# Propósito: Recorrer un historial grande (el almacén o un CSV exportado) en
+# bloques de memoria acotada y evaluar las reglas de alerta y la predicción
+# a +60 min en CADA lectura, como si generate_alerts hubiera corrido en ese
+# instante, para auditar incidentes pasados o ajustar umbrales. El estado del
+# predictor (y del motor de transiciones) se arrastra entre bloques.
+# Uso (desde la raíz):
+#   python -m backend.replay --salida linea_de_tiempo.parquet
+#   python -m backend.replay --csv historial.csv --desde 2025-01-06 --hasta 2025-01-13 --transiciones t.csv
+# =========================================================
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from configuracion.config import (DATA_DIR, STORAGE_BACKEND, FORECAST_MODEL, FORECAST_HORIZON_MINUTES,
+                                  WINDOWS_SIZE_MINUTES, SEASON_LENGTH_MINUTES, REPLAY_CHUNK_HOURS,
+                                  REPLAY_CSV_CHUNK_ROWS)
+from backend import core_logic
+from backend.core_logic import ALERT_COLUMNS, ALERT_VARIABLES, evaluate_alerts
+from backend.alert_engine import AlertEngine
+from backend.anomaly import AnomalyDetector
+from backend.forecasting import make_forecaster
+from backend.predictor import occurrence_rounds
+from backend.redistribution import plan_redistribution, fill_destinations
+from backend.schema import to_sensor_frame, exact_readings
+from backend.storage import open_store
+
+# ------------------- FUENTES POR BLOQUES -------------------
+
+def store_chunks(directory, backend=STORAGE_BACKEND, start=None, end=None, chunk_hours=REPLAY_CHUNK_HOURS):
+    """Lecturas del almacén en ventanas de `chunk_hours` horas (solo una ventana en memoria)."""
+    store = open_store(directory, backend)
+    time_range = store.time_range()
+    if time_range is None:
+        return
+    lo = max(time_range[0], pd.Timestamp(start)) if start is not None else time_range[0]
+    hi = min(time_range[1], pd.Timestamp(end)) if end is not None else time_range[1]
+    step = pd.Timedelta(hours=chunk_hours)
+    while lo <= hi:
+        upper = min(lo + step, hi + pd.Timedelta(1)) # Límite superior exclusivo
+        chunk = store.read(start=lo, end=upper - pd.Timedelta(1))
+        if not chunk.empty:
+            yield chunk
+        lo = upper
+
+
+def csv_chunks(path, start=None, end=None, chunk_rows=REPLAY_CSV_CHUNK_ROWS):
+    """Lecturas de un CSV (columnas del almacén) en bloques de `chunk_rows` filas."""
+    for chunk in pd.read_csv(path, chunksize=chunk_rows, parse_dates=['timestamp']):
+        if start is not None:
+            chunk = chunk[chunk['timestamp'] >= pd.Timestamp(start)]
+        if end is not None:
+            chunk = chunk[chunk['timestamp'] <= pd.Timestamp(end)]
+        if not chunk.empty:
+            yield chunk
+
+# ------------------- REPRODUCCIÓN -------------------
+
+class AlertReplay:
+    """
+    Evalúa cada lectura con las reglas vigentes, la predicción que el
+    predictor tenía justo después de incorporarla y el estado del detector de anomalías.
+
+    Por bloque: las lecturas se agrupan en rondas (una lectura por serie y
+    ronda, en orden de tiempo) y el predictor y el detector avanzan ronda a
+    ronda, vectorizados sobre las series, guardando el pronóstico de
+    temperatura y el código de anomalía de cada lectura.
+    Luego todas las reglas se evalúan sobre el bloque completo de una vez, y
+    el 'Piso Y' de las recomendaciones de energía sale de un plan de
+    redistribución entre los pisos de cada edificio en cada instante.
+    Los bloques deben llegar en orden de tiempo (como los del almacén).
+    """
+
+    def __init__(self, rules=None, model=FORECAST_MODEL, with_transitions=False):
+        self.rules = rules if rules is not None else core_logic.get_rules()
+        self.predictor = make_forecaster(model, FORECAST_HORIZON_MINUTES, WINDOWS_SIZE_MINUTES,
+                                         season_length=SEASON_LENGTH_MINUTES)
+        self.detector = AnomalyDetector()
+        # Historial sin límite: se vacía en cada bloque
+        self.engine = AlertEngine(self.rules, history_size=None) if with_transitions else None
+        self.readings = 0
+        self.alerts = 0
+        self.transitions = 0
+
+    def _stream(self, frame, edificios, pisos):
+        """
+        Pronóstico de temperatura y energía ({variable: por lectura}, 2 decimales) y
+        códigos de anomalía (lecturas, variables de anomalía) tras incorporar cada lectura del bloque.
+        """
+        predictor, detector = self.predictor, self.detector
+        keys = list(zip(edificios, pisos.tolist()))
+        slots = predictor.register(keys)
+        anomaly_slots = detector.register(keys)
+        values = np.column_stack([exact_readings(frame[var]) for var in predictor.variables])
+        anomaly_values = np.column_stack([exact_readings(frame[var]) for var in detector.variables])
+        columns = [predictor.variables.index(var) for var in ('temp_C', 'energia_kW')]
+        forecast = np.empty((len(slots), len(columns)))
+        codes = np.zeros((len(slots), len(detector.variables)), dtype=np.int8)
+        for positions in occurrence_rounds(slots):
+            round_slots = slots[positions]
+            predictor.push(round_slots, values[positions])
+            forecast[positions] = predictor.forecast_values()[round_slots][:, columns]
+            detector.push(anomaly_slots[positions], anomaly_values[positions])
+            codes[positions] = detector.levels()[anomaly_slots[positions]]
+        if len(frame):
+            predictor.last_timestamp = detector.last_timestamp = frame.index[-1]
+        forecast = np.round(forecast, 2)
+        return {'temp_C': forecast[:, 0], 'energia_kW': forecast[:, 1]}, codes
+
+    def process(self, chunk):
+        """
+        Procesa un bloque (columnas 'timestamp', 'edificio', 'piso' y las variables).
+        Retorna (línea de tiempo de alertas del bloque, transiciones del bloque o None).
+        """
+        frame = to_sensor_frame(chunk).sort_index(kind='stable')
+        edificios = frame['edificio'].to_numpy()
+        pisos = frame['piso'].to_numpy().astype(np.int64)
+        readings = {var: exact_readings(frame[var]) for var in ALERT_VARIABLES}
+        forecast, codes = self._stream(frame, edificios, pisos)
+
+        # Sin lecturas faltantes, igual que _latest_by_series
+        valid = ~np.isnan(np.column_stack(list(readings.values()))).any(axis=1)
+        rows = np.flatnonzero(valid)
+        anomalies = {var: codes[rows, j] for j, var in enumerate(self.detector.variables)}
+        readings = {var: r[rows] for var, r in readings.items()}
+        forecast = {var: f[rows] for var, f in forecast.items()}
+        df_alerts, _ = evaluate_alerts(self.rules, edificios[rows], pisos[rows], readings, forecast['temp_C'],
+                                       anomalies)
+        if not df_alerts.empty:
+            # Un plan por (instante, edificio): los pisos que el simulador reporta en el mismo tick
+            groups = pd.factorize(pd.MultiIndex.from_arrays([frame.index[rows], edificios[rows]]))[0]
+            plan = plan_redistribution(self.rules, groups, pisos[rows], readings['energia_kW'], readings['temp_C'],
+                                       forecast['energia_kW'], forecast['temp_C'])
+            destinations = plan.destinations()[df_alerts['_fila'].to_numpy(dtype=np.int64)]
+            df_alerts['recomendacion'] = fill_destinations(df_alerts['recomendacion'], destinations)
+        df_alerts.insert(0, 'timestamp', frame.index.to_numpy()[rows[df_alerts.pop('_fila').to_numpy()]])
+        self.readings += len(frame)
+        self.alerts += len(df_alerts)
+
+        events = None
+        if self.engine is not None:
+            # update y no sync: el bloque siguiente empieza después del anterior (sync lo tomaría como hueco)
+            events = self.engine.update(frame)
+            self.engine.history.clear()
+            self.transitions += len(events)
+        return df_alerts[ALERT_COLUMNS], events
+
+# ------------------- SALIDA -------------------
+
+class TimelineWriter:
+    """Escribe la línea de tiempo por bloques a Parquet o CSV (según la extensión)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._writer = None
+        self._schema = None
+        if os.path.exists(path):
+            os.remove(path)
+
+    def write(self, frame):
+        if frame.empty:
+            return
+        if self.path.endswith('.parquet'):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(frame, schema=self._schema, preserve_index=False)
+            if self._writer is None:
+                self._schema = table.schema
+                self._writer = pq.ParquetWriter(self.path, self._schema)
+            self._writer.write_table(table)
+        else:
+            frame.to_csv(self.path, mode='a', header=not os.path.exists(self.path), index=False)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def replay(chunks, output=None, transitions=None, rules=None, model=FORECAST_MODEL):
+    """
+    Reproduce los bloques y escribe la línea de tiempo (y las transiciones del
+    motor con estado si se pide `transitions`). Sin `output` retorna la línea
+    de tiempo completa en memoria. Retorna (línea de tiempo o None, AlertReplay).
+    """
+    runner = AlertReplay(rules, model, with_transitions=transitions is not None)
+    timeline = TimelineWriter(output) if output else None
+    events_writer = TimelineWriter(transitions) if transitions else None
+    parts = []
+    try:
+        for chunk in chunks:
+            alerts, events = runner.process(chunk)
+            if timeline is not None:
+                timeline.write(alerts)
+            else:
+                parts.append(alerts)
+            if events_writer is not None:
+                events_writer.write(events)
+    finally:
+        if timeline is not None:
+            timeline.close()
+        if events_writer is not None:
+            events_writer.close()
+
+    if timeline is not None:
+        return None, runner
+    result = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=ALERT_COLUMNS)
+    return result, runner
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproducción histórica de alertas SmartFloors.")
+    parser.add_argument('--datos', default=DATA_DIR, help="Directorio del almacén (relativo a la raíz).")
+    parser.add_argument('--csv', help="Reproducir un CSV exportado en lugar del almacén.")
+    parser.add_argument('--desde', help="Primera lectura a reproducir (fecha/hora).")
+    parser.add_argument('--hasta', help="Última lectura a reproducir (fecha/hora).")
+    parser.add_argument('--bloque-horas', type=float, default=REPLAY_CHUNK_HOURS, help="Horas por bloque del almacén.")
+    parser.add_argument('--modelo', default=FORECAST_MODEL, help="Modelo de pronóstico ('ma', 'holt', 'holt_winters').")
+    parser.add_argument('--salida', default='alert_timeline.parquet', help="Línea de tiempo (.parquet o .csv).")
+    parser.add_argument('--transiciones', help="Archivo (.parquet o .csv) para las transiciones del motor con estado.")
+    args = parser.parse_args()
+
+    if args.csv:
+        chunks = csv_chunks(args.csv, args.desde, args.hasta)
+    else:
+        chunks = store_chunks(core_logic._resolve_data_path(args.datos), STORAGE_BACKEND, args.desde, args.hasta,
+                              args.bloque_horas)
+
+    t0 = time.perf_counter()
+    _, runner = replay(chunks, args.salida, args.transiciones, model=args.modelo)
+    elapsed = time.perf_counter() - t0
+    rate = runner.readings / elapsed * 60 if elapsed > 0 else 0.0
+    print(f"✅ {runner.readings:,} lecturas reproducidas en {elapsed:.1f}s ({rate:,.0f} lecturas/min): "
+          f"{runner.alerts:,} alertas en '{args.salida}'"
+          + (f", {runner.transitions:,} transiciones en '{args.transiciones}'" if args.transiciones else "") + ".")
+
+
+if __name__ == '__main__':
+    main()
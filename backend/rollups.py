@@ -0,0 +1,378 @@
+# =========================================================
+# MÓDULO: rollups.py (BACKEND - HISTÓRICO AGREGADO MULTI-RESOLUCIÓN)
+# Propósito: Niveles de agregación continuos (1 min / 15 min / 1 h) con
+# min/max/suma/conteo por (edificio, piso) y variable, mantenidos de forma
+# incremental a medida que llegan lecturas. Cada nivel es un arreglo de
+# tamaño fijo en disco (memmap) que se sobrescribe circularmente, así que
+# retiene semanas o meses sin crecer y una consulta de largo plazo cuesta
+# lo mismo que la vista de 4 horas.
+# Uso (desde la raíz): python -m backend.rollups rebuild
+# =========================================================
+
+import argparse
+import json
+import os
+import shutil
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from configuracion.config import (ROLLUP_DIR, ROLLUP_TIERS, ROLLUP_MAX_SERIES, ROLLUP_MAX_POINTS,
+                                  DATA_DIR, STORAGE_BACKEND, SEQLOCK_RETRIES, SEQLOCK_SLEEP_SECONDS)
+
+ROLLUP_VARIABLES = ('temp_C', 'humedad_pct', 'energia_kW')
+META_NAME = 'meta.json'
+HEADER_NAME = 'header.npy'
+H_LOCK, H_UPDATES = 0, 1
+NS_PER_SECOND = 10**9
+
+# Una celda (cubeta, serie) de un nivel
+STATS_DTYPE = np.dtype([
+    ('min', '<f4', (len(ROLLUP_VARIABLES),)),
+    ('max', '<f4', (len(ROLLUP_VARIABLES),)),
+    ('sum', '<f4', (len(ROLLUP_VARIABLES),)),
+    ('count', '<i4', (len(ROLLUP_VARIABLES),)),
+])
+STATS = ('min', 'max', 'mean', 'count')
+
+
+def _empty_cell():
+    cell = np.zeros((), dtype=STATS_DTYPE)
+    cell['min'] = np.inf
+    cell['max'] = -np.inf
+    return cell
+
+
+def _to_epoch_ns(values):
+    return pd.to_datetime(values).values.astype('datetime64[ns]').astype(np.int64)
+
+
+def _aggregate(buckets, series, mins, maxs, sums, counts):
+    """Combina filas con la misma (cubeta, serie). Retorna los mismos arreglos, sin repetidos."""
+    order = np.lexsort((series, buckets))
+    b, s = buckets[order], series[order]
+    starts = np.flatnonzero(np.r_[True, (b[1:] != b[:-1]) | (s[1:] != s[:-1])])
+    return (b[starts], s[starts],
+            np.fmin.reduceat(mins[order], starts, axis=0), # fmin/fmax ignoran NaN
+            np.fmax.reduceat(maxs[order], starts, axis=0),
+            np.add.reduceat(sums[order], starts, axis=0),
+            np.add.reduceat(counts[order], starts, axis=0))
+
+
+class RollupStore:
+    """
+    Niveles de agregación en un directorio:
+
+      meta.json              registro de series (edificio, piso) -> columna, publicado con os.replace
+      header.npy             contador tipo seqlock (impar = escritura en curso)
+      <nivel>.slots.npy      (cubetas,) número de cubeta que ocupa cada posición (-1 vacía)
+      <nivel>.stats.npy      (cubetas, series) celdas min/max/suma/conteo
+
+    La cubeta `b` de un nivel vive en la posición `b % cubetas`: cuando llega
+    una cubeta más nueva, la posición se reinicia y lo más antiguo se pierde.
+    Un único proceso escribe (`update`); los lectores (`attach`) consultan
+    sin bloquearlo.
+    """
+
+    def __init__(self, directory, writable=False):
+        self.directory = directory
+        self.writable = writable
+        self._meta_stamp = None
+        self._load_meta()
+        mode = 'r+' if writable else 'r'
+        self.header = np.load(os.path.join(directory, HEADER_NAME), mmap_mode=mode)
+        self.slots = {tier: np.load(self._tier_path(tier, 'slots'), mmap_mode=mode) for tier in self.tiers}
+        self.stats = {tier: np.load(self._tier_path(tier, 'stats'), mmap_mode=mode) for tier in self.tiers}
+
+    def _tier_path(self, tier, kind):
+        return os.path.join(self.directory, f'{tier}.{kind}.npy')
+
+    # ------------------- CREACIÓN / CONEXIÓN -------------------
+
+    @classmethod
+    def create(cls, directory, max_series=ROLLUP_MAX_SERIES, tiers=ROLLUP_TIERS):
+        """Crea (o recrea, perdiendo el histórico) los archivos de tamaño fijo."""
+        tmp_dir = directory.rstrip(os.sep) + '.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        np.save(os.path.join(tmp_dir, HEADER_NAME), np.zeros(8, dtype=np.int64))
+        for tier, (seconds, buckets) in tiers.items():
+            slots = np.lib.format.open_memmap(os.path.join(tmp_dir, f'{tier}.slots.npy'), mode='w+',
+                                              dtype=np.int64, shape=(buckets,))
+            slots[:] = -1
+            slots.flush()
+            # Las celdas se inicializan al ocupar su posición; el archivo queda disperso hasta entonces
+            np.lib.format.open_memmap(os.path.join(tmp_dir, f'{tier}.stats.npy'), mode='w+',
+                                      dtype=STATS_DTYPE, shape=(buckets, max_series)).flush()
+
+        meta = {
+            'id': uuid.uuid4().hex,
+            'max_series': max_series,
+            'tiers': {tier: list(spec) for tier, spec in tiers.items()},
+            'keys': [],
+        }
+        with open(os.path.join(tmp_dir, META_NAME), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(tmp_dir, directory)
+        return cls(directory, writable=True)
+
+    @classmethod
+    def open(cls, directory, max_series=ROLLUP_MAX_SERIES, tiers=ROLLUP_TIERS):
+        """
+        (Escritor) Abre los niveles existentes si son compatibles con `tiers` y
+        tienen capacidad para `max_series` series; si no, los crea. Como hay un
+        único escritor, un contador impar es de un escritor que murió a mitad
+        de `update` y se deja en par.
+        """
+        store = cls.attach(directory, writable=True)
+        if store is not None and store.max_series >= max_series and store.tiers == {
+                tier: tuple(spec) for tier, spec in tiers.items()}:
+            if store.header[H_LOCK] % 2:
+                store.header[H_LOCK] += 1
+            return store
+        if store is not None:
+            print(f"Advertencia: rollups en '{directory}' incompatibles con la configuración; se recrean.")
+        return cls.create(directory, max_series, tiers)
+
+    @classmethod
+    def attach(cls, directory, writable=False):
+        """Se conecta a niveles existentes. Retorna None si no existen o no son válidos."""
+        try:
+            return cls(directory, writable)
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+
+    def _load_meta(self):
+        path = os.path.join(self.directory, META_NAME)
+        stamp = os.stat(path).st_mtime_ns
+        if stamp == self._meta_stamp:
+            return
+        with open(path, encoding='utf-8') as f:
+            meta = json.load(f)
+        self.id = meta['id']
+        self.max_series = meta['max_series']
+        self.tiers = {tier: tuple(spec) for tier, spec in meta['tiers'].items()}
+        self.keys = [tuple(key) for key in meta['keys']]
+        self._index = {key: i for i, key in enumerate(self.keys)}
+        self._meta_stamp = stamp
+
+    def is_stale(self):
+        """True si los niveles fueron recreados por otro proceso y hay que reconectarse."""
+        try:
+            with open(os.path.join(self.directory, META_NAME), encoding='utf-8') as f:
+                return json.load(f)['id'] != self.id
+        except (FileNotFoundError, ValueError):
+            return True
+
+    def _publish_meta(self):
+        meta = {
+            'id': self.id,
+            'max_series': self.max_series,
+            'tiers': {tier: list(spec) for tier, spec in self.tiers.items()},
+            'keys': [list(key) for key in self.keys],
+        }
+        path = os.path.join(self.directory, META_NAME)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(path + '.tmp', path)
+        self._meta_stamp = os.stat(path).st_mtime_ns
+
+    # ------------------- ESCRITURA -------------------
+
+    def register(self, keys):
+        """(Escritor) Asigna (o recupera) la columna de cada serie (edificio, piso)."""
+        new_keys = [key for key in dict.fromkeys(keys) if key not in self._index]
+        if new_keys:
+            if len(self.keys) + len(new_keys) > self.max_series:
+                raise ValueError(f"Rollups llenos ({self.max_series} series); aumente ROLLUP_MAX_SERIES")
+            for key in new_keys:
+                self._index[key] = len(self.keys)
+                self.keys.append(key)
+            self._publish_meta()
+        return np.array([self._index[key] for key in keys], dtype=np.int64)
+
+    def update(self, df):
+        """
+        (Escritor) Incorpora lecturas nuevas (columnas 'timestamp', 'edificio',
+        'piso' y las variables). Las lecturas más antiguas que la retención de
+        un nivel se ignoran en ese nivel.
+        """
+        if df.empty:
+            return
+        timestamps = df.index if 'timestamp' not in df.columns else df['timestamp']
+        ts = _to_epoch_ns(timestamps)
+        codes, uniques = pd.MultiIndex.from_arrays([df['edificio'].astype(str), df['piso'].astype(int)]).factorize()
+        series = self.register([(e, int(p)) for e, p in uniques])[codes]
+
+        values = df[list(ROLLUP_VARIABLES)].to_numpy(dtype=np.float64)
+        present = ~np.isnan(values)
+        tiers = sorted(self.tiers.items(), key=lambda item: item[1][0])
+
+        # El nivel más fino se agrega desde las lecturas; los demás, desde sus parciales.
+        finest_seconds = tiers[0][1][0]
+        partial = _aggregate(ts // (finest_seconds * NS_PER_SECOND), series, values, values,
+                             np.where(present, values, 0.0), present.astype(np.int64))
+
+        self.header[H_LOCK] += 1 # impar: escritura en curso
+        try:
+            for tier, (seconds, _) in tiers:
+                if seconds != finest_seconds:
+                    partial = _aggregate(partial[0] * finest_seconds // seconds, *partial[1:])
+                    finest_seconds = seconds
+                self._merge(tier, *partial)
+            self.header[H_UPDATES] += 1
+        finally:
+            self.header[H_LOCK] += 1 # par: escritura confirmada
+
+    def _merge(self, tier, buckets, series, mins, maxs, sums, counts):
+        slots = self.slots[tier]
+        stats = self.stats[tier]
+        positions = buckets % len(slots)
+
+        # Las posiciones que pasan a una cubeta más nueva se reinician
+        unique_buckets = np.unique(buckets)
+        unique_positions = unique_buckets % len(slots)
+        newer = unique_buckets > slots[unique_positions]
+        if newer.any():
+            stats[unique_positions[newer]] = _empty_cell()
+            slots[unique_positions[newer]] = unique_buckets[newer]
+
+        ok = slots[positions] == buckets
+        positions, series = positions[ok], series[ok]
+        cells = stats[positions, series]
+        cells['min'] = np.fmin(cells['min'], mins[ok])
+        cells['max'] = np.fmax(cells['max'], maxs[ok])
+        cells['sum'] += sums[ok]
+        cells['count'] += counts[ok].astype(np.int32)
+        stats[positions, series] = cells
+
+    # ------------------- CONSULTAS -------------------
+
+    def choose_tier(self, start, end, max_points=ROLLUP_MAX_POINTS):
+        """El nivel más fino que cubre [start, end] con a lo sumo `max_points` cubetas por serie."""
+        span = (pd.Timestamp(end) - pd.Timestamp(start)).total_seconds()
+        by_width = sorted(self.tiers.items(), key=lambda item: item[1][0])
+        for tier, (seconds, buckets) in by_width:
+            if span / seconds <= max_points and seconds * buckets >= span:
+                return tier
+        return by_width[-1][0]
+
+    def query(self, tier, start, end, keys=None):
+        """
+        Cubetas del nivel `tier` en [start, end] para las series `keys` (todas
+        por defecto). Retorna un DataFrame con 'timestamp' (inicio de la
+        cubeta), 'edificio', 'piso' y '<variable>_<min|max|mean|count>'.
+        Vacío si la escritura en curso no se confirma tras SEQLOCK_RETRIES intentos.
+        """
+        if not self.writable:
+            self._load_meta()
+        keys = self.keys if keys is None else [key for key in keys if key in self._index]
+        seconds, n_buckets = self.tiers[tier]
+        width = seconds * NS_PER_SECOND
+        first = int(_to_epoch_ns([start])[0]) // width
+        last = int(_to_epoch_ns([end])[0]) // width
+        first = max(first, last - n_buckets + 1)
+        if not keys or last < first:
+            return pd.DataFrame()
+
+        buckets = np.arange(first, last + 1)
+        positions = buckets % n_buckets
+        columns = np.array([self._index[key] for key in keys], dtype=np.int64)
+        for attempt in range(SEQLOCK_RETRIES):
+            if attempt:
+                time.sleep(SEQLOCK_SLEEP_SECONDS)
+            lock = int(self.header[H_LOCK])
+            if lock % 2:
+                continue
+            slots = self.slots[tier][positions]
+            cells = self.stats[tier][np.ix_(positions, columns)]
+            if int(self.header[H_LOCK]) == lock:
+                break
+        else:
+            return pd.DataFrame()
+
+        valid = slots == buckets
+        cells = cells[valid]
+        rows, n_series = cells.shape
+        counts = cells['count'].reshape(-1, len(ROLLUP_VARIABLES))
+        frame = pd.DataFrame({
+            'timestamp': np.repeat(buckets[valid] * width, n_series).astype('datetime64[ns]'),
+            'edificio': np.tile([key[0] for key in keys], rows),
+            'piso': np.tile([key[1] for key in keys], rows),
+        })
+        sums = cells['sum'].reshape(-1, len(ROLLUP_VARIABLES))
+        mins = cells['min'].reshape(-1, len(ROLLUP_VARIABLES))
+        maxs = cells['max'].reshape(-1, len(ROLLUP_VARIABLES))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for j, var in enumerate(ROLLUP_VARIABLES):
+                has = counts[:, j] > 0
+                frame[f'{var}_min'] = np.where(has, mins[:, j], np.nan)
+                frame[f'{var}_max'] = np.where(has, maxs[:, j], np.nan)
+                frame[f'{var}_mean'] = np.where(has, sums[:, j] / counts[:, j], np.nan)
+                frame[f'{var}_count'] = counts[:, j]
+        return frame[counts.sum(axis=1) > 0].reset_index(drop=True)
+
+    def chart_series(self, edificio, start, end, stats, max_points=ROLLUP_MAX_POINTS):
+        """
+        Series del edificio en [start, end] desde el nivel adecuado, en el
+        formato largo de los gráficos ('timestamp', 'edificio', 'piso',
+        'variable', 'valor'). `stats` indica qué estadística graficar por
+        variable, p. ej. {'temp_C': 'mean', 'energia_kW': 'max'}.
+        """
+        if not self.writable:
+            self._load_meta()
+        keys = [key for key in self.keys if key[0] == edificio]
+        frame = self.query(self.choose_tier(start, end, max_points), start, end, keys)
+        if frame.empty:
+            return pd.DataFrame(columns=['timestamp', 'edificio', 'piso', 'variable', 'valor'])
+        return pd.concat([
+            frame[['timestamp', 'edificio', 'piso']].assign(variable=var, valor=frame[f'{var}_{stat}'])
+            for var, stat in stats.items()
+        ], ignore_index=True)
+
+
+def open_rollups(directory=ROLLUP_DIR, n_series=0):
+    """
+    (Escritor) Abre o crea los niveles con capacidad para al menos `n_series`
+    series. Retorna None si no están disponibles.
+    """
+    try:
+        return RollupStore.open(directory, max(ROLLUP_MAX_SERIES, n_series))
+    except Exception as e:
+        print(f"Advertencia: rollups no disponibles ({e}). El histórico de largo plazo no se actualizará.")
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Niveles de agregación (rollups) del histórico SmartFloors.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('rebuild', help="Recrear los rollups desde el almacén de lecturas.")
+    sub.add_parser('info', help="Mostrar series y cubetas ocupadas por nivel.")
+    args = parser.parse_args()
+
+    if args.command == 'rebuild':
+        from backend.storage import open_store
+
+        df = open_store(DATA_DIR, STORAGE_BACKEND).read()
+        n_series = len(df[['edificio', 'piso']].drop_duplicates()) if not df.empty else 0
+        store = RollupStore.create(ROLLUP_DIR, max(ROLLUP_MAX_SERIES, n_series))
+        store.update(df)
+        print(f"✅ Rollups recreados desde {len(df):,} lecturas ({n_series} series).")
+    else:
+        store = RollupStore.attach(ROLLUP_DIR)
+        if store is None:
+            print(f"No hay rollups en '{ROLLUP_DIR}'.")
+            return
+        print(f"{len(store.keys)}/{store.max_series} series registradas")
+        for tier, (seconds, buckets) in store.tiers.items():
+            used = int((store.slots[tier] >= 0).sum())
+            print(f"  {tier:<6} {seconds:>5}s x {buckets:>5} cubetas ({used} ocupadas)")
+
+
+if __name__ == '__main__':
+    main()
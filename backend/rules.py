@@ -0,0 +1,246 @@
+# =========================================================
+# MÓDULO: rules.py (BACKEND - COMPILADOR DE REGLAS RECARGABLE)
+# Propósito: Compilar UMBRALES y RECOMENDACIONES (configuracion.config más un
+# archivo JSON opcional) en evaluadores vectorizados y plantillas de
+# recomendación ya formateadas por piso, y reemplazarlos en caliente cuando
+# el archivo cambia, sin detener la ingesta ni el pipeline de alertas.
+# =========================================================
+
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from configuracion.config import UMBRALES, RECOMENDACIONES, RULES_CHECK_SECONDS, ANOMALY_VARIABLES
+from backend.schema import level_name
+
+RULE_VARIABLES = ['temp_C', 'humedad_pct', 'energia_kW']
+SIDES = ('low', 'high')
+PISO_PLACEHOLDER = 'Piso X'
+# Recomendaciones de las alertas fijas de evaluate_alerts (preventiva, riesgo combinado, anomalías)
+FIXED_RECOMMENDATIONS = ('preventiva_temp_C', 'riesgo_combinado_Critica') + tuple(
+    f'anomalia_{var}' for var in ANOMALY_VARIABLES)
+
+
+def _compile_template(text):
+    """Separa una recomendación en (prefijo, sufijo) alrededor de 'Piso X' (sufijo None si no lo contiene)."""
+    parts = text.split(PISO_PLACEHOLDER, 1)
+    return (parts[0], parts[1] if len(parts) > 1 else None)
+
+
+class RuleSet:
+    """
+    Reglas compiladas (inmutables una vez construidas).
+
+    Cada nivel de una variable queda como un rango permitido [low, high]: se
+    alerta si value < low o si value supera high (>= cuando el umbral es 'min'
+    o un número, > cuando es 'high'). Los niveles conservan el orden del
+    diccionario (de menor a mayor severidad); sus nombres mostrados llevan
+    tilde ('Critica' en UMBRALES -> 'Crítica' en las alertas).
+
+    La recomendación de cada (variable, nivel, lado del rango) se resuelve una
+    sola vez buscando '<var>_<nivel>_<low|high>', luego '<var>_<nivel>' y por
+    último un texto genérico. Los textos de cada piso se formatean la primera
+    vez que se piden y luego solo se indexan.
+
+    Los umbrales 'Media' de temperatura y energía (alerta preventiva y riesgo
+    combinado) y las plantillas de FIXED_RECOMMENDATIONS también se resuelven
+    aquí: si faltan, el RuleSet no se construye y la recarga se rechaza.
+    """
+
+    def __init__(self, umbrales, recomendaciones, version=0):
+        self.umbrales = umbrales
+        self.recomendaciones = recomendaciones
+        self.version = version
+        self.variables = [var for var in RULE_VARIABLES if var in umbrales]
+        self._templates = []
+        self._template_ids = {}
+        self._texts = np.empty((0, 0), dtype=object)
+        self._texts_lock = threading.Lock()
+        self.compiled = {var: self._compile_variable(var) for var in self.variables}
+        self.preventive_temp = self._threshold('temp_C', 'Media')
+        self.high_energy = self._threshold('energia_kW', 'Media')
+        self.fixed_templates = {key: self.template_id(self._recommendation(key)) for key in FIXED_RECOMMENDATIONS}
+        for text in recomendaciones.values():
+            self.template_id(text)
+
+    def _threshold(self, var, level):
+        """Umbral inferior ('min' o número) del nivel `level` de `var`."""
+        limits = self.umbrales.get(var, {}).get(level)
+        value = limits.get('min') if isinstance(limits, dict) else limits
+        if not isinstance(value, (float, int)):
+            raise ValueError(f"falta el umbral '{level}' de {var} (número o {{'min': ...}})")
+        return float(value)
+
+    def _recommendation(self, key):
+        text = self.recomendaciones.get(key)
+        if not isinstance(text, str):
+            raise ValueError(f"falta la recomendación '{key}'")
+        return text
+
+    def _compile_variable(self, var):
+        levels = list(self.umbrales[var].keys())
+        low = np.full(len(levels), -np.inf)
+        high = np.full(len(levels), np.inf)
+        high_inclusive = np.ones(len(levels), dtype=bool)
+        templates = np.empty((len(levels), len(SIDES)), dtype=np.int64)
+
+        for i, (level, limits) in enumerate(self.umbrales[var].items()):
+            if isinstance(limits, dict):
+                if 'min' in limits:
+                    high[i] = limits['min']
+                elif 'low' in limits and 'high' in limits:
+                    low[i], high[i] = limits['low'], limits['high']
+                    high_inclusive[i] = False
+            elif isinstance(limits, (float, int)):
+                high[i] = limits
+
+            for side_pos, side in enumerate(SIDES):
+                for key in (f'{var}_{level}_{side}', f'{var}_{level}'):
+                    if key in self.recomendaciones:
+                        text = self.recomendaciones[key]
+                        break
+                else:
+                    text = f'Revisar {var} en {PISO_PLACEHOLDER}.'
+                templates[i, side_pos] = self.template_id(text)
+
+        return {
+            'levels': np.array([level_name(level) for level in levels], dtype=object), # Nombres mostrados
+            'low': low,
+            'high': high,
+            'high_inclusive': high_inclusive,
+            'templates': templates,
+        }
+
+    # ------------------- EVALUACIÓN -------------------
+
+    def evaluate(self, var, values):
+        """
+        Evalúa una variable para todas las series a la vez con la regla original
+        (gana el primer nivel que coincide en el orden del diccionario).
+        Retorna (índice de nivel por serie o -1, lado del rango: 0 bajo / 1 alto).
+        """
+        rules = self.compiled[var]
+        v = values[:, None]
+        below = v < rules['low']
+        above = np.where(rules['high_inclusive'], v >= rules['high'], v > rules['high'])
+        hits = below | above
+
+        level_idx = np.where(hits.any(axis=1), hits.argmax(axis=1), -1)
+        side = np.where(below[np.arange(len(values)), np.maximum(level_idx, 0)], 0, 1)
+        return level_idx, side
+
+    # ------------------- RECOMENDACIONES -------------------
+
+    def template_id(self, text):
+        """Identificador de la plantilla de `text` (se compila la primera vez)."""
+        tid = self._template_ids.get(text)
+        if tid is None:
+            tid = self._template_ids[text] = len(self._templates)
+            self._templates.append(_compile_template(text))
+        return tid
+
+    def _ensure_texts(self, max_piso):
+        """Amplía la tabla (plantilla, piso) -> texto hasta `max_piso` y las plantillas nuevas."""
+        n_templates, n_pisos = self._texts.shape
+        if n_templates >= len(self._templates) and n_pisos > max_piso:
+            return self._texts
+        with self._texts_lock:
+            texts = self._texts
+            n_templates, n_pisos = texts.shape
+            rows, cols = len(self._templates), max(n_pisos, max_piso + 1)
+            if n_templates >= rows and n_pisos >= cols:
+                return texts
+            grown = np.empty((rows, cols), dtype=object)
+            grown[:n_templates, :n_pisos] = texts
+            for tid, (prefix, suffix) in enumerate(self._templates):
+                start = n_pisos if tid < n_templates else 0
+                for piso in range(start, cols):
+                    grown[tid, piso] = prefix if suffix is None else f'{prefix}Piso {piso}{suffix}'
+            self._texts = grown # Reemplazo atómico: los lectores ven la tabla anterior o la nueva
+            return grown
+
+    def recommendations(self, template_ids, pisos):
+        """Textos de las plantillas `template_ids` para los pisos `pisos` (arreglos del mismo largo)."""
+        pisos = np.asarray(pisos, dtype=np.int64)
+        if len(pisos) == 0:
+            return np.empty(0, dtype=object)
+        texts = self._ensure_texts(int(pisos.max()))
+        return texts[np.asarray(template_ids, dtype=np.int64), pisos]
+
+    def level_templates(self, var, level_idx, side):
+        """Identificadores de plantilla para arreglos de nivel (>= 0) y lado de `var`."""
+        return self.compiled[var]['templates'][level_idx, side]
+
+# ------------------- RECARGA EN CALIENTE -------------------
+
+def _merge_rules(path, umbrales, recomendaciones):
+    """Lee el archivo JSON de reglas y lo aplica sobre la configuración base."""
+    with open(path, encoding='utf-8') as f:
+        overrides = json.load(f)
+    merged_umbrales = dict(umbrales)
+    merged_umbrales.update(overrides.get('UMBRALES', {}))
+    merged_recomendaciones = dict(recomendaciones)
+    merged_recomendaciones.update(overrides.get('RECOMENDACIONES', {}))
+    return merged_umbrales, merged_recomendaciones
+
+
+class RuleRegistry:
+    """
+    Mantiene el RuleSet vigente. `current()` revisa (a lo sumo cada
+    `check_seconds`) si el archivo de reglas cambió; si es así compila el
+    nuevo RuleSet y lo publica con una sola asignación. Cada evaluación toma
+    una referencia al inicio y la usa completa: nunca mezcla reglas viejas y
+    nuevas. Si el archivo no es válido se conservan las reglas anteriores.
+    """
+
+    def __init__(self, path=None, umbrales=UMBRALES, recomendaciones=RECOMENDACIONES,
+                 check_seconds=RULES_CHECK_SECONDS):
+        self.path = path
+        self.base = (umbrales, recomendaciones)
+        self.check_seconds = check_seconds
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._next_check = 0.0
+        self._rules = RuleSet(umbrales, recomendaciones)
+        self.current()
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_mtime_ns, st.st_size)
+        except (FileNotFoundError, TypeError):
+            return None
+
+    def current(self):
+        now = time.monotonic()
+        if self.path is None or now < self._next_check:
+            return self._rules
+        with self._lock:
+            if now < self._next_check:
+                return self._rules
+            self._next_check = now + self.check_seconds
+            stamp = self._file_stamp()
+            if stamp == self._stamp:
+                return self._rules
+            self._reload(stamp)
+        return self._rules
+
+    def _reload(self, stamp):
+        version = self._rules.version + 1
+        try:
+            if stamp is None:
+                umbrales, recomendaciones = self.base # Archivo eliminado: vuelve la configuración base
+            else:
+                umbrales, recomendaciones = _merge_rules(self.path, *self.base)
+            rules = RuleSet(umbrales, recomendaciones, version)
+        except Exception as e:
+            print(f"Advertencia: reglas en '{self.path}' no válidas ({e}); se conservan las anteriores.")
+            self._stamp = stamp
+            return
+        if self._stamp is not None or stamp is not None:
+            print(f"🔁 Reglas de alerta recargadas (versión {version}).")
+        self._stamp = stamp
+        self._rules = rules
@@ -0,0 +1,148 @@
+# =========================================================
+# MÓDULO: schema.py (BACKEND - ESQUEMA COMPACTO DE LECTURAS)
+# Propósito: Tipos explícitos del DataFrame de lecturas en memoria
+# (edificio categórico, piso int16, lecturas float32, tiempo como int64 ns
+# desde epoch), vistas por piso listas para graficar sin copias derretidas
+# y el nivel de alerta como categórico ordenado por severidad.
+# =========================================================
+
+import numpy as np
+import pandas as pd
+
+READING_VARIABLES = ['temp_C', 'humedad_pct', 'energia_kW']
+PISO_DTYPE = np.int16
+READING_DTYPE = np.float32
+TIMESTAMP_DTYPE = 'datetime64[ns]' # Almacenado como int64: nanosegundos desde epoch
+
+# Niveles de alerta de menor a mayor severidad: comparar, ordenar o tomar el máximo
+# del categórico es hacerlo por severidad (sin mapas de puntajes)
+ALERT_LEVELS = ['OK', 'Informativa', 'Preventiva Media', 'Media', 'Preventiva Crítica', 'Crítica']
+LEVEL_DTYPE = pd.CategoricalDtype(ALERT_LEVELS, ordered=True)
+# Nombres de nivel usados como claves en UMBRALES/RECOMENDACIONES (sin tilde) -> nombre mostrado
+LEVEL_ALIASES = {'Critica': 'Crítica', 'Preventiva Critica': 'Preventiva Crítica'}
+
+
+def _as_categorical(values, categories=()):
+    """Edificio como categórico con categorías ordenadas alfabéticamente (ordenar = orden de texto)."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype(str)
+    categories = sorted(set(categories).union(pd.unique(np.asarray(values, dtype=object))))
+    return pd.Categorical(values, categories=categories)
+
+
+def _as_piso(values):
+    """Pisos como PISO_DTYPE; ValueError si alguno no es entero o no cabe (el cast directo desbordaría a otro piso)."""
+    values = np.asarray(values)
+    limits = np.iinfo(PISO_DTYPE)
+    if values.size and values.dtype.kind not in 'iu':
+        values = values.astype(np.float64)
+        if not (np.isfinite(values).all() and (values % 1 == 0).all()):
+            raise ValueError("'piso' debe ser un número entero")
+    if values.size and (values.min() < limits.min or values.max() > limits.max):
+        raise ValueError(f"'piso' fuera del rango de {np.dtype(PISO_DTYPE).name} ({limits.min}..{limits.max})")
+    return values.astype(PISO_DTYPE)
+
+
+def to_sensor_frame(df, categories=()):
+    """
+    Aplica el esquema compacto a lecturas con 'timestamp' (columna o índice),
+    'edificio', 'piso' y las variables. Retorna un DataFrame indexado por
+    timestamp (datetime64[ns]); las columnas ausentes se omiten. Un piso no
+    entero o fuera del rango de PISO_DTYPE lanza ValueError.
+
+    Por lectura: 8 B de tiempo + 1 B de código de edificio + 2 B de piso +
+    12 B de lecturas, frente a ~100 B con los tipos por defecto (texto repetido
+    en cada fila, int64 y float64).
+    """
+    if 'timestamp' in df.columns:
+        df = df.set_index('timestamp')
+    index = pd.DatetimeIndex(pd.to_datetime(df.index)).astype(TIMESTAMP_DTYPE)
+    columns = {}
+    if 'edificio' in df.columns:
+        columns['edificio'] = _as_categorical(df['edificio'], categories)
+    if 'piso' in df.columns:
+        columns['piso'] = _as_piso(df['piso'].to_numpy())
+    for var in READING_VARIABLES:
+        if var in df.columns:
+            columns[var] = df[var].to_numpy().astype(READING_DTYPE)
+    return pd.DataFrame(columns, index=index.rename('timestamp'))
+
+
+def concat_sensor_frames(base, new_rows):
+    """
+    Anexa lecturas ya tipadas conservando el esquema: si aparecen edificios
+    nuevos se unen las categorías (pd.concat con categorías distintas
+    degradaría la columna a texto).
+    """
+    if base.empty:
+        return new_rows
+    if new_rows.empty:
+        return base
+    old_categories = base['edificio'].cat.categories
+    if not new_rows['edificio'].cat.categories.equals(old_categories):
+        categories = sorted(set(old_categories).union(new_rows['edificio'].cat.categories))
+        base = base.assign(edificio=base['edificio'].cat.set_categories(categories))
+        new_rows = new_rows.assign(edificio=new_rows['edificio'].cat.set_categories(categories))
+    return pd.concat([base, new_rows])
+
+
+def epoch_ns(df):
+    """Tiempos del DataFrame como int64 (ns desde epoch), sin copia."""
+    return df.index.asi8
+
+
+def exact_readings(values):
+    """
+    Lecturas float32 llevadas a float64 con sus 2 decimales originales, para
+    comparar contra los umbrales igual que con los datos en float64.
+    """
+    return np.round(np.asarray(values, dtype=np.float64), 2)
+
+
+def memory_per_reading(df):
+    """Bytes en memoria por lectura (incluye índice y texto)."""
+    if df.empty:
+        return 0.0
+    return float(df.memory_usage(deep=True, index=True).sum()) / len(df)
+
+# ------------------- NIVELES DE ALERTA -------------------
+
+def level_name(level):
+    """Nombre mostrado de un nivel de UMBRALES ('Critica' -> 'Crítica')."""
+    return LEVEL_ALIASES.get(level, level)
+
+
+def as_levels(values):
+    """
+    Niveles como categórico ordenado LEVEL_DTYPE (acepta los nombres sin tilde
+    de UMBRALES). Un nivel fuera de ALERT_LEVELS queda como faltante.
+    """
+    if isinstance(values, (pd.Series, pd.Categorical)) and values.dtype == LEVEL_DTYPE:
+        return pd.Categorical(values)
+    values = pd.Series(np.asarray(values, dtype=object)).replace(LEVEL_ALIASES)
+    return pd.Categorical(values, dtype=LEVEL_DTYPE)
+
+# ------------------- VISTAS POR PISO -------------------
+
+def floor_series(df, edificio, start=None, end=None, variables=READING_VARIABLES):
+    """
+    Series por piso del edificio en la ventana (start, end], listas para
+    graficar. Retorna {piso: (timestamps int64, valores (n, variables))}: las
+    lecturas se ordenan por piso una sola vez y cada piso es una vista
+    (rebanada) de ese arreglo, sin el DataFrame derretido de 3x filas.
+    """
+    window = df[df['edificio'] == edificio]
+    if start is not None:
+        window = window[window.index > start]
+    if end is not None:
+        window = window[window.index <= end]
+    if window.empty:
+        return {}
+
+    pisos = window['piso'].to_numpy()
+    order = np.argsort(pisos, kind='stable') # Dentro de cada piso se conserva el orden de tiempo
+    sorted_pisos = pisos[order]
+    timestamps = epoch_ns(window)[order]
+    values = window[list(variables)].to_numpy()[order]
+    bounds = np.flatnonzero(np.r_[True, sorted_pisos[1:] != sorted_pisos[:-1], True])
+    return {int(sorted_pisos[lo]): (timestamps[lo:hi], values[lo:hi]) for lo, hi in zip(bounds[:-1], bounds[1:])}
@@ -0,0 +1,323 @@
+# =========================================================
+# MÓDULO: sharding.py (BACKEND - EVALUACIÓN EN PARALELO POR PARTICIONES)
+# Propósito: Repartir las series (edificio, piso) entre procesos de trabajo
+# persistentes. Cada proceso es dueño del estado en streaming de sus series
+# (predictor y detector de anomalías) y evalúa sus alertas; el coordinador
+# solo envía las lecturas nuevas como bytes compactos (identificadores int32
+# y lecturas float64, sin DataFrames serializados) y une los resultados.
+# Produce lo mismo que generate_alerts + get_predictions en un solo proceso.
+# =========================================================
+
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+
+from configuracion.config import (SHARD_WORKERS, FORECAST_MODEL, FORECAST_HORIZON_MINUTES, WINDOWS_SIZE_MINUTES,
+                                  SEASON_LENGTH_MINUTES, RULES_FILE)
+from backend import metrics
+from backend.redistribution import fill_destinations
+from backend.schema import READING_VARIABLES, PISO_DTYPE, exact_readings
+
+SERIES_KEYS = ['edificio', 'piso']
+NEVER = np.iinfo(np.int64).min # Última lectura de una serie aún sin lecturas (o anterior a un reinicio)
+
+# ------------------- PROCESO DE TRABAJO -------------------
+
+def _feed(model, ids, values, reset):
+    """Incorpora las lecturas (en orden de tiempo) al modelo por rondas; tras un reinicio, solo sus `warmup` últimas por serie."""
+    from backend.predictor import occurrence_rounds
+
+    if reset and len(ids):
+        from_end = pd.Series(ids).groupby(ids).cumcount(ascending=False).to_numpy()
+        keep = from_end < model.warmup
+        ids, values = ids[keep], values[keep]
+    for positions in occurrence_rounds(ids):
+        model.push(ids[positions], values[positions])
+
+
+class _ShardState:
+    """Estado de las series de una partición, dentro del proceso de trabajo."""
+
+    def __init__(self, model, rules_path):
+        from backend.anomaly import AnomalyDetector
+        from backend.forecasting import make_forecaster
+        from backend.rules import RuleRegistry
+
+        self.predictor = make_forecaster(model, FORECAST_HORIZON_MINUTES, WINDOWS_SIZE_MINUTES,
+                                         season_length=SEASON_LENGTH_MINUTES)
+        self.detector = AnomalyDetector()
+        self.registry = RuleRegistry(rules_path)
+        self.keys = []
+        self.last = np.empty((0, len(READING_VARIABLES))) # Última lectura de cada serie
+        self.seen = np.zeros(0, dtype=bool) # Series con lecturas desde el último reinicio
+        self.absent = np.zeros(0, dtype=bool) # Series sin lecturas en la ventana vigente del coordinador (no se evalúan)
+        self._columns = [READING_VARIABLES.index(v) for v in self.predictor.variables]
+        self._anomaly_columns = [READING_VARIABLES.index(v) for v in self.detector.variables]
+        self._temp_col = self.predictor.variables.index('temp_C')
+        self._register([])
+
+    def _register(self, new_keys):
+        """Registra las claves nuevas con el mismo identificador local en el predictor y el detector."""
+        self.keys.extend(new_keys)
+        n = len(self.keys)
+        self.predictor.register(self.keys)
+        self.detector.register(self.keys)
+        last = np.full((n, len(READING_VARIABLES)), np.nan)
+        seen = np.zeros(n, dtype=bool)
+        last[:len(self.last)], seen[:len(self.seen)] = self.last, self.seen
+        self.last, self.seen, self.absent = last, seen, np.zeros(n, dtype=bool)
+        self.edificios = np.array([k[0] for k in self.keys], dtype=object)
+        self.pisos = np.array([k[1] for k in self.keys], dtype=PISO_DTYPE)
+        self.order = np.array(sorted(range(n), key=self.keys.__getitem__), dtype=np.int64) # Por edificio y piso
+
+    def reset(self):
+        keys, self.keys = self.keys, []
+        self.predictor.reset()
+        self.detector.reset()
+        self.last, self.seen = self.last[:0], self.seen[:0]
+        self._register(keys)
+
+    def update(self, ids, values, reset, absent=()):
+        """Incorpora un lote; `absent` son los ids de las series sin lecturas en la ventana del coordinador."""
+        if reset:
+            self.reset()
+        self.absent[:] = False
+        self.absent[list(absent)] = True
+        if not len(ids):
+            return
+        _feed(self.predictor, ids, values[:, self._columns], reset)
+        _feed(self.detector, ids, values[:, self._anomaly_columns], reset)
+        # Última lectura de cada serie del lote
+        unique, from_end = np.unique(ids[::-1], return_index=True)
+        self.last[unique] = values[len(ids) - 1 - from_end]
+        self.seen[unique] = True
+
+    def evaluate(self):
+        """
+        (alertas de la partición ordenadas por edificio y piso, claves críticas, ids con pronóstico,
+        pronósticos, ids evaluados, sus lecturas): las dos últimas para el plan de redistribución.
+        """
+        from backend.core_logic import evaluate_alerts, ALERT_VARIABLES
+
+        forecast = np.round(self.predictor.forecast_values(), 2)
+        # Solo las series presentes en la ventana, como generate_alerts (que evalúa las de su DataFrame)
+        order = self.order[self.seen[self.order] & ~self.absent[self.order]]
+        # Sin lecturas faltantes en la última lectura, igual que _latest_by_series
+        columns = [READING_VARIABLES.index(v) for v in ALERT_VARIABLES]
+        order = order[~np.isnan(self.last[order][:, columns]).any(axis=1)]
+
+        readings = {var: self.last[order, READING_VARIABLES.index(var)] for var in ALERT_VARIABLES}
+        levels = self.detector.levels()
+        anomalies = {var: levels[order, j] for j, var in enumerate(self.detector.variables)}
+        df_alerts, critical = evaluate_alerts(self.registry.current(), self.edificios[order], self.pisos[order],
+                                              readings, forecast[order, self._temp_col], anomalies)
+        critical_keys = [self.keys[i] for i in order[critical]]
+        seen = np.flatnonzero(self.seen)
+        return df_alerts.drop(columns='_fila'), critical_keys, seen, forecast[seen], order, self.last[order]
+
+
+def _worker_main(conn, model, rules_path):
+    """Bucle del proceso de trabajo: (claves nuevas, reinicio, n, ausentes) + bytes del lote -> resultados."""
+    state = _ShardState(model, rules_path)
+    width = len(READING_VARIABLES)
+    while True:
+        message = conn.recv()
+        if message is None:
+            break
+        new_keys, reset, n, absent = message
+        payload = conn.recv_bytes()
+        ids = np.frombuffer(payload, dtype=np.int32, count=n).astype(np.int64)
+        values = np.frombuffer(payload, dtype=np.float64, offset=4 * n).reshape(n, width)
+        if new_keys:
+            state._register(new_keys)
+        state.update(ids, values, reset, absent)
+        conn.send(state.evaluate())
+    conn.close()
+
+# ------------------- COORDINADOR -------------------
+
+class ShardedEvaluator:
+    """
+    Coordinador de `workers` procesos persistentes. Cada serie se asigna la
+    primera vez que aparece a la partición con menos series (y allí se queda).
+    `evaluate(df)` envía a cada partición solo las filas de `df` posteriores a
+    la última vista (igual que StreamingSeriesModel.sync: ante un hueco o un
+    historial reiniciado, reconstruye desde las últimas lecturas de cada serie)
+    y retorna (alertas, predicciones, claves críticas, (claves, kW a
+    trasladar)) con el formato de generate_alerts y get_predictions. El plan
+    de redistribución abarca edificios repartidos en varias particiones, así
+    que se calcula aquí con las lecturas y pronósticos que ellas devuelven.
+    Las series sin lecturas en la ventana de `df` dejan de evaluarse (como en
+    generate_alerts) hasta que vuelven a reportar.
+    """
+
+    def __init__(self, workers=SHARD_WORKERS, model=FORECAST_MODEL, rules_path=None):
+        from backend.core_logic import _resolve_data_path
+
+        self.workers = max(1, int(workers))
+        self.model = model
+        self.rules_path = rules_path or _resolve_data_path(RULES_FILE)
+        self._ids = {} # {(edificio, piso): (partición, id local, orden de aparición)}
+        self._shard_keys = [[] for _ in range(self.workers)]
+        self._pending = [[] for _ in range(self.workers)] # Claves aún no enviadas a cada partición
+        self._owners = [] # (partición, id local) por orden de aparición
+        self._last_seen = np.empty(0, dtype=np.int64) # Última lectura enviada de cada serie (ns, por orden de aparición)
+        self._conns = []
+        self._processes = []
+        self.last_timestamp = None
+        self.warmup = None
+
+    def start(self):
+        if self._processes:
+            return self
+        ctx = multiprocessing.get_context('spawn') # Sin heredar hilos ni locks del proceso padre
+        for _ in range(self.workers):
+            parent, child = ctx.Pipe()
+            process = ctx.Process(target=_worker_main, args=(child, self.model, self.rules_path), daemon=True)
+            process.start()
+            child.close()
+            self._conns.append(parent)
+            self._processes.append(process)
+        return self
+
+    def close(self):
+        for conn in self._conns:
+            try:
+                conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._conns, self._processes = [], []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _warmup(self):
+        """Lecturas por serie para reconstruir el estado: la mayor de las del predictor y el detector."""
+        if self.warmup is None:
+            from backend.anomaly import AnomalyDetector
+            from backend.forecasting import make_forecaster
+
+            predictor = make_forecaster(self.model, FORECAST_HORIZON_MINUTES, WINDOWS_SIZE_MINUTES,
+                                        season_length=SEASON_LENGTH_MINUTES)
+            self.warmup = max(predictor.warmup, AnomalyDetector().warmup)
+        return self.warmup
+
+    def _assign(self, keys):
+        """(partición, id local, orden de aparición) de cada clave; las nuevas van a la partición con menos series."""
+        entries = np.empty((len(keys), 3), dtype=np.int64)
+        for i, key in enumerate(keys):
+            entry = self._ids.get(key)
+            if entry is None:
+                shard = min(range(self.workers), key=lambda s: len(self._shard_keys[s]))
+                entry = self._ids[key] = (shard, len(self._shard_keys[shard]), len(self._ids))
+                self._shard_keys[shard].append(key)
+                self._pending[shard].append(key)
+                self._owners.append(entry[:2])
+            entries[i] = entry
+        grow = len(self._ids) - len(self._last_seen)
+        if grow > 0:
+            self._last_seen = np.r_[self._last_seen, np.full(grow, NEVER)]
+        return entries[:, 0], entries[:, 1], entries[:, 2]
+
+    def _absent(self, gids, times, reset, window_start):
+        """Registra las lecturas enviadas y retorna, por partición, los ids locales de las series sin lecturas desde `window_start`."""
+        if reset:
+            self._last_seen[:] = NEVER
+        np.maximum.at(self._last_seen, gids, times)
+        absent = [[] for _ in range(self.workers)]
+        for gid in np.flatnonzero(self._last_seen < window_start).tolist():
+            shard, local = self._owners[gid]
+            absent[shard].append(local)
+        return absent
+
+    def _new_rows(self, df):
+        """Filas a enviar y si las particiones deben reiniciar su estado antes de incorporarlas."""
+        index = df.index
+        if (self.last_timestamp is None
+                or index[-1] < self.last_timestamp
+                or index[0] > self.last_timestamp):
+            return df.groupby(SERIES_KEYS, sort=False, observed=True).tail(self._warmup()), True
+        return df.iloc[index.searchsorted(self.last_timestamp, side='right'):], False
+
+    def evaluate(self, df):
+        if df.empty:
+            return pd.DataFrame(columns=['timestamp'] + SERIES_KEYS), pd.DataFrame(columns=SERIES_KEYS), [], ([], [])
+        self.start()
+        rows, reset = self._new_rows(df)
+        self.last_timestamp = df.index[-1]
+
+        with metrics.timed('particiones_envio'):
+            shards, local, gids = self._assign(list(zip(rows['edificio'].to_numpy(), rows['piso'].to_numpy().tolist())))
+            times = rows.index.to_numpy().astype('datetime64[ns]').astype(np.int64)
+            absent = self._absent(gids, times, reset, np.datetime64(df.index[0], 'ns').astype(np.int64))
+            values = np.column_stack([exact_readings(rows[var]) for var in READING_VARIABLES])
+            for shard, conn in enumerate(self._conns):
+                mask = shards == shard
+                ids = local[mask].astype(np.int32)
+                conn.send((self._pending[shard], reset, len(ids), absent[shard]))
+                conn.send_bytes(ids.tobytes() + np.ascontiguousarray(values[mask]).tobytes())
+                self._pending[shard] = []
+
+        with metrics.timed('particiones_espera'):
+            results = [conn.recv() for conn in self._conns]
+        return self._merge(results, df.index.max())
+
+    def _merge(self, results, current_time):
+        from backend.core_logic import ALERT_COLUMNS
+
+        alert_parts, critical_keys, forecast_parts = [], [], []
+        evaluated_keys, evaluated_readings, evaluated_forecast = [], [], []
+        for shard, (df_alerts, critical, seen, forecast, evaluated, readings) in enumerate(results):
+            alert_parts.append(df_alerts)
+            critical_keys.extend(critical)
+            shard_keys = self._shard_keys[shard]
+            evaluated_keys.extend(shard_keys[i] for i in evaluated)
+            evaluated_readings.append(readings)
+            evaluated_forecast.append(forecast[np.searchsorted(seen, evaluated)])
+            keys = [shard_keys[i] for i in seen]
+            frame = pd.DataFrame(forecast, columns=READING_VARIABLES)
+            frame.insert(0, 'piso', np.array([k[1] for k in keys], dtype=PISO_DTYPE))
+            frame.insert(0, 'edificio', [k[0] for k in keys])
+            frame['_id'] = [self._ids[k][2] for k in keys]
+            forecast_parts.append(frame)
+
+        # Cada serie vive en una sola partición: el orden estable por (edificio, piso) conserva el de cada piso
+        df_alerts = pd.concat([a for a in alert_parts if not a.empty] or [pd.DataFrame(columns=ALERT_COLUMNS[1:])],
+                              ignore_index=True)
+        df_alerts = df_alerts.sort_values(SERIES_KEYS, kind='stable').reset_index(drop=True)
+        df_alerts.insert(0, 'timestamp', current_time)
+        shifts = self._redistribute(df_alerts, evaluated_keys, np.concatenate(evaluated_readings),
+                                    np.concatenate(evaluated_forecast))
+        if df_alerts.empty:
+            df_alerts = pd.DataFrame(columns=ALERT_COLUMNS)
+
+        # Predicciones en el orden de aparición de las series (como StreamingSeriesModel.predict)
+        predictions = pd.concat(forecast_parts, ignore_index=True).sort_values('_id', kind='stable')
+        predictions = predictions.drop(columns='_id').reset_index(drop=True)
+        return df_alerts[ALERT_COLUMNS], predictions, critical_keys, shifts
+
+    def _redistribute(self, df_alerts, keys, readings, forecast):
+        """Completa el 'Piso Y' de `df_alerts` (en el lugar) con el plan de todas las series; retorna (claves, kW)."""
+        from backend import core_logic
+
+        edificios = np.array([k[0] for k in keys], dtype=object)
+        pisos = np.array([k[1] for k in keys], dtype=np.int64)
+        column = READING_VARIABLES.index
+        plan = core_logic.get_redistribution_plan(
+            core_logic.get_rules(), edificios, pisos,
+            {var: readings[:, column(var)] for var in ('temp_C', 'energia_kW')},
+            {var: forecast[:, column(var)] for var in ('temp_C', 'energia_kW')},
+            core_logic.applied_load_shifts(keys))
+        if not df_alerts.empty:
+            rows = pd.MultiIndex.from_arrays([edificios, pisos]).get_indexer(
+                pd.MultiIndex.from_arrays([df_alerts['edificio'].to_numpy(), df_alerts['piso'].to_numpy()]))
+            df_alerts['recomendacion'] = fill_destinations(df_alerts['recomendacion'], plan.destinations()[rows])
+        return keys, plan.shift
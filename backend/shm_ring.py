@@ -0,0 +1,263 @@
+# =========================================================
+# MÓDULO: shm_ring.py (BACKEND - MEMORIA COMPARTIDA ENTRE PROCESOS)
+# Propósito: Buffer circular de lecturas de ancho fijo sobre un archivo
+# mapeado en memoria (mmap), más un bloque de control con los flags de
+# corrección y la carga a trasladar por (edificio, piso). Lo comparten el simulador (escritor) y el
+# backend/dashboard (lectores) para cerrar el bucle entre procesos. Los traslados
+# de carga vencen solos si nadie vuelve a publicarlos (daemon o dashboard detenidos).
+# =========================================================
+
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from configuracion.config import SEQLOCK_RETRIES, SEQLOCK_SLEEP_SECONDS
+
+MAGIC = 0x5346524E49 # 'SFRNI' (cambia con el formato del bloque de control)
+
+# Lectura de ancho fijo (32 bytes)
+READING_DTYPE = np.dtype([
+    ('ts', '<i8'),
+    ('edificio', 'S8'),
+    ('piso', '<i4'),
+    ('temp_C', '<f4'),
+    ('humedad_pct', '<f4'),
+    ('energia_kW', '<f4'),
+])
+
+# Bloque de control: una fila por serie registrada
+CONTROL_DTYPE = np.dtype([
+    ('edificio', 'S8'),
+    ('piso', '<i4'),
+    ('correction', 'u1'),
+    ('_pad', 'u1'),
+    ('shift_ticks', '<u2'), # Ticks del simulador que el traslado sigue vigente sin una publicación nueva
+    ('shift_kW', '<f4'), # Carga trasladada por la redistribución: negativa si el piso cede, positiva si recibe
+])
+
+# Cabecera (int64): posiciones de cada campo
+H_MAGIC, H_CAPACITY, H_MAX_SLOTS, H_WRITE_SEQ, H_LOCK, H_SLOTS = range(6)
+HEADER_FIELDS = 8
+HEADER_BYTES = HEADER_FIELDS * 8
+
+
+class SharedRing:
+    """
+    Buffer circular en un archivo mapeado en memoria.
+
+    Un único escritor anexa lecturas; `write_seq` cuenta las lecturas escritas
+    desde la creación y la lectura `i` vive en la posición `i % capacity`.
+    El escritor marca las escrituras con un contador tipo seqlock (impar =
+    escritura en curso) para que los lectores descarten copias inconsistentes.
+    Si el escritor muere a mitad de una escritura el contador queda impar: los
+    lectores reintentan un número acotado de veces y luego no ven datos nuevos
+    hasta que el simulador recrea el buffer (con el contador en cero).
+
+    Los lectores obtienen vistas NumPy sin copia (`latest`), válidas hasta que
+    el escritor da la vuelta al buffer; `read_since` retorna copias validadas.
+    """
+
+    def __init__(self, path, mm):
+        self.path = path
+        self._mm = mm
+        self._inode = os.stat(path).st_ino
+        self.header = np.ndarray((HEADER_FIELDS,), dtype='<i8', buffer=mm, offset=0)
+        self.capacity = int(self.header[H_CAPACITY])
+        self.max_slots = int(self.header[H_MAX_SLOTS])
+        control_bytes = self.max_slots * CONTROL_DTYPE.itemsize
+        self.control = np.ndarray((self.max_slots,), dtype=CONTROL_DTYPE, buffer=mm, offset=HEADER_BYTES)
+        self.records = np.ndarray((self.capacity,), dtype=READING_DTYPE, buffer=mm,
+                                  offset=HEADER_BYTES + control_bytes)
+        self._slot_index = {}
+        self._slot_count = 0
+
+    # ------------------- CREACIÓN / CONEXIÓN -------------------
+
+    @classmethod
+    def create(cls, path, capacity, max_slots=4096):
+        """
+        Crea (o recrea) el buffer. Se construye en un archivo temporal y se
+        publica con os.replace: los lectores conectados al anterior lo detectan
+        con `is_stale()`.
+        """
+        size = HEADER_BYTES + max_slots * CONTROL_DTYPE.itemsize + capacity * READING_DTYPE.itemsize
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.truncate(size)
+        mm = np.memmap(tmp_path, dtype=np.uint8, mode='r+', shape=(size,))
+        header = np.ndarray((HEADER_FIELDS,), dtype='<i8', buffer=mm, offset=0)
+        header[H_CAPACITY] = capacity
+        header[H_MAX_SLOTS] = max_slots
+        header[H_LOCK] = 0
+        header[H_MAGIC] = MAGIC
+        mm.flush()
+        os.replace(tmp_path, path)
+        return cls(path, mm)
+
+    @classmethod
+    def attach(cls, path):
+        """Se conecta a un buffer existente. Retorna None si no existe o no es válido."""
+        try:
+            mm = np.memmap(path, dtype=np.uint8, mode='r+')
+        except (FileNotFoundError, ValueError):
+            return None
+        if len(mm) < HEADER_BYTES or np.ndarray((1,), dtype='<i8', buffer=mm)[0] != MAGIC:
+            return None
+        return cls(path, mm)
+
+    def is_stale(self):
+        """True si el archivo fue recreado (p. ej. reinicio del simulador) y hay que reconectarse."""
+        try:
+            return os.stat(self.path).st_ino != self._inode
+        except FileNotFoundError:
+            return True
+
+    @property
+    def write_seq(self):
+        return int(self.header[H_WRITE_SEQ])
+
+    # ------------------- SERIES Y BLOQUE DE CONTROL -------------------
+
+    def _refresh_slots(self):
+        count = int(self.header[H_SLOTS])
+        if count != self._slot_count:
+            rows = self.control[self._slot_count:count]
+            for i, (edificio, piso) in enumerate(zip(rows['edificio'], rows['piso']), start=self._slot_count):
+                self._slot_index[(edificio.decode(), int(piso))] = i
+            self._slot_count = count
+
+    def register_series(self, keys):
+        """(Escritor) Registra las series (edificio, piso) en el bloque de control y retorna sus filas."""
+        self._refresh_slots()
+        slots = []
+        for key in keys:
+            slot = self._slot_index.get(key)
+            if slot is None:
+                slot = self._slot_count
+                if slot >= self.max_slots:
+                    raise ValueError(f"Bloque de control lleno ({self.max_slots} series)")
+                self.control[slot] = (key[0].encode(), key[1], 0, 0, 0, 0.0)
+                self._slot_index[key] = slot
+                self._slot_count += 1
+                self.header[H_SLOTS] = self._slot_count
+            slots.append(slot)
+        return np.array(slots, dtype=np.int64)
+
+    def slots_of(self, keys):
+        """Filas del bloque de control de cada clave (-1 si la serie no está registrada)."""
+        self._refresh_slots()
+        return np.array([self._slot_index.get(key, -1) for key in keys], dtype=np.int64)
+
+    def corrections(self, slots):
+        """Flags de corrección activos para las filas indicadas."""
+        return self.control['correction'][slots] != 0
+
+    def set_corrections(self, slots, active=True):
+        """Activa (o desactiva) la corrección de las filas indicadas; se ignoran las filas -1."""
+        slots = np.asarray(slots)
+        self.control['correction'][slots[slots >= 0]] = 1 if active else 0
+
+    def load_shifts(self, slots):
+        """kW trasladados vigentes de las filas indicadas (0 para las filas -1 y los traslados vencidos)."""
+        slots = np.asarray(slots)
+        rows = self.control[np.maximum(slots, 0)]
+        return np.where((slots >= 0) & (rows['shift_ticks'] > 0), rows['shift_kW'], 0.0)
+
+    def set_load_shifts(self, slots, kw, ticks):
+        """
+        Publica los kW a trasladar de cada fila (plan de redistribución vigente),
+        vigentes por `ticks` ticks del simulador; se ignoran las filas -1.
+        """
+        slots, kw = np.asarray(slots), np.asarray(kw)
+        valid = slots >= 0
+        self.control['shift_kW'][slots[valid]] = kw[valid]
+        self.control['shift_ticks'][slots[valid]] = ticks
+
+    def age_load_shifts(self, slots):
+        """
+        (Escritor) Descuenta un tick de vigencia de las filas indicadas; los
+        traslados que vencen vuelven a 0 (el plan dejó de publicarse).
+        """
+        slots = np.asarray(slots)
+        ticks = self.control['shift_ticks'][slots]
+        live = ticks > 0
+        self.control['shift_ticks'][slots[live]] = ticks[live] - 1
+        expired = slots[ticks == 1]
+        self.control['shift_kW'][expired] = 0.0
+
+    # ------------------- LECTURAS -------------------
+
+    def append(self, df):
+        """(Escritor) Anexa las lecturas de `df` (formato de generate_live_data)."""
+        n = len(df)
+        if n == 0:
+            return
+        batch = np.empty(n, dtype=READING_DTYPE)
+        batch['ts'] = pd.to_datetime(df['timestamp']).values.astype('datetime64[ns]').astype(np.int64)
+        batch['edificio'] = df['edificio'].astype(str).str.encode('ascii').to_numpy()
+        batch['piso'] = df['piso'].to_numpy()
+        for var in ('temp_C', 'humedad_pct', 'energia_kW'):
+            batch[var] = df[var].to_numpy()
+
+        batch = batch[-self.capacity:]
+        seq = self.write_seq + n - len(batch)
+        positions = (seq + np.arange(len(batch))) % self.capacity
+
+        self.header[H_LOCK] += 1 # impar: escritura en curso
+        self.records[positions] = batch
+        self.header[H_WRITE_SEQ] = seq + len(batch)
+        self.header[H_LOCK] += 1 # par: escritura confirmada
+
+    def latest(self, n):
+        """
+        Vistas sin copia de las últimas `n` lecturas (en orden). Retorna una o
+        dos vistas según si el tramo da la vuelta al buffer.
+        """
+        end = self.write_seq
+        n = min(n, end, self.capacity)
+        return self._views(end - n, end)
+
+    def _views(self, start_seq, end_seq):
+        """Vistas de las lecturas con secuencia en [start_seq, end_seq) (a lo sumo `capacity`)."""
+        start = start_seq % self.capacity
+        stop = start + (end_seq - start_seq)
+        if stop <= self.capacity:
+            return [self.records[start:stop]]
+        return [self.records[start:], self.records[:stop - self.capacity]]
+
+    def read_since(self, seq):
+        """
+        Copia validada de las lecturas con número de secuencia >= `seq`.
+        Retorna (lecturas, nueva_seq, perdidas): `perdidas` es True si el
+        lector se quedó atrás más de `capacity` lecturas. Si la escritura no
+        se confirma tras SEQLOCK_RETRIES intentos, retorna lo mismo que sin
+        lecturas nuevas (vacío, `seq`, False).
+        """
+        for attempt in range(SEQLOCK_RETRIES):
+            if attempt:
+                time.sleep(SEQLOCK_SLEEP_SECONDS)
+            lock = int(self.header[H_LOCK])
+            if lock % 2:
+                continue
+            end = self.write_seq
+            lost = seq > end or end - seq > self.capacity
+            start = max(0, end - self.capacity) if lost else seq
+            chunk = np.concatenate(self._views(start, end)) if end > start else self.records[:0].copy()
+            if int(self.header[H_LOCK]) == lock:
+                return chunk, end, lost
+        return self.records[:0].copy(), seq, False
+
+
+def readings_to_frame(records):
+    """Convierte lecturas del buffer al DataFrame indexado por timestamp de load_and_prepare_data."""
+    df = pd.DataFrame({
+        'timestamp': records['ts'].astype('datetime64[ns]'),
+        'edificio': records['edificio'].astype(str),
+        'piso': records['piso'].astype(np.int64),
+        'temp_C': records['temp_C'].astype(float).round(2),
+        'humedad_pct': records['humedad_pct'].astype(float).round(2),
+        'energia_kW': records['energia_kW'].astype(float).round(2),
+    })
+    return df.set_index('timestamp')
@@ -0,0 +1,319 @@
+# =========================================================
+# MÓDULO: storage.py (BACKEND - ALMACENAMIENTO DE LECTURAS)
+# Propósito: Capa de almacenamiento intercambiable para las lecturas del
+# simulador. Backend 'csv': log segmentado de solo-anexado (append-only);
+# backend 'parquet': archivos columnares particionados por hora (parquet_store.py).
+# =========================================================
+
+import io
+import json
+import os
+import shutil
+import uuid
+
+import pandas as pd
+
+MANIFEST_NAME = 'manifest.json'
+SEGMENT_PREFIX = 'seg_'
+READ_RETRIES = 3
+
+# ------------------- MANIFIESTO -------------------
+
+def _manifest_path(directory):
+    return os.path.join(directory, MANIFEST_NAME)
+
+
+def _read_manifest(directory):
+    """Lee el manifiesto del log. Retorna None si el log aún no existe."""
+    try:
+        with open(_manifest_path(directory), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_manifest(directory, manifest):
+    """
+    Publica el manifiesto de forma atómica (escritura a temporal + os.replace).
+    Un lector siempre ve el manifiesto anterior o el nuevo, nunca uno a medias.
+    """
+    tmp_path = _manifest_path(directory) + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, _manifest_path(directory))
+
+# ------------------- ESCRITOR (SOLO-ANEXADO) -------------------
+
+class SegmentLogWriter:
+    """
+    Escritor de un log segmentado en CSV.
+
+    Cada tick solo anexa las filas nuevas al segmento activo; cuando este
+    alcanza `segment_records` filas se abre uno nuevo. Los segmentos más
+    antiguos se eliminan en cuanto el resto cubre `max_records`, así que el
+    costo por tick es constante sin importar el tamaño de la ventana.
+
+    El manifiesto guarda los bytes *confirmados* de cada segmento: los lectores
+    solo leen hasta ese límite y nunca ven una escritura parcial.
+    """
+
+    def __init__(self, directory, max_records, segment_records=None):
+        self.directory = directory
+        self.max_records = max_records
+        self.segment_records = segment_records or max(1, max_records // 4)
+        self._manifest = _read_manifest(directory) or self._empty_manifest()
+
+    def _empty_manifest(self):
+        # log_id cambia en cada reset para que los lectores incrementales
+        # detecten que el historial anterior dejó de existir.
+        return {'backend': 'csv', 'log_id': uuid.uuid4().hex, 'max_records': self.max_records, 'next_id': 0, 'segments': []}
+
+    def reset(self):
+        """Elimina el historial existente y deja un log vacío."""
+        if os.path.isdir(self.directory):
+            shutil.rmtree(self.directory)
+        os.makedirs(self.directory)
+        self._manifest = self._empty_manifest()
+        _write_manifest(self.directory, self._manifest)
+
+    def _open_segment(self, columns):
+        """Crea un segmento nuevo con su cabecera y lo registra en el manifiesto."""
+        name = f"{SEGMENT_PREFIX}{self._manifest['next_id']:06d}.csv"
+        self._manifest['next_id'] += 1
+        header = (','.join(columns) + '\n').encode('utf-8')
+        with open(os.path.join(self.directory, name), 'wb') as f:
+            f.write(header)
+        segment = {'file': name, 'rows': 0, 'bytes': len(header)}
+        self._manifest['segments'].append(segment)
+        return segment
+
+    def _drop_old_segments(self):
+        """Retira segmentos antiguos mientras el resto siga cubriendo max_records."""
+        segments = self._manifest['segments']
+        total_rows = sum(s['rows'] for s in segments)
+        dropped = []
+        while len(segments) > 1 and total_rows - segments[0]['rows'] >= self.max_records:
+            total_rows -= segments[0]['rows']
+            dropped.append(segments.pop(0))
+        return dropped
+
+    def append(self, df):
+        """Anexa las filas de `df` al log y publica el nuevo manifiesto."""
+        if df.empty:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        segments = self._manifest['segments']
+        if not segments or segments[-1]['rows'] >= self.segment_records:
+            self._open_segment(df.columns)
+        segment = segments[-1]
+
+        payload = df.to_csv(header=False, index=False, date_format='%Y-%m-%d %H:%M:%S.%f').encode('utf-8')
+        with open(os.path.join(self.directory, segment['file']), 'r+b') as f:
+            # Se escribe a partir de los bytes confirmados: si un tick anterior
+            # falló a mitad de escritura, su basura queda sobreescrita.
+            f.seek(segment['bytes'])
+            f.write(payload)
+            f.truncate()
+        segment['rows'] += len(df)
+        segment['bytes'] += len(payload)
+
+        dropped = self._drop_old_segments()
+        _write_manifest(self.directory, self._manifest)
+
+        # Los segmentos se borran solo después de publicar el manifiesto.
+        for old in dropped:
+            try:
+                os.remove(os.path.join(self.directory, old['file']))
+            except FileNotFoundError:
+                pass
+
+# ------------------- LECTOR -------------------
+
+def read_segment(directory, segment, offset=0):
+    """Lee un segmento desde `offset` hasta sus bytes confirmados y retorna el texto crudo."""
+    with open(os.path.join(directory, segment['file']), 'rb') as f:
+        f.seek(offset)
+        return f.read(segment['bytes'] - offset)
+
+
+def read_log(directory):
+    """
+    Lee el log completo retenido como DataFrame (timestamps aún como texto).
+
+    Retorna un DataFrame vacío si el log no existe. Si un segmento desaparece
+    entre la lectura del manifiesto y la del archivo (rotación concurrente),
+    se reintenta con el manifiesto actualizado.
+    """
+    for _ in range(READ_RETRIES):
+        manifest = _read_manifest(directory)
+        if manifest is None:
+            return pd.DataFrame()
+        try:
+            frames = [
+                pd.read_csv(io.BytesIO(read_segment(directory, seg)))
+                for seg in manifest['segments'] if seg['rows'] > 0
+            ]
+        except FileNotFoundError:
+            continue
+
+        if not frames:
+            return pd.DataFrame()
+        df = pd.concat(frames, ignore_index=True)
+        return df.tail(manifest['max_records']).reset_index(drop=True)
+
+    return pd.DataFrame()
+
+
+class SegmentTailReader:
+    """
+    Lector incremental (tail) del log segmentado.
+
+    Recuerda la firma del manifiesto (inodo, mtime, tamaño) y cuántos bytes
+    confirmados ya parseó de cada segmento. `poll()` solo lee y parsea los
+    bytes nuevos; si el manifiesto no cambió, no toca ningún archivo.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._reset_state()
+
+    def _reset_state(self):
+        self.max_records = None
+        self._signature = None
+        self._log_id = None
+        self._offsets = {}
+        self._columns = None
+
+    def _parse(self, raw, offset):
+        # Solo el inicio de un segmento trae cabecera; el resto se parsea con
+        # los nombres de columna ya conocidos.
+        if offset == 0:
+            df = pd.read_csv(io.BytesIO(raw))
+            self._columns = list(df.columns)
+            return df
+        return pd.read_csv(io.BytesIO(raw), header=None, names=self._columns)
+
+    def poll(self):
+        """
+        Consulta el log y retorna None si no hubo cambios; en otro caso retorna
+        (reset, nuevas_filas). `reset` indica que el log fue recreado y que el
+        historial previo del llamador debe descartarse.
+        """
+        try:
+            st = os.stat(_manifest_path(self.directory))
+        except FileNotFoundError:
+            if self._log_id is None:
+                return None
+            self._reset_state()
+            return True, pd.DataFrame()
+
+        # La firma se toma antes de leer el manifiesto: si cambia entre ambos
+        # pasos, el siguiente poll simplemente vuelve a leer (sin duplicar filas).
+        signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if signature == self._signature:
+            return None
+
+        reset = False
+        frames = []
+        for _ in range(READ_RETRIES):
+            manifest = _read_manifest(self.directory)
+            if manifest is None:
+                break
+            if manifest.get('log_id') != self._log_id:
+                self._log_id = manifest.get('log_id')
+                self._offsets = {}
+                frames = []
+                reset = True
+            self.max_records = manifest['max_records']
+
+            try:
+                for seg in manifest['segments']:
+                    offset = self._offsets.get(seg['file'], 0)
+                    if seg['bytes'] <= offset:
+                        continue
+                    frames.append(self._parse(read_segment(self.directory, seg, offset), offset))
+                    self._offsets[seg['file']] = seg['bytes']
+            except FileNotFoundError:
+                # Rotación concurrente: se reintenta con el manifiesto nuevo.
+                continue
+
+            retained = {seg['file'] for seg in manifest['segments']}
+            self._offsets = {f: b for f, b in self._offsets.items() if f in retained}
+            self._signature = signature
+            break
+
+        new_rows = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        return reset, new_rows
+
+# ------------------- CAPA INTERCAMBIABLE -------------------
+
+def _filter_frame(df, columns=None, pisos=None, start=None, end=None):
+    """Aplica en pandas los filtros que el backend CSV no puede empujar al disco."""
+    if df.empty:
+        return df
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    mask = pd.Series(True, index=df.index)
+    if pisos is not None:
+        mask &= df['piso'].isin(pisos)
+    if start is not None:
+        mask &= df['timestamp'] >= pd.Timestamp(start)
+    if end is not None:
+        mask &= df['timestamp'] <= pd.Timestamp(end)
+    df = df[mask]
+    if columns is not None:
+        df = df[['timestamp'] + [c for c in columns if c != 'timestamp']]
+    return df.reset_index(drop=True)
+
+
+class CsvSegmentStore:
+    """Backend 'csv': log segmentado de solo-anexado (ver SegmentLogWriter)."""
+
+    backend = 'csv'
+
+    def __init__(self, directory, max_records=None, segment_records=None):
+        self.directory = directory
+        self.max_records = max_records
+        self.segment_records = segment_records
+        self._writer = None
+
+    def _get_writer(self):
+        if self._writer is None:
+            self._writer = SegmentLogWriter(self.directory, self.max_records, self.segment_records)
+        return self._writer
+
+    def reset(self):
+        self._get_writer().reset()
+
+    def append(self, df):
+        self._get_writer().append(df)
+
+    def tail_reader(self):
+        return SegmentTailReader(self.directory)
+
+    def time_range(self):
+        """(primera, última) lectura retenida; None si el log está vacío."""
+        df = self.read(columns=['timestamp'])
+        if df.empty:
+            return None
+        return df['timestamp'].min(), df['timestamp'].max()
+
+    def read(self, columns=None, pisos=None, start=None, end=None):
+        """Lee el historial retenido; la proyección y los filtros se aplican en memoria."""
+        return _filter_frame(read_log(self.directory), columns, pisos, start, end)
+
+
+def open_store(directory, backend='csv', max_records=None, segment_records=None):
+    """
+    Retorna el almacén de lecturas para `backend` ('csv' o 'parquet').
+
+    Todos los almacenes exponen la misma interfaz: reset(), append(df),
+    tail_reader(), time_range() y read(columns, pisos, start, end). El backend Parquet
+    se importa solo cuando se solicita (depende de pyarrow).
+    """
+    if backend == 'parquet':
+        from backend.parquet_store import ParquetHourStore
+        return ParquetHourStore(directory, max_records)
+    if backend == 'csv':
+        return CsvSegmentStore(directory, max_records, segment_records)
+    raise ValueError(f"Backend de almacenamiento desconocido: {backend}")
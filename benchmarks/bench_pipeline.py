@@ -0,0 +1,321 @@
+# =========================================================
+# MÓDULO: bench_pipeline.py (BENCHMARKS - PIPELINE INGESTA -> ALERTAS -> DASHBOARD)
+# Propósito: Medir por etapa (tiempo y memoria pico) el pipeline completo sobre
+# datos sintéticos con semilla fija a tres escalas, guardar los resultados en
+# JSON y compararlos con una línea base para detectar regresiones.
+# Uso (desde la raíz):
+#   python -m benchmarks.bench_pipeline --scales small medium --output bench.json
+#   python -m benchmarks.bench_pipeline --baseline bench_base.json --threshold 0.2
+#   python -m benchmarks.bench_pipeline --scales medium large --procesos 2 4   (ciclo en paralelo vs. en proceso)
+# =========================================================
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from configuracion.config import STORAGE_BACKEND
+from backend import core_logic
+from backend.storage import open_store
+from backend.schema import floor_series, memory_per_reading
+from backend.floor_status import FloorStatusIndex
+
+# Escalas: edificios x pisos y horas de historial a 1 lectura/minuto por serie
+SCALES = {
+    'small': {'edificios': 1, 'pisos': 3, 'hours': 4},
+    'medium': {'edificios': 1, 'pisos': 100, 'hours': 24},
+    'large': {'edificios': 10, 'pisos': 100, 'hours': 24 * 7},
+}
+DEFAULT_SCALES = ['small', 'medium']
+STEP_SECONDS = 60
+START = '2025-01-06 00:00:00'
+DEFAULT_THRESHOLD = 0.25 # Tolerancia relativa antes de marcar una regresión
+MIN_REGRESSION_SECONDS = 0.001 # Diferencias absolutas menores se consideran ruido
+
+# ------------------- DATOS SINTÉTICOS -------------------
+
+def build_dataset(edificios, pisos, hours, seed=0):
+    """
+    Genera el historial con el simulador vectorizado (semilla fija) directamente
+    como arreglos. Retorna (DataFrame con el formato de generate_live_data, ticks).
+    """
+    from data_simulator import VectorizedSimulator
+
+    sim = VectorizedSimulator(edificios, list(range(1, pisos + 1)), seed)
+    n_ticks = int(hours * 3600 // STEP_SECONDS)
+    timestamps = pd.Timestamp(START) + pd.to_timedelta(np.arange(n_ticks) * STEP_SECONDS, unit='s')
+    values = np.stack([sim.step_arrays(ts) for ts in timestamps])
+    n = len(sim.piso)
+
+    df = pd.DataFrame({
+        'timestamp': np.repeat(timestamps.to_numpy(), n),
+        'edificio': np.tile(sim.edificio, n_ticks),
+        'piso': np.tile(sim.piso, n_ticks),
+        'temp_C': values[:, :, 0].ravel(),
+        'humedad_pct': values[:, :, 1].ravel(),
+        'energia_kW': values[:, :, 2].ravel(),
+    })
+    return df, n_ticks
+
+
+def write_dataset(directory, df, n_series, backend, ticks_per_batch=60):
+    """Escribe el historial en un almacén nuevo en lotes de una hora. Retorna el almacén."""
+    store = open_store(directory, backend, max_records=len(df) + 100 * n_series)
+    store.reset()
+    batch_rows = ticks_per_batch * n_series
+    for i in range(0, len(df), batch_rows):
+        store.append(df.iloc[i:i + batch_rows])
+    return store
+
+# ------------------- ETAPAS -------------------
+
+def dashboard_prep(df, edificio):
+    """Mismo pre-procesamiento que el dashboard: filtro por edificio, melt y últimas 4 horas."""
+    df_data = df[df['edificio'] == edificio]
+    df_melted = df_data.reset_index().melt(
+        id_vars=['timestamp', 'edificio', 'piso'],
+        value_vars=['temp_C', 'humedad_pct', 'energia_kW'],
+        var_name='variable',
+        value_name='valor'
+    )
+    latest_timestamp = df_data.index.max()
+    return df_melted[df_melted['timestamp'] > latest_timestamp - pd.Timedelta(hours=4)]
+
+
+def _reset_loader(path):
+    core_logic._tail_cache.pop(path, None)
+
+
+def _reset_predictor():
+    core_logic._predictor.reset()
+
+
+def _measure(func, setup=None, repeat=5):
+    """
+    Ejecuta `func` una vez de calentamiento, `repeat` veces cronometradas (con
+    `setup` fuera del cronómetro antes de cada una) y una vez más bajo
+    tracemalloc para la memoria pico.
+    """
+    times = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(repeat + 1):
+            if setup:
+                setup()
+            t0 = time.perf_counter()
+            func()
+            if i:
+                times.append(time.perf_counter() - t0)
+
+        if setup:
+            setup()
+        tracemalloc.start()
+        try:
+            func()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return {
+        'median_s': round(statistics.median(times), 6),
+        'min_s': round(min(times), 6),
+        'peak_mb': round(peak / 2**20, 3),
+    }
+
+
+def _cycle_stages(load, store, next_tick, workers, repeat):
+    """
+    Un ciclo del daemon con un tick nuevo (fuera del cronómetro): predicción +
+    alertas en este proceso y con ShardedEvaluator para cada número de procesos de `workers`.
+    """
+    from backend.sharding import ShardedEvaluator
+
+    current = {}
+
+    def new_tick():
+        store.append(next_tick())
+        current['df'] = load()
+
+    def in_process():
+        core_logic.get_predictions(current['df'])
+        core_logic.generate_alerts(current['df'])
+
+    stages = {'cycle_in_process': _measure(in_process, setup=new_tick, repeat=repeat)}
+    for n in workers:
+        with ShardedEvaluator(n) as evaluator:
+            evaluator.evaluate(load()) # Arranque de los procesos y carga inicial, fuera de la medición
+            stages[f'cycle_sharded_{n}'] = _measure(lambda: evaluator.evaluate(current['df']), setup=new_tick,
+                                                    repeat=repeat)
+    return stages
+
+
+def run_scale(name, repeat=5, seed=0, backend=STORAGE_BACKEND, workdir=None, workers=()):
+    """
+    Genera el dataset de la escala `name` y mide cada etapa del pipeline por
+    separado. Con `workers`, también el ciclo con ese número de procesos (ver _cycle_stages).
+    """
+    spec = SCALES[name]
+    t0 = time.perf_counter()
+    df_source, n_ticks = build_dataset(spec['edificios'], spec['pisos'], spec['hours'], seed)
+    n_series = spec['edificios'] * spec['pisos']
+
+    directory = tempfile.mkdtemp(prefix=f'bench_{name}_', dir=workdir)
+    try:
+        store = write_dataset(directory, df_source, n_series, backend)
+        setup_seconds = time.perf_counter() - t0
+        print(f"⏱️  [{name}] {len(df_source):,} lecturas ({n_series} series x {n_ticks} ticks) "
+              f"preparadas en {setup_seconds:.1f}s")
+
+        # Tick adicional para las etapas de ingesta/carga incremental
+        last_ts = df_source['timestamp'].iloc[-1]
+        tick = df_source.iloc[-n_series:].copy()
+        ticks_appended = [0]
+
+        def next_tick():
+            ticks_appended[0] += 1
+            return tick.assign(timestamp=last_ts + pd.Timedelta(seconds=STEP_SECONDS * ticks_appended[0]))
+
+        stages = {}
+        stages['ingest_append_tick'] = _measure(lambda: store.append(next_tick()), repeat=repeat)
+
+        load = lambda: core_logic.load_and_prepare_data(directory, source='store')
+        stages['load_cold'] = _measure(load, setup=lambda: _reset_loader(directory), repeat=repeat)
+
+        load()
+        stages['load_incremental'] = _measure(load, setup=lambda: store.append(next_tick()), repeat=repeat)
+        df = load()
+
+        stages['predict_sync_cold'] = _measure(lambda: core_logic.get_predictions(df), setup=_reset_predictor,
+                                               repeat=repeat)
+        piso = int(df['piso'].iloc[-1])
+        stages['predict_60_min_ma'] = _measure(lambda: core_logic.predict_60_min_ma(df, piso, 'temp_C'),
+                                               repeat=repeat)
+
+        # Estado estacionario: el predictor ya está sincronizado con `df`
+        core_logic.get_predictions(df)
+        stages['generate_alerts'] = _measure(lambda: core_logic.generate_alerts(df), repeat=repeat)
+        with contextlib.redirect_stdout(io.StringIO()):
+            df_alerts = core_logic.generate_alerts(df)
+
+        edificio = str(df['edificio'].iloc[0])
+        pisos = sorted(df.loc[df['edificio'] == edificio, 'piso'].unique())
+        stages['get_floor_status'] = _measure(
+            lambda: [core_logic.get_floor_status(df_alerts, p, edificio) for p in pisos], repeat=repeat)
+        # Índice materializado: construcción (una agrupación) y consultas de todas las tarjetas
+        stages['floor_status_index_build'] = _measure(lambda: FloorStatusIndex().update(df_alerts), repeat=repeat)
+        status = FloorStatusIndex().update(df_alerts)
+        stages['floor_status_index_lookup'] = _measure(lambda: [status.get(edificio, p) for p in pisos], repeat=repeat)
+        stages['dashboard_melt_4h'] = _measure(lambda: dashboard_prep(df, edificio), repeat=repeat)
+        window_start = df.index.max() - pd.Timedelta(hours=4)
+        stages['dashboard_floor_series_4h'] = _measure(lambda: floor_series(df, edificio, window_start),
+                                                       repeat=repeat)
+        bytes_per_reading = memory_per_reading(df)
+        if workers:
+            stages.update(_cycle_stages(load, store, next_tick, workers, repeat))
+    finally:
+        _reset_loader(directory)
+        _reset_predictor()
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return {
+        'rows': len(df_source),
+        'series': n_series,
+        'ticks': n_ticks,
+        'alerts': len(df_alerts),
+        'bytes_per_reading': round(bytes_per_reading, 1),
+        'stages': stages,
+    }
+
+# ------------------- COMPARACIÓN CON LÍNEA BASE -------------------
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compara el mejor tiempo (min_s, el menos sensible al ruido) de cada etapa
+    con la línea base.
+    Retorna la lista de regresiones (escala, etapa, base, actual, razón).
+    """
+    regressions = []
+    for scale, current in results['scales'].items():
+        base_scale = baseline.get('scales', {}).get(scale)
+        if base_scale is None:
+            continue
+        for stage, stats in current['stages'].items():
+            base = base_scale['stages'].get(stage)
+            if base is None:
+                continue
+            before, after = base['min_s'], stats['min_s']
+            if after > before * (1 + threshold) and after - before > MIN_REGRESSION_SECONDS:
+                regressions.append((scale, stage, before, after, after / before if before else float('inf')))
+    return regressions
+
+
+def _environment():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'storage_backend': STORAGE_BACKEND,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline ingesta -> alertas -> dashboard.")
+    parser.add_argument('--scales', nargs='+', default=DEFAULT_SCALES, choices=list(SCALES))
+    parser.add_argument('--repeat', type=int, default=5, help="Repeticiones por etapa (se reporta la mediana).")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--backend', default=STORAGE_BACKEND, help="Backend de almacenamiento a medir.")
+    parser.add_argument('--workdir', help="Directorio para los almacenes temporales.")
+    parser.add_argument('--output', help="Ruta donde guardar los resultados en JSON.")
+    parser.add_argument('--baseline', help="Resultados JSON previos contra los cuales comparar.")
+    parser.add_argument('--procesos', type=int, nargs='+', default=[],
+                        help="Medir también el ciclo con ShardedEvaluator para estos números de procesos.")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Aumento relativo del mejor tiempo considerado regresión (0.25 = +25%%).")
+    args = parser.parse_args()
+
+    results = {'environment': _environment(), 'backend': args.backend, 'scales': {}}
+    for name in args.scales:
+        results['scales'][name] = run_scale(name, args.repeat, args.seed, args.backend, args.workdir, args.procesos)
+
+    print(f"{'Escala':<8}{'Etapa':<27}{'mediana (ms)':>14}{'mín (ms)':>12}{'pico (MB)':>12}")
+    for name, scale in results['scales'].items():
+        for stage, stats in scale['stages'].items():
+            print(f"{name:<8}{stage:<27}{stats['median_s'] * 1000:>14.2f}{stats['min_s'] * 1000:>12.2f}"
+                  f"{stats['peak_mb']:>12.2f}")
+        print(f"{name:<8}{'memoria en DataFrame':<27}{scale['bytes_per_reading']:>14.1f} B/lectura")
+        base = scale['stages'].get('cycle_in_process')
+        for n in args.procesos:
+            sharded = scale['stages'][f'cycle_sharded_{n}']
+            print(f"{name:<8}{f'aceleración con {n} procesos':<27}{base['min_s'] / sharded['min_s']:>14.2f}x "
+                  f"({results['environment']['cpus']} CPU)")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n🚨 {len(regressions)} regresiones (> +{args.threshold:.0%} sobre la línea base):")
+            for scale, stage, before, after, ratio in regressions:
+                print(f"   {scale}/{stage}: {before * 1000:.2f} ms -> {after * 1000:.2f} ms (x{ratio:.2f})")
+            sys.exit(1)
+        print("\n✅ Sin regresiones respecto a la línea base.")
+
+
+if __name__ == '__main__':
+    main()
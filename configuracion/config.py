@@ -27,11 +27,116 @@ RECOMENDACIONES = {
     'temp_C_Critica': "Revisión urgente de HVAC y carga en Piso X. Ajustar setpoint inmediatamente.",
     'humedad_pct_Critica_low': "Programar revisión de sellos térmicos en Piso X para evitar pérdida de humedad.",
     'humedad_pct_Critica_high': "Incrementar ventilación del Piso X; revisar puertas/celosías por humedad excesiva.",
+    'energia_kW_Media': "Redistribuir carga eléctrica del Piso X al Piso Y en la próxima hora.",
     'energia_kW_Critica': "Redistribuir carga eléctrica del Piso X al Piso Y en la próxima hora.",
     'riesgo_combinado_Critica': "RIESGO CRÍTICO: Sobrecarga térmica inminente. Redistribuir carga eléctrica en Piso X para prevenir fallas.",
-    'preventiva_temp_C': "Predicción: Posiblemente supere el umbral de Temp Media en +60 min. Ajustar setpoint preventivamente."
+    'preventiva_temp_C': "Predicción: Posiblemente supere el umbral de Temp Media en +60 min. Ajustar setpoint preventivamente.",
+    'anomalia_energia_kW': "Consumo atípico en Piso X respecto a su patrón reciente: revisar equipos encendidos o fallas de carga.",
+    'anomalia_humedad_pct': "Cambio brusco de humedad en Piso X respecto a su patrón reciente: revisar ventilación, puertas y sensores."
 }
 
+# -------------------- REDISTRIBUCIÓN DE CARGA --------------------
+# Destino del 'Piso Y' de las recomendaciones de energía (ver backend/redistribution.py)
+REDISTRIBUTION_MARGIN_KW = 0.5 # Los donantes bajan a y los receptores no superan el primer umbral de energía menos este margen
+REDISTRIBUTION_MARGIN_C = 0.5 # Margen bajo el primer umbral de temperatura que conserva cada receptor
+REDISTRIBUTION_KW_PER_C = 1.5 # kW que un piso recibe por °C de margen térmico (la carga trasladada también calienta)
+REDISTRIBUTION_TTL_TICKS = 12 # Ticks del simulador (5 s) que un traslado publicado sigue aplicándose sin republicarse
+
 # -------------------- PARÁMETROS GENERALES --------------------
 WINDOWS_SIZE_MINUTES = 60 # Ventana de tiempo para el promedio móvil (1 hora)
-PISOS_MONITOREADOS = [1, 2, 3]
\ No newline at end of file
+PISOS_MONITOREADOS = [1, 2, 3]
+
+# -------------------- PRONÓSTICO --------------------
+FORECAST_MODEL = 'ma' # 'ma' (promedio móvil), 'holt' o 'holt_winters' (ver backend/backtest.py)
+FORECAST_HORIZON_MINUTES = 60 # Horizonte del pronóstico (1 lectura/minuto por piso)
+SEASON_LENGTH_MINUTES = 24 * 60 # Ciclo diario para Holt-Winters
+
+# -------------------- ALMACENAMIENTO --------------------
+DATA_DIR = 'smartfloors_data' # Directorio de lecturas (relativo a la raíz)
+STORAGE_BACKEND = 'parquet' # 'parquet' (columnar, particionado por hora) o 'csv' (log segmentado)
+
+# -------------------- MEMORIA COMPARTIDA (SIMULADOR <-> BACKEND) --------------------
+RING_PATH = 'smartfloors_ring.bin' # Buffer circular mmap con lecturas y flags de corrección (relativo a la raíz)
+RING_CAPACITY = 65536 # Lecturas retenidas en el buffer circular
+SEQLOCK_RETRIES = 200 # Reintentos de un lector mientras hay una escritura en curso (buffer y rollups)
+SEQLOCK_SLEEP_SECONDS = 0.001 # Pausa entre reintentos; agotados, la lectura se trata como "sin datos nuevos"
+DATA_SOURCE = 'store' # Origen de load_and_prepare_data: 'store' (almacén en disco) o 'ring' (buffer compartido)
+
+# -------------------- SERVICIO DE INGESTA --------------------
+INGEST_HOST = '127.0.0.1'
+INGEST_PORT = 9750 # Mismo puerto para TCP (JSON por línea) y UDP (registros binarios)
+
+# -------------------- VISUALIZACIÓN --------------------
+DOWNSAMPLE_METHOD = 'lttb' # 'lttb' (forma de la curva) o 'minmax' (envolvente: conserva todos los picos)
+CHART_POINTS = 600 # Puntos por serie en un gráfico de media columna (~ ancho en píxeles)
+DOWNSAMPLE_CACHE_SIZE = 512 # Series reducidas retenidas en caché
+DASHBOARD_REFRESH_SECONDS = 5 # Período de recarga de datos del dashboard
+DASHBOARD_INCREMENTAL = True # Cada sección se refresca sola (st.fragment) y solo se reconstruye si cambió
+
+# -------------------- HISTÓRICO AGREGADO (ROLLUPS) --------------------
+ROLLUP_DIR = 'smartfloors_rollups' # Niveles min/max/media/conteo por piso y variable (relativo a la raíz)
+# Nivel: (segundos por cubeta, cubetas retenidas). Tamaño fijo: el más antiguo se sobrescribe.
+ROLLUP_TIERS = {
+    '1min': (60, 2 * 24 * 60), # 2 días
+    '15min': (15 * 60, 5 * 7 * 24 * 4), # 5 semanas
+    '1h': (60 * 60, 90 * 24), # 90 días
+}
+ROLLUP_MAX_SERIES = 256 # Series (edificio, piso) reservadas al crear los archivos
+ROLLUP_MAX_POINTS = 1500 # Puntos máximos por serie al elegir el nivel de una consulta
+
+# -------------------- MOTOR DE ALERTAS CON ESTADO --------------------
+# Margen que la lectura debe recuperar (por debajo del umbral alto / por encima del bajo) para bajar de nivel
+ALERT_HYSTERESIS = {'temp_C': 0.5, 'humedad_pct': 2.0, 'energia_kW': 1.0}
+ALERT_MIN_OPEN_SECONDS = 30 # Tiempo que una condición debe sostenerse para abrir o escalar una alerta
+ALERT_MIN_CLEAR_SECONDS = 60 # Tiempo que debe sostenerse la mejora para desescalar o cerrar
+ALERT_HISTORY_SIZE = 5000 # Transiciones retenidas en el historial
+
+# -------------------- REGLAS RECARGABLES --------------------
+# Archivo JSON opcional (relativo a la raíz) con "UMBRALES" y/o "RECOMENDACIONES" que reemplazan a los de
+# este módulo: una variable en UMBRALES se reemplaza completa (sus niveles, en orden de menor a mayor
+# severidad); RECOMENDACIONES se combina clave a clave. Se recarga en caliente al cambiar el archivo.
+RULES_FILE = 'smartfloors_rules.json'
+RULES_CHECK_SECONDS = 2.0 # Intervalo mínimo entre revisiones del archivo de reglas
+
+# -------------------- DAEMON DE ALERTAS --------------------
+ALERTS_DIR = 'smartfloors_alerts' # Estado por piso, alertas, transiciones y predicciones publicadas (relativo a la raíz)
+DAEMON_INTERVAL_SECONDS = 5.0 # Período del ciclo ingesta -> predicción -> alertas del daemon
+DAEMON_STALE_SECONDS = 30.0 # Sin latido del daemon por más de este tiempo, el dashboard calcula las alertas él mismo
+
+# -------------------- API DE LECTURA --------------------
+API_HOST = '127.0.0.1'
+API_PORT = 9760
+API_URL = 'http://127.0.0.1:9760' # Usado por el dashboard con DASHBOARD_SOURCE = 'api'
+API_REFRESH_SECONDS = 1.0 # Intervalo mínimo entre revisiones de datos nuevos (compartido por todas las peticiones)
+API_CACHE_SIZE = 256 # Respuestas serializadas retenidas en caché
+DASHBOARD_SOURCE = 'local' # 'local' (el dashboard carga y calcula) o 'api' (lee de backend/api_server.py)
+
+# -------------------- REPRODUCCIÓN HISTÓRICA --------------------
+REPLAY_CHUNK_HOURS = 6 # Ventana de lecturas del almacén en memoria por bloque
+REPLAY_CSV_CHUNK_ROWS = 500_000 # Filas por bloque al reproducir un CSV exportado
+
+# -------------------- INSTRUMENTACIÓN --------------------
+METRICS_ENABLED = True # Temporizadores por etapa y contadores (se puede cambiar en caliente con metrics.set_enabled)
+METRICS_DIR = 'smartfloors_metrics' # Archivos <proceso>.prom (Prometheus) y perfiles .prof (relativo a la raíz)
+METRICS_EXPORT_SECONDS = 10.0 # Intervalo mínimo entre escrituras del archivo de métricas de cada proceso
+# Cubetas (segundos) de los histogramas de latencia por etapa
+METRICS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# -------------------- DETECCIÓN DE ANOMALÍAS --------------------
+# Alertas 'Anomalía' por desvío estadístico respecto del patrón reciente de cada piso (backend/anomaly.py)
+ANOMALY_VARIABLES = ('energia_kW', 'humedad_pct')
+ANOMALY_ALPHA = 0.1 # Factor de la media/varianza EWMA (~ últimas 10 lecturas: absorbe pronto los cambios de carga)
+ANOMALY_Z_THRESHOLD = 4.0 # |z| a partir del cual una lectura es un pico (nivel 'Media')
+ANOMALY_CUSUM_K = 1.0 # Holgura del CUSUM (en desviaciones)
+ANOMALY_CUSUM_H = 8.0 # Umbral del CUSUM para un desplazamiento sostenido (nivel 'Informativa')
+ANOMALY_WARMUP_READINGS = 30 # Lecturas por serie antes de evaluar
+ANOMALY_HOLD_READINGS = 2 # Lecturas que una anomalía permanece vigente (la anómala y la siguiente: 10 s a 5 s por lectura)
+ANOMALY_MAX_SPIKE_RUN = 10 # Picos seguidos tras los que se asume un nivel nuevo y se reancla la línea base
+# Desviación mínima por variable. Energía por encima de su ruido (0.3 kW): los escalones de la corrección
+# (-3 kW) y de la redistribución quedan bajo el umbral y los picos (~8 kW) siguen detectándose
+ANOMALY_MIN_STD = {'energia_kW': 1.2, 'humedad_pct': 0.8}
+
+# -------------------- EVALUACIÓN EN PARALELO --------------------
+SHARD_WORKERS = 0 # Procesos del daemon de alertas para predicción + alertas (0: en el mismo proceso)
+# Se deja en 0 hasta medir una aceleración real en la máquina destino:
+# python -m benchmarks.bench_pipeline --scales medium large --procesos 2 4 (requiere varios núcleos)
@@ -1,84 +1,116 @@
 # =========================================================
 # MÓDULO: data_simulator.py (MODO TIEMPO REAL CON PODA Y CORRECCIÓN)
 # Propósito: Generar datos continuamente (cada 5s), podando el historial a 4 horas.
+# Modo vectorizado: N edificios x M pisos por tick, en vivo o más rápido que el tiempo real.
 # =========================================================
 
 import pandas as pd
 import numpy as np
 import time
 from datetime import datetime
-import os
 import random
 # Importar configuración para parámetros
 try:
-    from configuracion.config import PISOS_MONITOREADOS, UMBRALES 
+    from configuracion.config import (PISOS_MONITOREADOS, UMBRALES, DATA_DIR, STORAGE_BACKEND, RING_PATH, RING_CAPACITY,
+                                      REDISTRIBUTION_KW_PER_C)
 except ImportError:
     PISOS_MONITOREADOS = [1, 2, 3] 
+    DATA_DIR = 'smartfloors_data'
+    STORAGE_BACKEND = 'csv'
+    RING_PATH = 'smartfloors_ring.bin'
+    RING_CAPACITY = 65536
+    REDISTRIBUTION_KW_PER_C = 1.5
+
+from backend.storage import open_store
+from backend.shm_ring import SharedRing
+from backend.rollups import open_rollups
+from backend import metrics
 
 # Parámetros de simulación
 INTERVAL_SECONDS = 5  # Frecuencia de escritura: 5 segundos.
 MAX_RECORDS = 240 * len(PISOS_MONITOREADOS) # 4 horas * 60 min/h * 3 pisos = 720 registros
-FILE_NAME = 'smartfloors_data.csv'
+SEGMENT_RECORDS = 60 * len(PISOS_MONITOREADOS) # Filas por segmento del log CSV (1 hora)
+
+EDIFICIO = 'A' # Edificio del modo clásico (un edificio, PISOS_MONITOREADOS)
+
+# Perfiles base por piso: (temp, amplitud_temp, humedad, amplitud_hum, energía, amplitud_energía).
+# La amplitud multiplica el ciclo diario. Los pisos sin perfil propio usan PERFIL_PISO_DEFAULT.
+PERFILES_PISO = {
+    1: (22.0, 3.0, 65.0, 10.0, 5.0, 4.0),
+    2: (23.5, 4.0, 60.0, 11.0, 7.5, 5.0),
+}
+PERFIL_PISO_DEFAULT = (24.5, 5.0, 55.0, 12.0, 10.0, 6.0) # Piso 3 y superiores: más propensos a problemas
+
+# Ruido y anomalías (compartidos por el modo clásico y el vectorizado)
+RUIDO_STD = (0.4, 0.8, 0.3) # Desviación del ruido de temp, humedad y energía
+PROB_PICO_ENERGIA = 0.15
+PROB_DESVIACION_HUMEDAD = 0.08
+CICLOS_CORRECCION = 24 # Duración de una corrección (24 ciclos de 5s = 120 segundos)
 
 # VARIABLES DE ESTADO GLOBALES - ¡CRÍTICAS PARA LA SIMULACIÓN DE CORRECCIÓN!
-# Estas variables son importadas por core_logic.py
-system_correction_active = {p: False for p in PISOS_MONITOREADOS} 
-correction_timer = {p: 0 for p in PISOS_MONITOREADOS}
+# Se activan desde los flags del buffer compartido que escribe apply_alert_actions (claves: (edificio, piso))
+system_correction_active = {(EDIFICIO, p): False for p in PISOS_MONITOREADOS} 
+correction_timer = {(EDIFICIO, p): 0 for p in PISOS_MONITOREADOS}
+# kW trasladados por la redistribución de carga (negativo: el piso cede; positivo: recibe), desde el buffer compartido
+# (vuelven a 0 si el plan no se republica en REDISTRIBUTION_TTL_TICKS ticks)
+load_shift = {}
 
 def get_daily_base(piso, cycle_factor):
     """Devuelve las bases para un piso."""
+    t, t_amp, h, h_amp, e, e_amp = PERFILES_PISO.get(piso, PERFIL_PISO_DEFAULT)
     
     # Bases de Consumo y Confort
-    if piso == 1:
-        base_temp = 22.0 + 3.0 * cycle_factor
-        base_hum = 65.0 + 10.0 * cycle_factor
-        base_energia = 5.0 + 4.0 * cycle_factor
-    elif piso == 2:
-        base_temp = 23.5 + 4.0 * cycle_factor
-        base_hum = 60.0 + 11.0 * cycle_factor
-        base_energia = 7.5 + 5.0 * cycle_factor
-    else: # Piso 3: Más propenso a problemas
-        base_temp = 24.5 + 5.0 * cycle_factor
-        base_hum = 55.0 + 12.0 * cycle_factor
-        base_energia = 10.0 + 6.0 * cycle_factor
+    base_temp = t + t_amp * cycle_factor
+    base_hum = h + h_amp * cycle_factor
+    base_energia = e + e_amp * cycle_factor
         
     return base_temp, base_hum, base_energia
 
 
-def generate_live_data():
-    """Genera un nuevo set de datos, aplicando anomalías y correcciones."""
+def generate_live_data(timestamp=None):
+    """
+    Genera un nuevo set de datos, aplicando anomalías y correcciones.
+    `timestamp` permite reproducir el simulador en otro instante (backtest); por defecto, ahora.
+    """
     global system_correction_active, correction_timer
     
-    timestamp = datetime.now()
+    timestamp = timestamp or datetime.now()
     data = []
     
     minute_of_day = (timestamp.hour * 60 + timestamp.minute) / (24 * 60)
     daily_cycle = np.sin(minute_of_day * 2 * np.pi) 
 
     for piso in PISOS_MONITOREADOS:
+        key = (EDIFICIO, piso)
         base_temp, base_hum, base_energia = get_daily_base(piso, daily_cycle)
         
-        temp_C = round(base_temp + np.random.normal(0, 0.4), 2)
-        humedad_pct = round(base_hum + np.random.normal(0, 0.8), 2)
-        energia_kW = round(base_energia + np.random.normal(0, 0.3), 2)
+        temp_C = round(base_temp + np.random.normal(0, RUIDO_STD[0]), 2)
+        humedad_pct = round(base_hum + np.random.normal(0, RUIDO_STD[1]), 2)
+        energia_kW = round(base_energia + np.random.normal(0, RUIDO_STD[2]), 2)
+
+        # --- REDISTRIBUCIÓN DE CARGA (la carga trasladada también lleva su calor) ---
+        shift = load_shift.get(key, 0.0)
+        if shift:
+            energia_kW = round(energia_kW + shift, 2)
+            temp_C = round(temp_C + shift / REDISTRIBUTION_KW_PER_C, 2)
         
         # --- LÓGICA DE CORRECCIÓN (Simula que el setpoint fue ajustado) ---
-        if system_correction_active[piso]:
-            correction_timer[piso] += 1
+        if system_correction_active.get(key):
+            correction_timer[key] = correction_timer.get(key, 0) + 1
             # Reducir la temperatura y energía por la acción
             temp_C = round(temp_C - 2.0 - 0.5 * daily_cycle, 2)
             energia_kW = round(energia_kW - 3.0, 2)
             
             # Desactivar la corrección después de 120 segundos (24 ciclos de 5s)
-            if correction_timer[piso] > 24: 
-                system_correction_active[piso] = False
-                correction_timer[piso] = 0
+            if correction_timer[key] > CICLOS_CORRECCION: 
+                system_correction_active[key] = False
+                correction_timer[key] = 0
                 print(f"✅ Piso {piso}: Corrección de sistema completada y desactivada.")
                 
         # --- LÓGICA DE ANOMALÍAS (Simula fallas más frecuentes) ---
         else:
             # 1. Pico de Energía (15% de probabilidad)
-            if random.random() < 0.15: 
+            if random.random() < PROB_PICO_ENERGIA: 
                 pico_energia = 8.0 + random.normalvariate(0, 1.0)
                 energia_kW = round(energia_kW + pico_energia, 2)
                 # El pico de energía puede llevar a un aumento de temperatura
@@ -86,12 +118,12 @@ def generate_live_data():
                     temp_C = round(temp_C + 1.5 + random.normalvariate(0, 0.3), 2)
                     
             # 2. Desviación de Humedad (8% de probabilidad)
-            if random.random() < 0.08: 
+            if random.random() < PROB_DESVIACION_HUMEDAD: 
                 humedad_pct = round(humedad_pct + random.choice([-15.0, 15.0]) + random.normalvariate(0, 2.0), 2)
 
         data.append({
             'timestamp': timestamp,
-            'edificio': 'A',
+            'edificio': EDIFICIO,
             'piso': piso,
             'temp_C': temp_C,
             'humedad_pct': humedad_pct,
@@ -101,37 +133,251 @@ def generate_live_data():
     return pd.DataFrame(data)
 
 
+# ------------------- MODO VECTORIZADO (N EDIFICIOS x M PISOS) -------------------
+
+def building_label(i):
+    """Etiqueta de edificio estilo columna de hoja de cálculo: 0 -> 'A', 25 -> 'Z', 26 -> 'AA'."""
+    label = ''
+    i += 1
+    while i:
+        i, r = divmod(i - 1, 26)
+        label = chr(ord('A') + r) + label
+    return label
+
+
+class VectorizedSimulator:
+    """
+    Simulador de N edificios x M pisos que genera cada tick como arreglos NumPy
+    completos, con un `Generator` con semilla. Misma física que
+    generate_live_data (perfil diario, ruido, picos de energía, desviaciones de
+    humedad y corrección temporal), pero sin bucles por piso.
+    """
+
+    def __init__(self, n_edificios=1, pisos=PISOS_MONITOREADOS, seed=None):
+        pisos = list(pisos)
+        edificios = [building_label(i) for i in range(n_edificios)]
+        self.edificio = np.repeat(np.array(edificios, dtype=object), len(pisos))
+        self.piso = np.tile(np.array(pisos, dtype=np.int64), n_edificios)
+        self.keys = list(zip(self.edificio, self.piso))
+        self.rng = np.random.default_rng(seed)
+
+        profiles = np.array([PERFILES_PISO.get(p, PERFIL_PISO_DEFAULT) for p in self.piso], dtype=float)
+        self._base = profiles[:, 0::2]       # (series, 3): temp, humedad, energía
+        self._amplitude = profiles[:, 1::2]
+        self._noise_std = np.array(RUIDO_STD)
+
+        self.correction_active = np.zeros(len(self.piso), dtype=bool)
+        self.correction_timer = np.zeros(len(self.piso), dtype=np.int64)
+        self.load_shift = np.zeros(len(self.piso)) # kW trasladados por la redistribución de carga
+
+    def step_arrays(self, timestamp):
+        """Genera un tick; retorna un arreglo (series, 3) con temp, humedad y energía."""
+        n = len(self.piso)
+        rng = self.rng
+        minute_of_day = (timestamp.hour * 60 + timestamp.minute) / (24 * 60)
+        daily_cycle = np.sin(minute_of_day * 2 * np.pi)
+
+        values = self._base + self._amplitude * daily_cycle + rng.normal(0.0, self._noise_std, size=(n, 3))
+
+        # --- Redistribución de carga (la carga trasladada también lleva su calor) ---
+        values[:, 2] += self.load_shift
+        values[:, 0] += self.load_shift / REDISTRIBUTION_KW_PER_C
+
+        # --- Corrección (setpoint ajustado) ---
+        active = self.correction_active.copy() # Estado al inicio del tick (como en generate_live_data)
+        values[active, 0] -= 2.0 + 0.5 * daily_cycle
+        values[active, 2] -= 3.0
+        self.correction_timer[active] += 1
+        finished = active & (self.correction_timer > CICLOS_CORRECCION)
+        self.correction_active[finished] = False
+        self.correction_timer[finished] = 0
+
+        # --- Anomalías (solo en series sin corrección en curso) ---
+        free = ~active
+        spike = free & (rng.random(n) < PROB_PICO_ENERGIA)
+        pico_energia = 8.0 + rng.normal(0.0, 1.0, n)
+        values[:, 2] += np.where(spike, pico_energia, 0.0)
+        values[:, 0] += np.where(spike & (pico_energia > 9.0), 1.5 + rng.normal(0.0, 0.3, n), 0.0)
+
+        deviation = free & (rng.random(n) < PROB_DESVIACION_HUMEDAD)
+        values[:, 1] += np.where(deviation, rng.choice([-15.0, 15.0], n) + rng.normal(0.0, 2.0, n), 0.0)
+
+        return np.round(values, 2)
+
+    def step(self, timestamp=None):
+        """Genera un tick como DataFrame con el mismo formato que generate_live_data."""
+        timestamp = timestamp or datetime.now()
+        values = self.step_arrays(timestamp)
+        return pd.DataFrame({
+            'timestamp': np.full(len(self.piso), np.datetime64(timestamp)),
+            'edificio': self.edificio,
+            'piso': self.piso,
+            'temp_C': values[:, 0],
+            'humedad_pct': values[:, 1],
+            'energia_kW': values[:, 2],
+        })
+
+    def activate_corrections(self, keys):
+        """Activa la corrección para las series (edificio, piso) indicadas."""
+        index = {key: i for i, key in enumerate(self.keys)}
+        rows = [index[k] for k in keys if k in index]
+        self.correction_active[rows] = True
+
+
+def run_fast_simulation(n_edificios, pisos, hours, step_seconds=60, seed=None, start=None, batch_ticks=60,
+                        store=None, rollups=None):
+    """
+    Genera `hours` horas de datos sintéticos más rápido que el tiempo real
+    (un tick cada `step_seconds` simulados) y los escribe en el almacén (y en
+    los rollups) en lotes de `batch_ticks` ticks. Retorna el número de lecturas generadas.
+    """
+    sim = VectorizedSimulator(n_edificios, pisos, seed)
+    n_ticks = int(hours * 3600 // step_seconds)
+    if store is None:
+        store = open_store(DATA_DIR, STORAGE_BACKEND, max_records=n_ticks * len(sim.piso))
+        store.reset()
+        rollups = open_rollups(n_series=len(sim.piso))
+    start = pd.Timestamp(start) if start is not None else pd.Timestamp(datetime.now()).floor('min') - pd.Timedelta(hours=hours)
+
+    t0 = time.perf_counter()
+    batch = []
+    for i in range(n_ticks):
+        batch.append(sim.step(start + pd.Timedelta(seconds=i * step_seconds)))
+        if len(batch) == batch_ticks or i == n_ticks - 1:
+            batch_df = pd.concat(batch, ignore_index=True)
+            with metrics.timed('simulador_escritura'):
+                store.append(batch_df)
+            if rollups is not None:
+                with metrics.timed('simulador_rollups'):
+                    rollups.update(batch_df)
+            batch = []
+    elapsed = time.perf_counter() - t0
+
+    total = n_ticks * len(sim.piso)
+    print(f"✅ {total:,} lecturas ({n_edificios} edificios x {len(pisos)} pisos, {hours} h) en {elapsed:.1f}s "
+          f"- {total / elapsed:,.0f} lecturas/s")
+    return total
+
+
+# ------------------- BUFFER COMPARTIDO (BUCLE CERRADO ENTRE PROCESOS) -------------------
+
+def _create_ring(keys, capacity=RING_CAPACITY):
+    """
+    Crea el buffer circular compartido y registra las series en su bloque de control.
+    Retorna (ring, slots) o (None, None) si no está disponible.
+    """
+    try:
+        ring = SharedRing.create(RING_PATH, capacity, max(len(keys), 4096))
+        return ring, ring.register_series(keys)
+    except Exception as e:
+        print(f"Advertencia: buffer compartido no disponible ({e}). La corrección entre procesos no funcionará.")
+        return None, None
+
+
+def run_live_vectorized(n_edificios, pisos, seed=None):
+    """Modo continuo con el simulador vectorizado (N edificios x M pisos, un tick cada INTERVAL_SECONDS)."""
+    print(f"--- INICIANDO SIMULADOR VECTORIZADO ({n_edificios} edificios x {len(pisos)} pisos) ---")
+    sim = VectorizedSimulator(n_edificios, pisos, seed)
+    store = open_store(DATA_DIR, STORAGE_BACKEND, 240 * len(sim.piso), 60 * len(sim.piso))
+    store.reset()
+    ring, slots = _create_ring(sim.keys, max(RING_CAPACITY, 240 * len(sim.piso)))
+    rollups = open_rollups(n_series=len(sim.piso))
+
+    while True:
+        try:
+            if ring is not None:
+                # Flags y plan de redistribución publicados por apply_alert_actions en otro proceso (dashboard/daemon)
+                sim.correction_active |= ring.corrections(slots)
+                sim.load_shift = ring.load_shifts(slots)
+            before = sim.correction_active.copy()
+
+            with metrics.timed('simulador_generacion'):
+                new_df = sim.step()
+            with metrics.timed('simulador_escritura'):
+                store.append(new_df)
+            if rollups is not None:
+                with metrics.timed('simulador_rollups'):
+                    rollups.update(new_df)
+
+            if ring is not None:
+                ring.set_corrections(slots[before & ~sim.correction_active], False)
+                ring.age_load_shifts(slots) # Los traslados no republicados vencen como las correcciones
+                ring.append(new_df)
+            metrics.count('filas_generadas', len(new_df))
+            metrics.export('simulador')
+            print(f"✅ {len(new_df)} lecturas añadidas a {DATA_DIR} - Último registro: {new_df['timestamp'].max().strftime('%H:%M:%S')}")
+        except Exception as e:
+            print(f"ERROR en simulador: {e}. ¿Está '{DATA_DIR}' disponible?")
+
+        time.sleep(INTERVAL_SECONDS)
+
+
 def run_live_simulator():
     """Función principal para el modo continuo, con limpieza de historial."""
     print("--- INICIANDO SIMULADOR DINÁMICO (Modo Bucle Cerrado) ---")
     
-    # Limpiar el CSV al inicio
-    if os.path.exists(FILE_NAME):
-        os.remove(FILE_NAME)
+    # Limpiar el historial al inicio
+    store = open_store(DATA_DIR, STORAGE_BACKEND, MAX_RECORDS, SEGMENT_RECORDS)
+    store.reset()
+    keys = list(system_correction_active.keys())
+    ring, slots = _create_ring(keys)
+    # El histórico agregado no se limpia: sobrevive a los reinicios del simulador
+    rollups = open_rollups(n_series=len(keys))
 
     while True:
         try:
-            new_df = generate_live_data()
+            if ring is not None:
+                # Flags y plan de redistribución publicados por apply_alert_actions en otro proceso (dashboard/daemon)
+                for key, active in zip(keys, ring.corrections(slots)):
+                    if active:
+                        system_correction_active[key] = True
+                load_shift.update(zip(keys, ring.load_shifts(slots).tolist()))
+            before = np.array([system_correction_active[k] for k in keys])
+
+            with metrics.timed('simulador_generacion'):
+                new_df = generate_live_data()
             
-            # Cargar historial y podar a MAX_RECORDS
-            if os.path.exists(FILE_NAME):
-                df_history = pd.read_csv(FILE_NAME)
-                df_history['timestamp'] = pd.to_datetime(df_history['timestamp'])
-                df_history = df_history.tail(MAX_RECORDS - len(new_df))
-                df_combined = pd.concat([df_history, new_df])
-            else:
-                df_combined = new_df
-
-            # Guardar el archivo podado y actualizado (sobreescribir)
-            df_combined.to_csv(FILE_NAME, index=False)
+            # Solo se anexan las filas nuevas; el almacén rota/poda a MAX_RECORDS
+            with metrics.timed('simulador_escritura'):
+                store.append(new_df)
+            if rollups is not None:
+                with metrics.timed('simulador_rollups'):
+                    rollups.update(new_df)
+
+            if ring is not None:
+                # Se liberan solo los flags cuya corrección terminó en este tick
+                after = np.array([system_correction_active[k] for k in keys])
+                ring.set_corrections(slots[before & ~after], False)
+                ring.age_load_shifts(slots) # Los traslados no republicados vencen como las correcciones
+                ring.append(new_df)
+            metrics.count('filas_generadas', len(new_df))
+            metrics.export('simulador') # <METRICS_DIR>/simulador.prom
             
-            print(f"✅ Nuevo registro añadido/podado a {FILE_NAME} - Último registro: {df_combined['timestamp'].max().strftime('%H:%M:%S')}")
+            print(f"✅ Nuevo registro añadido a {DATA_DIR} - Último registro: {new_df['timestamp'].max().strftime('%H:%M:%S')}")
             
         except Exception as e:
-            print(f"ERROR en simulador: {e}. ¿Está 'smartfloors_data.csv' libre?")
+            print(f"ERROR en simulador: {e}. ¿Está '{DATA_DIR}' disponible?")
             
         time.sleep(INTERVAL_SECONDS)
 
 
 if __name__ == '__main__':
-    run_live_simulator()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Simulador de sensores SmartFloors.")
+    parser.add_argument('--edificios', type=int, help="Modo vectorizado: número de edificios.")
+    parser.add_argument('--pisos', type=int, help="Modo vectorizado: pisos por edificio (1..M).")
+    parser.add_argument('--rapido', type=float, metavar='HORAS',
+                        help="Generar HORAS de historial más rápido que el tiempo real y terminar.")
+    parser.add_argument('--paso-segundos', type=int, default=60, help="Segundos simulados por tick en modo rápido.")
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    if args.edificios is None and args.pisos is None and args.rapido is None:
+        run_live_simulator()
+    else:
+        pisos = list(range(1, args.pisos + 1)) if args.pisos else PISOS_MONITOREADOS
+        if args.rapido is not None:
+            run_fast_simulation(args.edificios or 1, pisos, args.rapido, args.paso_segundos, args.seed)
+        else:
+            run_live_vectorized(args.edificios or 1, pisos, args.seed)
\ No newline at end of file